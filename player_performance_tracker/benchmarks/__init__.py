@@ -0,0 +1,22 @@
+"""
+Benchmarks for the player performance tracker.
+
+The modules in this package are meant to be run from the project folder (the one with manage.py),
+for example ``python -m benchmarks.ingest --rows 1000000``.
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    """
+    Configures Django so the benchmarks can use the project's models and services.
+    """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE",
+                          "player_performance_tracker.settings")
+    import django
+    django.setup()
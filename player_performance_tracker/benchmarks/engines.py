@@ -0,0 +1,89 @@
+"""
+Compares the 'orm', 'numpy' and 'columnar' stats engines.
+
+For every dataset size the database is filled with synthetic games, then the time to load the NumPy engine, the time
+to write the columnar store and the per lookup latency of all engines are measured, and the rendered API output of
+the engines is compared.
+
+Usage:
+    python -m benchmarks.engines --rows 10000 100000 1000000 --players 500
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from . import setup_django
+from .synthetic import HEADER, generate_rows
+
+
+def fill_database(rows, players):
+    """
+    Replaces the data in the database with synthetic games.
+    """
+    from django.db import transaction
+    from stats_api.cache import dataset_version
+    from stats_api.models import Player
+    from stats_api.services import DataService
+
+    with transaction.atomic():
+        Player.objects.all().delete()
+        DataService.write_rows((dict(zip(HEADER, row)) for row in generate_rows(rows, players)),
+                               {}, DataService.BATCH_SIZE)
+    dataset_version.bump()
+
+
+def render(engine, player_name):
+    from stats_api.views import render_player_stats
+
+    return render_player_stats(engine.get_aggregated_stats(player_name))
+
+
+def time_lookups(engine, names):
+    start = time.perf_counter()
+    for name in names:
+        engine.get_aggregated_stats(name)
+    return (time.perf_counter() - start) / len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from stats_api.engines import ColumnarStatsEngine, NumpyStatsEngine, OrmStatsEngine
+    from stats_api.models import Player
+    from stats_api.services import DataService
+
+    print(f"{'rows':>10} {'numpy load':>12} {'store write':>12} {'orm lookup':>12} {'numpy lookup':>13} "
+          f"{'columnar lookup':>16} {'identical':>10}")
+    for rows in args.rows:
+        fill_database(rows, args.players)
+        names = list(Player.objects.values_list("player_name", flat=True))
+        sample = [random.choice(names) for _ in range(args.lookups)]
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(STATS_COLUMNAR_DIR=directory):
+            orm, numpy, columnar = OrmStatsEngine(), NumpyStatsEngine(), ColumnarStatsEngine()
+            start = time.perf_counter()
+            numpy.ensure_loaded()
+            load = time.perf_counter() - start
+            start = time.perf_counter()
+            DataService.write_columnar_store(directory)
+            write = time.perf_counter() - start
+            orm_lookup = time_lookups(orm, sample)
+            numpy.ensure_loaded()
+            numpy_lookup = time_lookups(numpy, sample)
+            columnar_lookup = time_lookups(columnar, sample)
+            identical = all(render(orm, name) == render(numpy, name) == render(columnar, name) for name in names)
+
+        print(f"{rows:>10} {load:>10.3f} s {write:>10.3f} s {orm_lookup * 1e6:>9.1f} us {numpy_lookup * 1e6:>10.1f} us "
+              f"{columnar_lookup * 1e6:>13.1f} us {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
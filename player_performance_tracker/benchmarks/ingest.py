@@ -0,0 +1,44 @@
+"""
+Measures the CSV ingest throughput of DataService.fill_db_from_csv.
+
+With --workers the file is loaded with DataService.fill_db_from_csv_parallel instead.
+
+Usage:
+    python -m benchmarks.ingest --rows 1000000 --players 500 --batch-size 5000
+    python -m benchmarks.ingest --rows 1000000 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from . import setup_django
+from .synthetic import write_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from stats_api.services import DataService
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "synthetic.csv")
+        write_csv(file_path, args.rows, args.players)
+        start = time.perf_counter()
+        if args.workers:
+            rows = DataService.fill_db_from_csv_parallel(file_path, args.workers, args.batch_size)
+        else:
+            rows = DataService.fill_db_from_csv(file_path, args.batch_size)
+        elapsed = time.perf_counter() - start
+
+    print(f"{rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
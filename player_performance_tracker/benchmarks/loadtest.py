@@ -0,0 +1,170 @@
+"""
+Load test of the player stats endpoint under WSGI (gunicorn) and ASGI (uvicorn).
+
+Each server is started with a single worker process, then a number of concurrent keep-alive clients request
+random players for a fixed time. Throughput and latency percentiles are reported per server. gunicorn and uvicorn
+have to be installed (the "server" extra). With --url an already running server is tested instead.
+
+Usage:
+    python -m benchmarks.loadtest --concurrency 64 --duration 10
+    python -m benchmarks.loadtest --no-cache --engine numpy
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from . import PROJECT_DIR
+
+SERVERS = {
+    "wsgi": ["gunicorn", "player_performance_tracker.wsgi", "--workers", "1", "--threads", "8",
+             "--bind", "127.0.0.1:{port}"],
+    "asgi": ["uvicorn", "player_performance_tracker.asgi:application", "--workers", "1",
+             "--host", "127.0.0.1", "--port", "{port}", "--no-access-log"],
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def client(host, port, paths, deadline, latencies, errors):
+    """
+    Sends requests over a keep-alive connection until the deadline, reconnecting when the server closes it.
+    """
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+        path = random.choice(paths)
+        start = time.perf_counter()
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        try:
+            status = await reader.readline()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                while size := int((await reader.readline()).strip(), 16):
+                    await reader.readexactly(size + 2)
+                await reader.readline()
+            else:
+                await reader.readexactly(int(headers.get("content-length", 0)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            errors.append(path)
+            writer.close()
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if not status.split()[1:2] == [b"200"]:
+            errors.append(path)
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, paths, concurrency, duration):
+    """
+    Runs the load test against a server.
+
+    Returns:
+        dict: The number of requests and errors, the throughput and the latency percentiles.
+    """
+    parts = urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(parts.hostname, parts.port or 80, paths, deadline, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start.")
+
+
+def start_server(kind, port, env):
+    command = [part.format(port=port) for part in SERVERS[kind]]
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_server(port)
+    return process
+
+
+def player_paths(data_file):
+    with open(data_file, encoding="utf-8-sig") as csv_file:
+        names = {row["PLAYER"] for row in csv.DictReader(csv_file)}
+    return [f"/stats/player/{quote(name)}/" for name in sorted(names)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--servers", nargs="+", default=list(SERVERS), choices=list(SERVERS))
+    parser.add_argument("--url", help="Test an already running server instead of starting one.")
+    parser.add_argument("--data-file", help="The CSV file loaded by the server. Defaults to DataService.FILE_PATH.")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--engine", default="orm")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache of the server.")
+    args = parser.parse_args()
+
+    data_file = args.data_file or os.path.join(
+        PROJECT_DIR, "stats_api", "data", "L9HomeworkChallengePlayersInput.csv")
+    paths = player_paths(data_file)
+    targets = [("url", args.url)] if args.url else [(kind, None) for kind in args.servers]
+
+    print(f"{'server':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    for kind, url in targets:
+        process = None
+        if url is None:
+            port = free_port()
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE="benchmarks.settings",
+                       BENCHMARK_DATA_FILE=data_file, BENCHMARK_ENGINE=args.engine,
+                       BENCHMARK_ASYNC_VIEWS="1" if kind == "asgi" else "0",
+                       BENCHMARK_RESPONSE_CACHE="0" if args.no_cache else "1")
+            process = start_server(kind, port, env)
+            url = f"http://127.0.0.1:{port}"
+        try:
+            result = asyncio.run(run_load(url, paths, args.concurrency, args.duration))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        print(f"{kind:>8} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>9.0f} "
+              f"{result['p50'] * 1000:>7.1f}ms {result['p99'] * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Measures the memory of gunicorn workers with and without loading the data in the master process.
+
+gunicorn is started with the NumPy engine, a number of threaded workers and a new database file, once with the
+default settings, where one worker loads the CSV file and every worker builds its own engine and indexes, and once
+with gunicorn.preload.conf.py, where the master does both before forking. Random players are then requested with
+their percentiles, and names are searched, so the workers touch the data as they do when serving, and the RSS, PSS
+and USS of every worker are read from /metrics (see stats_api.metrics.process_memory). The total is the PSS of the
+master and all workers, which is the memory they use together. Requires Linux and gunicorn (the "server" extra).
+
+Usage:
+    python -m benchmarks.preload --rows 200000 --players 20000 --workers 4
+"""
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from urllib.parse import quote
+
+from . import PROJECT_DIR, setup_django
+from .loadtest import free_port, wait_for_server
+from .synthetic import write_csv
+
+MEMORY_SAMPLE = re.compile(r'^stats_process_memory_bytes\{pid="(\d+)",kind="(\w+)"\} (\d+)$', re.MULTILINE)
+
+
+def start_gunicorn(port, workers, env, preload):
+    command = ["gunicorn", "player_performance_tracker.wsgi", "--workers", str(workers),
+               "--threads", "4", "--bind", f"127.0.0.1:{port}", "--timeout", "600"]
+    if preload:
+        command[1:1] = ["-c", "gunicorn.preload.conf.py"]
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_server(port, timeout=600)
+    return process
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=600) as response:
+        return response.read().decode()
+
+
+def worker_memory(url, workers, timeout=600):
+    """
+    Requests /metrics until every worker has answered.
+
+    Returns:
+        dict: A dictionary mapping every worker pid to a dictionary of its memory by kind.
+    """
+    memory = {}
+    deadline = time.time() + timeout
+    while len(memory) < workers and time.time() < deadline:
+        samples = {}
+        for pid, kind, value in MEMORY_SAMPLE.findall(get(f"{url}/metrics")):
+            samples.setdefault(int(pid), {})[kind] = int(value)
+        memory.update(samples)
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from stats_api.metrics import process_memory
+
+    rng = random.Random(0)
+    print(f"{'mode':>10} {'ready':>8} {'worker RSS':>11} {'worker PSS':>11} {'worker USS':>11} {'total PSS':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "synthetic.csv")
+        write_csv(data_file, args.rows, args.players)
+        for preload in (False, True):
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE="benchmarks.settings", BENCHMARK_DATA_FILE=data_file,
+                       BENCHMARK_DATABASE=os.path.join(directory, f"preload-{preload}.sqlite3"),
+                       BENCHMARK_ENGINE="numpy", BENCHMARK_RESPONSE_CACHE="0")
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            start = time.perf_counter()
+            process = start_gunicorn(port, args.workers, env, preload)
+            try:
+                worker_memory(url, args.workers)
+                ready = time.perf_counter() - start
+                for _ in range(args.requests):
+                    name = f"Synthetic Player {rng.randrange(args.players)}"
+                    get(f"{url}/stats/player/{quote(name)}/?percentiles=true")
+                    get(f"{url}/stats/search?q={name.split()[-1][:3]}&fuzzy=1")
+                memory = worker_memory(url, args.workers)
+                master = process_memory(process.pid)
+            finally:
+                process.terminate()
+                process.wait()
+            if len(memory) < args.workers:
+                sys.exit(f"Only {len(memory)} of {args.workers} workers answered.")
+            mean = {kind: sum(sample[kind] for sample in memory.values()) / len(memory) / 2 ** 20
+                    for kind in ("rss", "pss", "uss")}
+            total = (sum(sample["pss"] for sample in memory.values()) + master.get("pss", 0)) / 2 ** 20
+            print(f"{'preload' if preload else 'default':>10} {ready:>6.1f} s {mean['rss']:>8.1f} MB "
+                  f"{mean['pss']:>8.1f} MB {mean['uss']:>8.1f} MB {total:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
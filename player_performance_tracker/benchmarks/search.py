@@ -0,0 +1,95 @@
+"""
+Measures the player name search index.
+
+For every roster size the database is filled with players with generated names, then the time to build the index,
+the time to patch it with newly added players and the latency of prefix and fuzzy searches are measured. The
+queries are prefixes of random names, with one character replaced for the fuzzy searches.
+
+Usage:
+    python -m benchmarks.search --players 10000 100000 200000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from . import setup_django
+
+SYLLABLES = ["an", "bel", "car", "da", "el", "fa", "gio", "ha", "ja", "ko", "lu", "ma", "ni", "o", "pe", "ra",
+             "sa", "ta", "vi", "wen", "xa", "yu", "zo", "ć", "é"]
+
+
+def generate_names(count, seed=0):
+    """
+    Generates distinct two-word player names.
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        first = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        names.add(f"{first} {last}")
+    return sorted(names)
+
+
+def latencies(function, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[10_000, 100_000, 200_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from stats_api.cache import dataset_version
+    from stats_api.models import Player
+    from stats_api.search import NameIndex, normalize_name
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(1)
+    print(f"{'players':>8} {'build':>9} {'patch':>9} {'prefix p50/p99':>18} {'fuzzy=1 p50/p99':>18} "
+          f"{'fuzzy=2 p50/p99':>18}")
+    for players in args.players:
+        names = generate_names(players + 100)
+        Player.objects.all().delete()
+        Player.objects.bulk_create([Player(player_name=name, position="PG") for name in names[:players]],
+                                   batch_size=5000)
+        dataset_version.bump()
+        index = NameIndex()
+        start = time.perf_counter()
+        index.ensure_loaded()
+        build = time.perf_counter() - start
+
+        Player.objects.bulk_create([Player(player_name=name, position="PG") for name in names[players:]])
+        dataset_version.bump()
+        start = time.perf_counter()
+        index.ensure_loaded()
+        patch = time.perf_counter() - start
+
+        prefixes = []
+        for name in rng.sample(names, args.queries):
+            word = rng.choice(normalize_name(name).split(" "))
+            prefixes.append(word[:rng.randint(3, max(3, len(word)))])
+        typos = []
+        for prefix in prefixes:
+            position = rng.randrange(len(prefix))
+            typos.append(prefix[:position] + rng.choice("aeiouxz") + prefix[position + 1:])
+
+        prefix = latencies(index.search, prefixes)
+        fuzzy_1 = latencies(lambda query: index.search(query, 1), typos)
+        fuzzy_2 = latencies(lambda query: index.search(query, 2), typos)
+        print(f"{players:>8} {build * 1000:>7.0f}ms {patch * 1000:>7.0f}ms " + " ".join(
+            f"{p50 * 1e6:>8.0f}/{p99 * 1e6:<6.0f}us" for p50, p99 in (prefix, fuzzy_1, fuzzy_2)))
+
+
+if __name__ == "__main__":
+    main()
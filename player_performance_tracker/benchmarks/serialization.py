@@ -0,0 +1,82 @@
+"""
+Measures the CPU time needed to turn the aggregated statistics of a player into a response body.
+
+Three paths are compared on the same random aggregates: building an unsaved PlayerStats and running it through
+PlayerStatsAggregateSerializer and DRF's JSONRenderer (the previous path), 'player_stats_to_dict' with DRF's
+JSONRenderer, and 'player_stats_to_dict' with the orjson renderer. No database is needed.
+
+Usage:
+    python -m benchmarks.serialization --responses 20000
+"""
+import argparse
+import random
+import time
+
+from . import setup_django
+
+
+def aggregated_samples(count, seed=0):
+    from stats_api.models import Player, PlayerStats
+
+    rng = random.Random(seed)
+    player = Player(player_name="Benchmark Player", games_played=82)
+    return [{"player": player, **{f"avg_{field}": rng.randint(0, 400) / 41
+                                  for field in PlayerStats.CSV_MAPPING.values()}}
+            for _ in range(count)]
+
+
+def serializer_path(aggregated_data):
+    from rest_framework.renderers import JSONRenderer
+    from stats_api.serializers import PlayerStatsAggregateSerializer
+    from stats_api.services import PlayerStatsService
+
+    stats = PlayerStatsService.create_stats_from_aggregated(aggregated_data)
+    return JSONRenderer().render(PlayerStatsAggregateSerializer(stats).data)
+
+
+def dict_path(aggregated_data):
+    from rest_framework.renderers import JSONRenderer
+    from stats_api.serializers import player_stats_to_dict
+
+    return JSONRenderer().render(player_stats_to_dict(aggregated_data))
+
+
+def orjson_path(aggregated_data):
+    from stats_api.renderers import OrjsonRenderer
+    from stats_api.serializers import player_stats_to_dict
+
+    return OrjsonRenderer().render(player_stats_to_dict(aggregated_data))
+
+
+def time_path(path, samples):
+    start = time.process_time()
+    for aggregated_data in samples:
+        path(aggregated_data)
+    return (time.process_time() - start) / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=20_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from stats_api.renderers import orjson
+
+    samples = aggregated_samples(args.responses)
+    paths = [("serializer + drf", serializer_path), ("dict + drf", dict_path)]
+    if orjson is not None:
+        paths.append(("dict + orjson", orjson_path))
+
+    baseline = None
+    print(f"{'path':>18}  {'per response':>12}  {'speedup':>8}  identical")
+    for name, path in paths:
+        identical = all(path(sample) == serializer_path(sample) for sample in samples[:1000])
+        path(samples[0])
+        per_response = time_path(path, samples)
+        baseline = baseline or per_response
+        print(f"{name:>18}  {per_response * 1e6:>9.1f} us  {baseline / per_response:>7.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Settings used by benchmarks that start the application in a separate process.
+
+The benchmark passes its options through environment variables.
+"""
+import os
+
+from player_performance_tracker.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+
+if os.environ.get("BENCHMARK_DATABASE"):
+    DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.environ["BENCHMARK_DATABASE"],
+                             "CONN_MAX_AGE": None}}
+STATS_DATA_FILE = os.environ.get("BENCHMARK_DATA_FILE") or None
+STATS_SNAPSHOT_DIR = os.environ.get("BENCHMARK_SNAPSHOT_DIR") or None
+STATS_ASYNC_VIEWS = os.environ.get("BENCHMARK_ASYNC_VIEWS") == "1"
+STATS_ENGINE = os.environ.get("BENCHMARK_ENGINE", "orm")
+if os.environ.get("BENCHMARK_RESPONSE_CACHE") == "0":
+    STATS_RESPONSE_CACHE = {"MAX_ENTRIES": 0}
@@ -0,0 +1,63 @@
+"""
+Measures how long the application takes to start with and without a warm-start snapshot.
+
+Every start runs in a new process that only calls django.setup(), which migrates the in-memory database and loads
+the data file. The first start with snapshots enabled ingests the CSV file and saves a snapshot, the following
+ones restore it.
+
+Usage:
+    python -m benchmarks.startup --rows 10000 100000 1000000 --repeat 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import PROJECT_DIR
+from .synthetic import write_csv
+
+STARTUP_CODE = "import django; django.setup()"
+
+
+def time_startup(data_file, snapshot_dir):
+    """
+    Starts the application in a new process.
+
+    Returns:
+        float: The wall clock time of the start in seconds.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="benchmarks.settings",
+               BENCHMARK_DATA_FILE=data_file, BENCHMARK_SNAPSHOT_DIR=snapshot_dir or "")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STARTUP_CODE], cwd=PROJECT_DIR,
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'no snapshot':>12} {'first start':>12} {'warm start':>11}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, "synthetic.csv")
+            snapshot_dir = os.path.join(directory, "snapshots")
+            write_csv(data_file, rows, args.players)
+
+            cold = min(time_startup(data_file, None)
+                       for _ in range(args.repeat))
+            first = time_startup(data_file, snapshot_dir)
+            warm = min(time_startup(data_file, snapshot_dir)
+                       for _ in range(args.repeat))
+        print(f"{rows:>10} {cold:>10.2f} s {first:>10.2f} s {warm:>9.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures the storage of the PlayerStats table and the time to scan it.
+
+For every dataset size a synthetic CSV file is ingested into the in-memory database, then the size of the table and
+its indexes is read from SQLite's dbstat table, and the time of a full scan summing every statistic, of the
+per player GROUP BY that rebuilds PlayerAggregate and of loading the NumPy engine is measured, along with the
+memory taken by the rows once read into Python.
+
+Usage:
+    python -m benchmarks.storage --rows 100000 1000000 --players 500
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from . import setup_django
+from .synthetic import write_csv
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from stats_api.engines import NumpyStatsEngine
+    from stats_api.models import IngestCheckpoint, Player, PlayerAggregate, PlayerStats
+    from stats_api.services import DataService
+
+    table = PlayerStats._meta.db_table
+    fields = list(PlayerStats.CSV_MAPPING.values())
+    sums = ", ".join(f"SUM({connection.ops.quote_name(field)})" for field in fields)
+    print(f"{'rows':>10} {'ingest':>11} {'table':>9} {'indexes':>9} {'bytes/row':>10} {'scan':>9} "
+          f"{'group by':>9} {'numpy load':>11} {'python rows':>12}")
+    for rows in args.rows:
+        Player.objects.all().delete()
+        IngestCheckpoint.objects.all().delete()
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, "synthetic.csv")
+            write_csv(data_file, rows, args.players)
+            start = time.perf_counter()
+            DataService.fill_db_from_csv(data_file)
+            ingest = rows / (time.perf_counter() - start)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE tbl_name = %s", [table])
+            names = {name for name, _ in cursor.fetchall()}
+            cursor.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+            sizes = {name: size for name, size in cursor.fetchall() if name in names}
+        table_size = sizes.pop(table)
+        index_size = sum(sizes.values())
+
+        def scan():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT {sums} FROM {table}")
+                cursor.fetchall()
+
+        scan_time = best_of(scan, args.repeat)
+        group_by = best_of(PlayerAggregate.compute_from_stats, args.repeat)
+        numpy_load = best_of(lambda: NumpyStatsEngine().load(), args.repeat)
+        tracemalloc.start()
+        loaded = list(PlayerStats.objects.values_list(*fields))
+        python_rows = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+        print(f"{rows:>10} {ingest:>7.0f} r/s {table_size / 2 ** 20:>6.1f} MB {index_size / 2 ** 20:>6.1f} MB "
+              f"{(table_size + index_size) / rows:>10.1f} {scan_time * 1000:>6.0f} ms {group_by * 1000:>6.0f} ms "
+              f"{numpy_load * 1000:>8.0f} ms {python_rows / 2 ** 20:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Runs the benchmark suite and reports the results as JSON.
+
+For every dataset size a synthetic CSV file is generated and measured with:
+
+- ingest: the throughput of DataService.fill_db_from_csv in rows/sec.
+- endpoint: the latency percentiles of GET /stats/player/<name>/ through Django's test client, with and without
+  the response cache.
+- serializer: the CPU time per response of the current serialization path and of the previous
+  PlayerStatsAggregateSerializer path.
+- queries: the latency percentiles of the stats engine lookup, of averaging a player's games with the ORM and of
+  the leaders ranking.
+
+The JSON has stable keys, so the results of two commits can be diffed, or compared with --compare.
+
+Usage:
+    python -m benchmarks.suite --rows 1000 10000 100000 --output results.json
+    python -m benchmarks.suite --players 500 --games 82 --engine numpy
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from . import PROJECT_DIR, setup_django
+from .serialization import aggregated_samples, serializer_path
+from .synthetic import write_csv
+
+
+def summarize(seconds):
+    """
+    Summarizes timings as milliseconds.
+
+    Args:
+        seconds (list): The timings in seconds.
+
+    Returns:
+        dict: The mean and the 50th, 95th and 99th percentiles in milliseconds.
+    """
+    ordered = sorted(seconds)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 4)
+
+    return {"mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+            "p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+
+def time_calls(function, arguments):
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def reset_database():
+    from stats_api.cache import dataset_version
+    from stats_api.models import IngestCheckpoint, Player
+
+    Player.objects.all().delete()
+    IngestCheckpoint.objects.all().delete()
+    dataset_version.bump()
+
+
+def bench_ingest(file_path):
+    from stats_api.services import DataService
+
+    start = time.perf_counter()
+    rows = DataService.fill_db_from_csv(file_path)
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(elapsed, 4), "rows_per_sec": round(rows / elapsed, 1)}
+
+
+def bench_endpoint(names):
+    from django.test import Client, override_settings
+    from stats_api.cache import get_response_cache
+
+    client = Client()
+
+    def request(name):
+        response = client.get(f"/stats/player/{name}/")
+        assert response.status_code == 200, response.status_code
+
+    results = {}
+    with override_settings(STATS_RESPONSE_CACHE={"MAX_ENTRIES": 0}):
+        results["uncached"] = time_calls(request, names)
+    get_response_cache().clear()
+    for name in set(names):
+        request(name)
+    results["cached"] = time_calls(request, names)
+    return results
+
+
+def bench_serializer(count):
+    from stats_api.views import render_player_stats
+
+    samples = aggregated_samples(count)
+    results = {}
+    for name, path in [("current", render_player_stats), ("serializer", serializer_path)]:
+        start = time.process_time()
+        for aggregated_data in samples:
+            path(aggregated_data)
+        results[f"{name}_us"] = round((time.process_time() - start) / count * 1e6, 3)
+    return results
+
+
+def bench_queries(names, lookups):
+    from django.db.models import Avg
+    from stats_api.models import PlayerStats
+    from stats_api.services import PlayerStatsService
+
+    averages = {f"avg_{field}": Avg(field) for field in PlayerStats.CSV_MAPPING.values()}
+    return {
+        "engine_lookup": time_calls(PlayerStatsService.get_aggregated_stats, names),
+        "orm_average": time_calls(
+            lambda name: PlayerStats.objects.filter(player__player_name=name).aggregate(**averages), names),
+        "leaders": time_calls(lambda _: PlayerStatsService.get_leaders("tsp"), range(max(1, lookups // 20))),
+    }
+
+
+def environment():
+    """
+    Describes the code and the machine the benchmarks ran on.
+    """
+    import django
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version, "machine": platform.machine(), "cpus": os.cpu_count(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def run(args):
+    # The startup migration prints to stdout, which may be reserved for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        setup_django()
+    from django.test.utils import override_settings, setup_test_environment
+    from stats_api.models import Player
+
+    setup_test_environment()
+    sizes = [None] if args.games else args.rows
+    report = {"environment": environment(),
+              "parameters": {"players": args.players, "games": args.games, "engine": args.engine,
+                             "lookups": args.lookups, "seed": args.seed},
+              "datasets": []}
+    with override_settings(STATS_ENGINE=args.engine), tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            reset_database()
+            file_path = os.path.join(directory, f"synthetic-{rows or args.games}.csv")
+            write_csv(file_path, rows, args.players, args.seed, args.games)
+            result = {"ingest": bench_ingest(file_path)}
+
+            rng = random.Random(args.seed)
+            players = list(Player.objects.values_list("player_name", flat=True))
+            names = [rng.choice(players) for _ in range(args.lookups)]
+            result["endpoint"] = bench_endpoint(names)
+            result["serializer"] = bench_serializer(args.lookups)
+            result["queries"] = bench_queries(names, args.lookups)
+            result["rows"] = result["ingest"]["rows"]
+            report["datasets"].append(result)
+    return report
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(before_path, after_path):
+    """
+    Prints the change of every measurement between two reports, matching datasets by their number of rows.
+    """
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    before_datasets = {dataset["rows"]: dataset for dataset in before["datasets"]}
+    print(f"{'rows':>10}  {'measurement':<36} {'before':>12} {'after':>12} {'change':>8}")
+    for dataset in after["datasets"]:
+        old = dict(flatten(before_datasets.get(dataset["rows"], {})))
+        for key, value in flatten(dataset):
+            if key in old and key != "rows" and old[key]:
+                change = (value - old[key]) / old[key] * 100
+                print(f"{dataset['rows']:>10}  {key:<36} {old[key]:>12} {value:>12} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="The dataset sizes, from 10^3 up to 10^7 rows.")
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--games", type=int, default=None,
+                        help="Give every player this many games instead of generating --rows rows.")
+    parser.add_argument("--engine", default="orm")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare two JSON reports instead of running the benchmarks.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Synthetic CSV generator matching the format expected by DataService.
+
+Usage:
+    python -m benchmarks.synthetic output.csv --rows 1000000 --players 500
+    python -m benchmarks.synthetic output.csv --players 500 --games 82
+"""
+import argparse
+import csv
+import random
+
+HEADER = ["PLAYER", "POSITION", "FTM", "FTA", "2PM",
+          "2PA", "3PM", "3PA", "REB", "BLK", "AST", "STL", "TOV"]
+POSITIONS = ["PG", "SG", "SF", "PF", "C"]
+
+
+def generate_rows(rows, players=500, seed=0, games=None):
+    """
+    Generates box-score rows for a synthetic league.
+
+    Args:
+        rows (int): The number of rows to generate. It is ignored when 'games' is given.
+        players (int): The number of distinct players the rows are spread over.
+        seed (int): The seed of the random generator, so the same arguments always give the same rows.
+        games (int, optional): Give every player exactly this many games, one round of games after another,
+                               instead of spreading 'rows' randomly over the players.
+
+    Yields:
+        list: A row with the values of the columns in HEADER.
+    """
+    rng = random.Random(seed)
+    roster = [(f"Synthetic Player {index}", POSITIONS[index % len(POSITIONS)])
+              for index in range(players)]
+    if games is None:
+        schedule = (rng.choice(roster) for _ in range(rows))
+    else:
+        schedule = (player for _ in range(games) for player in roster)
+    for name, position in schedule:
+        fta, two_pa, three_pa = rng.randint(
+            0, 10), rng.randint(0, 15), rng.randint(0, 10)
+        yield [name, position,
+               rng.randint(0, fta), fta,
+               rng.randint(0, two_pa), two_pa,
+               rng.randint(0, three_pa), three_pa,
+               rng.randint(0, 15), rng.randint(0, 4), rng.randint(0, 12),
+               rng.randint(0, 4), rng.randint(0, 6)]
+
+
+def write_csv(file_path, rows, players=500, seed=0, games=None):
+    """
+    Writes a synthetic CSV file.
+
+    Args:
+        file_path (str): The path of the file to write.
+        rows (int): The number of rows to generate. It is ignored when 'games' is given.
+        players (int): The number of distinct players.
+        seed (int): The seed of the random generator.
+        games (int, optional): The number of games of every player.
+    """
+    with open(file_path, mode="w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(HEADER)
+        writer.writerows(generate_rows(rows, players, seed, games))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--games", type=int, default=None,
+                        help="Give every player this many games instead of generating --rows rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.players, args.seed, args.games)
+
+
+if __name__ == "__main__":
+    main()
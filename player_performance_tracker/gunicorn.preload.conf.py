@@ -0,0 +1,19 @@
+"""
+gunicorn settings loading the data once in the master process and sharing it with the forked workers.
+
+Usage (from this folder):
+    gunicorn -c gunicorn.preload.conf.py --workers 4 player_performance_tracker.wsgi
+
+Requires a file-backed database (see "Multiple workers" in the README and stats_api/preload.py).
+"""
+preload_app = True
+
+
+def when_ready(server):
+    from stats_api.preload import preload
+    preload()
+
+
+def post_fork(server, worker):
+    from stats_api.preload import after_fork
+    after_fork()
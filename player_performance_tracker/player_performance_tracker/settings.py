@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stats_api.middleware.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,15 +78,89 @@ WSGI_APPLICATION = 'player_performance_tracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': 'file::memory:?cache=shared',
-        # 'NAME': BASE_DIR / 'db.sqlite3',
+# The in-memory database is private to each process, so every worker process loads its own copy of the data. With
+# a file-backed database (e.g. DATABASE_FILE = BASE_DIR / 'db.sqlite3'), all workers share one copy in WAL mode: one
+# elected process migrates and ingests and the others only read (see stats_api/db.py). Its connections are
+# persistent, so the PRAGMAS of stats_api/db.py are set once per thread instead of on every request.
+
+DATABASE_FILE = None
+
+if DATABASE_FILE:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': DATABASE_FILE,
+            'CONN_MAX_AGE': None,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': 'file::memory:?cache=shared',
+        }
     }
+
+
+# Stats API
+# Load DataService.FILE_PATH into the database when the application starts. Large files are better
+# loaded once into a file-backed database with 'python manage.py ingest_csv', with this turned off.
+
+STATS_INGEST_ON_STARTUP = True
+
+# The CSV file loaded at startup. None means DataService.FILE_PATH.
+
+STATS_DATA_FILE = None
+
+# After the CSV file is loaded at startup, a compacted copy of the database is saved here, keyed by the hash of the
+# file. The next start restores it instead of reading the CSV file again. None disables snapshots.
+
+STATS_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+
+# Management commands that don't need the data, so the startup migration and ingest are skipped for them.
+
+STATS_STARTUP_SKIP_COMMANDS = [
+    'check',
+    'collectstatic',
+    'createsuperuser',
+    'csv_to_columnar',
+    'ingest_csv',
+    'makemigrations',
+    'migrate',
+    'showmigrations',
+    'sqlmigrate',
+    'squashmigrations',
+    'startapp',
+    'test',
+]
+
+# Rendered player stats responses are cached in memory per player and dataset version. SHARED_CACHE can be
+# set to the alias of a cache in CACHES (e.g. a file-based one) to share warm entries between worker processes;
+# its entries are keyed by the content of the data, which the workers agree on.
+
+STATS_RESPONSE_CACHE = {
+    'MAX_ENTRIES': 1024,
+    'TTL': 300,
+    'SHARED_CACHE': None,
 }
 
 
+# The engine answering player statistics queries: 'orm' reads the PlayerAggregate table, 'numpy' keeps all games
+# in NumPy column arrays in memory (requires NumPy), 'columnar' memory-maps the store in STATS_COLUMNAR_DIR.
+
+STATS_ENGINE = 'orm'
+
+# A directory where DataService writes all games in a memory-mapped columnar format after every ingest, for the
+# 'columnar' engine. None disables writing the store.
+
+STATS_COLUMNAR_DIR = None
+
+
+# Route /stats/player/<name>/ to an async view. Enable this when serving the ASGI application (e.g. with uvicorn).
+
+STATS_ASYNC_VIEWS = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -126,3 +201,37 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# The JSON renderer of the player statistics responses: 'drf' is Django REST framework's JSONRenderer, 'orjson'
+# encodes with orjson (requires orjson).
+
+STATS_JSON_RENDERER = 'drf'
+
+# Cache-Control directives of the stats responses, passed to django.utils.cache.patch_cache_control. Responses carry
+# an ETag tied to the dataset version, so clients and CDNs can revalidate them cheaply.
+
+STATS_CACHE_CONTROL = {'public': True, 'no_cache': True}
+
+# Profile every request with stats_api.middleware.ProfilingMiddleware: send a Server-Timing header with the query
+# count, database, service, serialization and total times, and record latency histograms for the /metrics endpoint.
+
+STATS_PROFILING = False
+
+# The number of processes parsing the CSV file at startup. With more than one, DataService.fill_db_from_csv_parallel
+# is used.
+
+STATS_INGEST_WORKERS = 1
+
+# Files and directories watched for new CSV files and appended rows while the server runs. Directories are scanned
+# for *.csv files every STATS_WATCH_INTERVAL seconds, and a file is ingested once its size stops changing.
+
+STATS_WATCH_PATHS = []
+STATS_WATCH_INTERVAL = 5
+
+# The key clients must send in the X-API-Key header to push CSV data to POST /stats/ingest. Without a key the
+# endpoint is closed unless STATS_INGEST_ALLOW_UNAUTHENTICATED is True, which lets anyone who can reach the server
+# write to the database and is only meant for local development.
+
+STATS_INGEST_API_KEY = None
+
+STATS_INGEST_ALLOW_UNAUTHENTICATED = False
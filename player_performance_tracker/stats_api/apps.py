@@ -1,10 +1,27 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 from django.db import connections
+from django.db.backends.signals import connection_created
 from django.core.management import call_command
 from django.db.utils import OperationalError
 
 
+def current_management_command():
+    """
+    Returns the name of the management command the process was started with.
+
+    Returns:
+        str: The command name, or None if the process was not started through manage.py or django-admin.
+    """
+    if len(sys.argv) > 1 and os.path.basename(sys.argv[0]) in ("manage.py", "django-admin", "django-admin.py"):
+        return sys.argv[1]
+    return None
+
+
 class StatsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stats_api'
@@ -13,18 +30,47 @@ class StatsApiConfig(AppConfig):
         """
         This method is called when the Django application is ready.
 
-        It attempts to perform a migration on the 'stats_api' app without any user input.
-        If the migration is successful, it then calls the 'fill_db_from_csv' method from the 'DataService' class
-        in the 'services.py' module to populate the database from a CSV file.
+        Management commands listed in the STATS_STARTUP_SKIP_COMMANDS setting don't need any data, so nothing is
+        done for them. Otherwise it attempts to perform a migration on the 'stats_api' app without any user input.
+        If the migration is successful and the STATS_INGEST_ON_STARTUP setting is enabled, it then calls the
+        'load_on_startup' method from the 'DataService' class in the 'services.py' module to populate the database
+        from the CSV file in the STATS_DATA_FILE setting, restoring a snapshot of it when one exists.
+
+        If paths are listed in the STATS_WATCH_PATHS setting, a DataWatcher is then started to ingest new files
+        and appended rows from them in the background.
+
+        Independently of the command, shared-cache SQLite connections are set up to wait for table locks
+        (see 'stats_api.db').
+
+        With a file-backed database, which several worker processes share, the dataset version is shared through
+        a file next to the database, and only the process elected as the writer migrates, ingests and watches for
+        new data. The other processes start without touching the data and serve it with read-only connections.
 
         If the database is not ready (an OperationalError is raised), it prints a message to the console.
 
         Raises:
             OperationalError: An error occurred while attempting to access the database.
         """
+        from .cache import dataset_version
+        from .db import configure_connection, elect_writer, uses_file_database
+        connection_created.connect(configure_connection, dispatch_uid="stats_api_configure_connection")
+        database = connections['default']
+        if uses_file_database(database):
+            dataset_version.share(f"{database.settings_dict['NAME']}.version")
+        if current_management_command() in getattr(settings, 'STATS_STARTUP_SKIP_COMMANDS', []):
+            return
+        if uses_file_database(database) and not elect_writer(f"{database.settings_dict['NAME']}.writer.lock"):
+            return
         try:
             call_command('migrate', 'stats_api', '--noinput')
-            from .services import DataService
-            DataService.fill_db_from_csv()
+            if getattr(settings, 'STATS_INGEST_ON_STARTUP', True):
+                from .services import DataService
+                DataService.load_on_startup(getattr(settings, 'STATS_DATA_FILE', None))
         except OperationalError:
             print('Database is not ready yet.')
+            return
+        watch_paths = getattr(settings, 'STATS_WATCH_PATHS', [])
+        if watch_paths:
+            from .watch import DataWatcher
+            self.watcher = DataWatcher(watch_paths, getattr(settings, 'STATS_WATCH_INTERVAL', 5))
+            self.watcher.start()
@@ -0,0 +1,396 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_microseconds(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(microseconds):
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+class DatasetVersion:
+    """
+    A counter identifying the data currently loaded into the database.
+
+    DataService bumps the version after every ingest, so anything derived from the data (cached responses,
+    in-memory indexes) can tell whether it is stale by comparing versions.
+
+    The version is kept per process, unless 'share' was called: then it is kept in a file next to a database that
+    several processes use, and a bump in one process is seen by all of them, with the same entity tag.
+
+    Attributes:
+        version (int): The current version. It starts at 0 and is increased by 'bump'.
+        updated_at (datetime): When the version was last bumped.
+        etag (str): An entity tag for responses built from the current version. It includes the time of the bump,
+                    so versions of different processes or runs never share a tag.
+        path (str): The file the version is shared through, or None.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._updated_at = timezone.now()
+        self._etag = self._make_etag()
+        self._stat = None
+        self.path = None
+
+    def _make_etag(self):
+        return f"{self._version}-{to_microseconds(self._updated_at):x}"
+
+    @property
+    def version(self):
+        self._refresh()
+        return self._version
+
+    @property
+    def updated_at(self):
+        self._refresh()
+        return self._updated_at
+
+    @property
+    def etag(self):
+        self._refresh()
+        return self._etag
+
+    def share(self, path):
+        """
+        Shares the version with the other processes sharing 'path', creating the file if it does not exist.
+
+        Args:
+            path (str): The path of the version file.
+        """
+        with self._lock:
+            self.path = path
+            self._stat = None
+            with self._file_lock():
+                if not self._read():
+                    self._write()
+
+    def _refresh(self):
+        """
+        Reads the shared version if the version file was replaced since it was last read.
+        """
+        if self.path is None:
+            return
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_mtime_ns) != self._stat:
+            with self._lock:
+                self._read()
+
+    def _read(self):
+        try:
+            stat = os.stat(self.path)
+            with open(self.path, encoding="utf-8") as version_file:
+                version, timestamp = version_file.read().split()
+        except (OSError, ValueError):
+            return False
+        self._version = int(version)
+        self._updated_at = from_microseconds(int(timestamp))
+        self._etag = self._make_etag()
+        self._stat = (stat.st_ino, stat.st_mtime_ns)
+        return True
+
+    def _write(self):
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as version_file:
+            version_file.write(f"{self._version} {to_microseconds(self._updated_at)}\n")
+        os.replace(temporary_path, self.path)
+        stat = os.stat(self.path)
+        self._stat = (stat.st_ino, stat.st_mtime_ns)
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Serializes bumps of the shared version between processes.
+        """
+        if self.path is None or fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def bump(self):
+        """
+        Increases the version after the data has changed.
+
+        Returns:
+            int: The new version.
+        """
+        with self._lock, self._file_lock():
+            if self.path is not None:
+                self._read()
+            self._version += 1
+            self._updated_at = timezone.now()
+            self._etag = self._make_etag()
+            if self.path is not None:
+                self._write()
+            return self._version
+
+
+dataset_version = DatasetVersion()
+
+
+class DatasetContent:
+    """
+    A key identifying the data in the database by its content.
+
+    The entity tag of DatasetVersion includes the time of a bump in one process, so two worker processes that
+    loaded the same file never share it. This key is derived from the data instead: the hash and row count of every
+    ingested file, the number of games and the totals of all players. It is computed once per dataset version, and
+    keys the cached responses, so processes holding the same data reuse each other's entries in a shared cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._key = None
+
+    @property
+    def key(self):
+        """
+        str: The key of the current data, computed if the dataset version changed since it was last computed.
+        """
+        version = dataset_version.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._key = self.compute()
+                    self._version = version
+        return self._key
+
+    async def akey(self):
+        """
+        Gets 'key' without querying the database on the event loop.
+
+        Returns:
+            str: The key of the current data.
+        """
+        if self._version == dataset_version.version:
+            return self._key
+        return await sync_to_async(lambda: self.key)()
+
+    @staticmethod
+    def compute():
+        """
+        Computes the key from the database.
+
+        Returns:
+            str: A hexadecimal digest of the ingested files, the number of games and the totals of all players.
+        """
+        from django.db.models import Count, Max, Sum
+        from .models import IngestCheckpoint, PlayerAggregate, PlayerStats
+
+        digest = hashlib.sha256()
+        for file_hash, rows_done in IngestCheckpoint.objects.order_by("file_hash").values_list(
+                "file_hash", "rows_done"):
+            digest.update(f"{file_hash}:{rows_done};".encode())
+        digest.update(repr(sorted(PlayerStats.objects.aggregate(Count("pk"), Max("pk")).items())).encode())
+        totals = PlayerAggregate.objects.aggregate(
+            Sum("games"), *(Sum(field) for field in PlayerAggregate.SUM_FIELDS.values()))
+        digest.update(repr(sorted(totals.items())).encode())
+        return digest.hexdigest()[:32]
+
+
+dataset_content = DatasetContent()
+
+
+class ResponseCache:
+    """
+    A bounded LRU cache of rendered response bodies.
+
+    Entries expire 'ttl' seconds after they were stored, and the least recently used entry is evicted when
+    the cache holds 'max_entries' entries. If 'shared_cache' names a cache from Django's CACHES setting,
+    entries are also stored there, so several worker processes can share warm entries.
+
+    Attributes:
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that were not in the cache or had expired.
+        evictions (int): The number of entries removed to make room for new ones.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, shared_cache=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_cache = caches[shared_cache] if shared_cache else None
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Builds a cache key that is safe to use with any of Django's cache backends.
+
+        Args:
+            *parts: The values identifying the entry.
+
+        Returns:
+            str: The cache key.
+        """
+        return "stats_api:" + ":".join(quote(str(part), safe="") for part in parts)
+
+    def get(self, key):
+        """
+        Gets a cached response body.
+
+        Args:
+            key (str): The key returned by 'make_key'.
+
+        Returns:
+            bytes: The cached body, or None if there is no valid entry for the key.
+        """
+        content = self._get_local(key)
+        if content is not None:
+            return content
+        return self._record_shared(key, self.shared_cache.get(key) if self.shared_cache else None)
+
+    async def aget(self, key):
+        """
+        Gets a cached response body without blocking the event loop on the shared cache.
+
+        Args:
+            key (str): The key returned by 'make_key'.
+
+        Returns:
+            bytes: The cached body, or None if there is no valid entry for the key.
+        """
+        content = self._get_local(key)
+        if content is not None:
+            return content
+        return self._record_shared(key, await self.shared_cache.aget(key) if self.shared_cache else None)
+
+    def set(self, key, content):
+        """
+        Stores a response body.
+
+        Args:
+            key (str): The key returned by 'make_key'.
+            content (bytes): The rendered response body.
+        """
+        with self._lock:
+            self._store(key, content)
+        if self.shared_cache:
+            self.shared_cache.set(key, content, timeout=self.ttl)
+
+    async def aset(self, key, content):
+        """
+        Stores a response body without blocking the event loop on the shared cache.
+
+        Args:
+            key (str): The key returned by 'make_key'.
+            content (bytes): The rendered response body.
+        """
+        with self._lock:
+            self._store(key, content)
+        if self.shared_cache:
+            await self.shared_cache.aset(key, content, timeout=self.ttl)
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, content = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return content
+            del self._entries[key]
+            return None
+
+    def _record_shared(self, key, content):
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, content)
+            return content
+
+    def _store(self, key, content):
+        self._entries[key] = (self._clock() + self.ttl, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all local entries and resets the counters. The shared cache is left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of hits, misses, evictions and the current number of local entries.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries)}
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """
+    Returns the response cache configured by the STATS_RESPONSE_CACHE setting.
+
+    The setting is a dictionary with the optional keys MAX_ENTRIES, TTL and SHARED_CACHE.
+
+    Returns:
+        ResponseCache: The process-wide response cache.
+    """
+    global _response_cache
+    if _response_cache is None:
+        options = getattr(settings, "STATS_RESPONSE_CACHE", {})
+        _response_cache = ResponseCache(
+            max_entries=options.get("MAX_ENTRIES", 1024),
+            ttl=options.get("TTL", 300),
+            shared_cache=options.get("SHARED_CACHE"))
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting == "STATS_RESPONSE_CACHE":
+        _response_cache = None
@@ -0,0 +1,261 @@
+"""
+A memory-mapped columnar format for the games of all players.
+
+A store is a directory holding the current generation of the data and the one before it:
+
+    <directory>/CURRENT               the name of the current generation
+    <directory>/<generation>/index.json
+    <directory>/<generation>/<field>.bin
+
+Every '<field>.bin' file is a fixed-width array with the values of one statistic for every game, with the games of
+each player stored contiguously. 'index.json' lists the fields with the array typecode of their file and the players
+with their position, the offset of their first game and their number of games. The typecode of a field is the
+narrowest of TYPECODES that holds all its values exactly: 'B' and 'H' for whole numbers below 256 and 65,536, 'f' for
+values that fit in 32-bit floats and 'd' for everything else. Readers map the files with mmap, so the per player statistics are read from
+contiguous slices of the page cache, which is shared by all processes reading the same store.
+
+A new generation is written next to the current one and made current by replacing 'CURRENT', so readers always
+see a complete store. It can be written from a base generation and the games added after it: the slices of the base
+are copied and the new games of each player are appended to its slice, so only the new games are collected. The
+index records the 'last_id' given by the writer, e.g. the id of the last game in the database, so the writer can
+tell which games a generation already holds. Readers that still have the previous generation mapped keep reading it until they reopen.
+The previous generation is only removed by the write after the next one, so a reader that read 'CURRENT' just
+before it was replaced can still open the files it names.
+
+Slices are summed with NumPy when it is installed, through arrays sharing the mapped memory, and with the built-in
+'sum' otherwise. Like 'parsing', this module does not import Django.
+"""
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "index.json"
+TYPECODES = ("B", "H", "f", "d")
+
+
+def current_generation(directory):
+    """
+    Reads the name of the current generation of a store.
+
+    Args:
+        directory (str): The directory of the store.
+
+    Returns:
+        str: The name of the generation, or None if no store was written to the directory.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as current_file:
+            return current_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def exact_typecode(columns):
+    """
+    Chooses the narrowest array typecode that stores every value of a column exactly.
+
+    Args:
+        columns (list): The arrays of 'd' values of the column.
+
+    Returns:
+        str: One of TYPECODES.
+    """
+    for typecode in TYPECODES:
+        try:
+            if all(array("d", as_typecode(values, typecode)) == values for values in columns):
+                return typecode
+        except (OverflowError, ValueError):
+            continue
+    return "d"
+
+
+def as_typecode(values, typecode):
+    if typecode in "fd":
+        return array(typecode, values)
+    return array(typecode, map(int, values))
+
+
+class ColumnarBuilder:
+    """
+    Collects games in memory, grouped by player, and writes them as a columnar store.
+
+    Attributes:
+        fields (list): The names of the statistics, in the order of the values passed to 'add'.
+        players (dict): A dictionary mapping every player name to its position and one array of values per field.
+        rows (int): The number of games added.
+        last_id (int): An id for the last game added, recorded in the index. None if not set.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.players = {}
+        self.rows = 0
+        self.last_id = None
+
+    def add(self, player_name, position, values):
+        """
+        Adds a game.
+
+        Args:
+            player_name (str): The name of the player.
+            position (str): The position of the player. The position of the first game of a player is kept.
+            values (iterable): The statistics of the game, in the order of 'fields'.
+        """
+        entry = self.players.get(player_name)
+        if entry is None:
+            entry = self.players[player_name] = (position, [array("d") for _ in self.fields])
+        for column, value in zip(entry[1], values):
+            column.append(value)
+        self.rows += 1
+
+    def write(self, directory, base=None):
+        """
+        Writes the collected games as a new generation of the store in 'directory' and makes it current.
+
+        The generation that was current until then is kept for the readers that are opening it, and older
+        generations are removed.
+
+        Args:
+            directory (str): The directory of the store. It is created if it does not exist.
+            base (ColumnarStore, optional): A generation holding the games that come before the collected ones.
+                                            The games of every player are written after the player's games in it.
+
+        Returns:
+            str: The name of the new generation.
+        """
+        os.makedirs(directory, exist_ok=True)
+        generation = f"{time.time_ns():x}-{os.getpid()}"
+        path = os.path.join(directory, generation)
+        os.makedirs(path)
+
+        base_players = base.players if base is not None else {}
+        # The base players keep their order, followed by the players that are new
+        order = sorted(base_players, key=lambda player_name: base_players[player_name][1])
+        order += [player_name for player_name in self.players if player_name not in base_players]
+        fields = {}
+        for index, field in enumerate(self.fields):
+            typecode = exact_typecode([columns[index] for _, columns in self.players.values()])
+            if base is not None:
+                typecode = max(typecode, base.columns[field].format, key=TYPECODES.index)
+            with open(os.path.join(path, f"{field}.bin"), "wb") as column_file:
+                for player_name in order:
+                    if player_name in base_players:
+                        _, start, count = base_players[player_name]
+                        values = base.columns[field][start:start + count]
+                        if values.format == typecode:
+                            column_file.write(values)
+                        else:
+                            as_typecode(values.tolist(), typecode).tofile(column_file)
+                    if player_name in self.players:
+                        as_typecode(self.players[player_name][1][index], typecode).tofile(column_file)
+            fields[field] = typecode
+
+        players = []
+        start = 0
+        for player_name in order:
+            if player_name in base_players:
+                position, _, count = base_players[player_name]
+            else:
+                position, count = self.players[player_name][0], 0
+            if player_name in self.players and self.fields:
+                count += len(self.players[player_name][1][0])
+            players.append([player_name, position, start, count])
+            start += count
+        index = {"format": FORMAT_VERSION, "byteorder": sys.byteorder, "rows": start, "last_id": self.last_id,
+                 "fields": fields, "players": players}
+        with open(os.path.join(path, INDEX_FILE), "w", encoding="utf-8") as index_file:
+            json.dump(index, index_file)
+
+        temporary_path = os.path.join(directory, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(temporary_path, "w", encoding="utf-8") as current_file:
+            current_file.write(generation)
+        previous = current_generation(directory)
+        os.replace(temporary_path, os.path.join(directory, CURRENT_FILE))
+
+        for name in os.listdir(directory):
+            old_path = os.path.join(directory, name)
+            if name not in (generation, previous) and os.path.isdir(old_path):
+                shutil.rmtree(old_path, ignore_errors=True)
+        return generation
+
+
+class ColumnarStore:
+    """
+    A read-only view of the current generation of a columnar store.
+
+    The column files are mapped into memory when the store is opened and are read without copying.
+
+    Attributes:
+        generation (str): The name of the generation that was opened.
+        rows (int): The number of games.
+        last_id (int): The id of the last game given by the writer, or None.
+        columns (dict): A dictionary mapping every field to a memoryview of its values.
+        players (dict): A dictionary mapping every player name to a (position, start, count) tuple.
+    """
+
+    def __init__(self, directory):
+        """
+        Opens the current generation of a store.
+
+        Args:
+            directory (str): The directory of the store.
+
+        Raises:
+            FileNotFoundError: If no store was written to the directory.
+            ValueError: If the store was written in another format or byte order.
+        """
+        self.generation = current_generation(directory)
+        if self.generation is None:
+            raise FileNotFoundError(f"No columnar store in {directory}.")
+        path = os.path.join(directory, self.generation)
+        with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        if index["format"] != FORMAT_VERSION or index["byteorder"] != sys.byteorder:
+            raise ValueError(f"The columnar store in {directory} was written in an incompatible format.")
+
+        self.rows = index["rows"]
+        self.last_id = index.get("last_id")
+        self.columns = {}
+        for field, typecode in index["fields"].items():
+            if not self.rows:
+                self.columns[field] = memoryview(array(typecode))
+                continue
+            with open(os.path.join(path, f"{field}.bin"), "rb") as column_file:
+                mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.columns[field] = memoryview(mapped).cast(typecode)
+        self.players = {player_name: (position, start, count)
+                        for player_name, position, start, count in index["players"]}
+        self._arrays = None if np is None else {
+            field: np.frombuffer(values, dtype=values.format) for field, values in self.columns.items()}
+
+    def totals(self, player_name):
+        """
+        Sums the statistics of a player's games.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            tuple: The position of the player, the number of games and a dictionary mapping every field to the sum
+                   of its values, or None if the player is not in the store.
+        """
+        entry = self.players.get(player_name)
+        if entry is None:
+            return None
+        position, start, count = entry
+        end = start + count
+        if self._arrays is None:
+            return position, count, {field: sum(values[start:end]) for field, values in self.columns.items()}
+        return position, count, {field: float(values[start:end].sum(dtype=np.float64))
+                                 for field, values in self._arrays.items()}
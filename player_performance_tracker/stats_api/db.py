@@ -0,0 +1,151 @@
+"""
+Database connection setup.
+
+The default database is an in-memory SQLite database in shared-cache mode, so all threads of the process share it.
+In that mode SQLite does not wait for table locks held by another connection: a query that touches a table while
+another thread's transaction is writing to it fails at once with 'database table is locked', regardless of the
+connection's timeout. 'retry_when_locked' retries such statements until the timeout of the connection (the
+'timeout' database option, 5 seconds by default) has passed, which gives shared-cache connections the waiting
+behaviour SQLite has for file-backed databases. This lets requests be served while data is ingested in the
+background.
+
+With a file-backed database, all worker processes share one copy of the data. Connections are switched to WAL mode,
+so readers never wait for the writer, and tuned with PRAGMAS. One process is elected to migrate and ingest by
+taking an exclusive lock on a file next to the database ('elect_writer'), which it holds until it exits. The
+connections of the other processes are read-only ('PRAGMA query_only'), except within 'writable' blocks.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import OperationalError, connections
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCKED_MESSAGE = "database table is locked"
+
+# Set on every connection to a file-backed database, in this order: WAL lets readers run while the writer commits,
+# NORMAL only syncs at checkpoints in WAL mode, and the page cache and memory map keep hot pages out of the file.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-32768"),
+    ("mmap_size", "268435456"),
+)
+
+# Whether this process lost the writer election, in which case its connections are read-only
+read_only = False
+_writer_lock = None
+
+
+def uses_shared_cache(connection):
+    return connection.vendor == "sqlite" and "cache=shared" in str(connection.settings_dict["NAME"])
+
+
+def uses_file_database(connection):
+    # is_in_memory_db() does not recognize URI names without 'mode=memory', like the default 'file::memory:'
+    return (connection.vendor == "sqlite" and not connection.is_in_memory_db()
+            and ":memory:" not in str(connection.settings_dict["NAME"]))
+
+
+def retry_when_locked(execute, sql, params, many, context):
+    """
+    A database execute wrapper that retries statements failing because another connection holds a table lock.
+    """
+    deadline = None
+    delay = 0.001
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if LOCKED_MESSAGE not in str(e):
+                raise
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + context["connection"].settings_dict["OPTIONS"].get("timeout", 5)
+            if now >= deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    A connection_created signal receiver adding 'retry_when_locked' to shared-cache SQLite connections and setting
+    PRAGMAS, and 'query_only' in read-only processes, on connections to file-backed databases.
+    """
+    if uses_shared_cache(connection) and retry_when_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_when_locked)
+    if uses_file_database(connection):
+        with connection.cursor() as cursor:
+            for name, value in PRAGMAS:
+                if not (read_only and name == "journal_mode"):
+                    cursor.execute(f"PRAGMA {name} = {value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only = ON")
+
+
+def elect_writer(lock_path):
+    """
+    Tries to make this process the one that migrates and ingests data into a file-backed database.
+
+    The process that takes the exclusive lock on 'lock_path' first keeps it until it exits. Other processes become
+    read-only. Without fcntl (e.g. on Windows) every process is a writer.
+
+    Args:
+        lock_path (str): The path of the lock file, next to the database.
+
+    Returns:
+        bool: True if this process is the writer.
+    """
+    global read_only, _writer_lock
+    if _writer_lock is not None or fcntl is None:
+        return True
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        read_only = True
+        return False
+    _writer_lock = lock_file
+    read_only = False
+    return True
+
+
+def become_reader():
+    """
+    Makes this process read-only, e.g. a worker forked from the process that was elected as the writer.
+
+    The worker's copy of the lock file is closed. The lock stays with the writer, which keeps its own copy open.
+    """
+    global read_only, _writer_lock
+    if _writer_lock is not None:
+        _writer_lock.close()
+        _writer_lock = None
+    read_only = True
+
+
+@contextmanager
+def writable(using="default"):
+    """
+    Lets the current thread's connection write within the block, even in a read-only process.
+
+    Used for writes a request has to make itself, such as uploads. SQLite still lets only one connection write at
+    a time, so the block waits for the writer's transactions to finish.
+    """
+    connection = connections[using]
+    if not (read_only and uses_file_database(connection)):
+        yield
+        return
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA query_only = OFF")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA query_only = ON")
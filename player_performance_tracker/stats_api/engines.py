@@ -0,0 +1,415 @@
+"""
+Engines answering player statistics queries for PlayerStatsService.
+
+The engine is selected with the STATS_ENGINE setting:
+
+- 'orm' (the default) reads the per game averages from the PlayerAggregate table.
+- 'numpy' loads every PlayerStats row into NumPy column arrays once per dataset version and answers from memory.
+  It requires NumPy to be installed.
+- 'columnar' memory-maps the columnar store in the STATS_COLUMNAR_DIR directory, which DataService writes after every
+  ingest, and sums each player's games from contiguous slices of it.
+
+Both engines return the aggregated statistics in the same format, so the API output does not depend on the engine.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .cache import dataset_version
+from .columnar import ColumnarStore, current_generation
+from .formulas import derived_statistics
+from .models import Player, PlayerAggregate, PlayerStats
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class OrmStatsEngine:
+    """
+    An engine that reads the per game averages of players from the PlayerAggregate table.
+    """
+
+    def get_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player.
+
+        The averages are calculated from the player's PlayerAggregate totals, which are read together
+        with the player in a single query.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        try:
+            aggregate = PlayerAggregate.objects.select_related(
+                "player").get(player__player_name=player_name)
+        except PlayerAggregate.DoesNotExist:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        aggregated_data = aggregate.averages()
+        aggregated_data["player"] = aggregate.player
+        return aggregated_data
+
+    async def aget_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player with Django's async ORM API.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        try:
+            aggregate = await PlayerAggregate.objects.select_related(
+                "player").aget(player__player_name=player_name)
+        except PlayerAggregate.DoesNotExist:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        aggregated_data = aggregate.averages()
+        aggregated_data["player"] = aggregate.player
+        return aggregated_data
+
+    def get_aggregated_stats_for_players(self, player_names):
+        """
+        Gets the aggregated statistics for several players with a single query.
+
+        Args:
+            player_names (iterable): The names of the players.
+
+        Returns:
+            dict: A dictionary mapping the name of every player that was found to its aggregated statistics,
+                  in the format returned by 'get_aggregated_stats'.
+        """
+        aggregates = PlayerAggregate.objects.select_related(
+            "player").filter(player__player_name__in=list(player_names))
+        result = {}
+        for aggregate in aggregates:
+            aggregated_data = aggregate.averages()
+            aggregated_data["player"] = aggregate.player
+            result[aggregate.player.player_name] = aggregated_data
+        return result
+
+
+class NumpyStatsEngine:
+    """
+    An engine that keeps every game in NumPy column arrays and aggregates them per player in memory.
+
+    The rows are loaded into one float64 array per field of PlayerStats.CSV_MAPPING plus an array with the index
+    of each row's player. Per player totals are computed with 'np.bincount', and the averages and derived metrics
+    of all players are computed with vectorized operations. The data is reloaded when the dataset version changes.
+
+    The players are kept in arrays as well, and an unsaved Player is built for every answer, so the loaded data is
+    a few large buffers rather than many Python objects. This keeps it shared when it is loaded before a server
+    forks its workers (see 'stats_api.preload').
+
+    Attributes:
+        LOAD_CHUNK_SIZE (int): The number of rows fetched from the database at a time while loading.
+        player_names (list): The names of all players, in the order of the per player arrays.
+        player_index (dict): A dictionary mapping every player name to its index in the per player arrays.
+    """
+    LOAD_CHUNK_SIZE = 100_000
+
+    def __init__(self):
+        if np is None:
+            raise ImproperlyConfigured(
+                "The 'numpy' stats engine requires NumPy to be installed.")
+        self._lock = threading.Lock()
+        self._version = None
+        self.player_ids = None
+        self.player_names = []
+        self.positions = None
+        self.games_played = None
+        self.player_index = {}
+        self.columns = {}
+        self.row_players = None
+        self.games = None
+        self.averages = {}
+
+    def load(self):
+        """
+        Loads all players and PlayerStats rows from the database and computes the per player averages.
+        """
+        fields = list(PlayerStats.CSV_MAPPING.values())
+        players = list(Player.objects.order_by("pk").values_list("pk", "player_name", "position", "games_played"))
+        player_ids = np.array([player[0] for player in players], dtype=np.int64)
+
+        count = PlayerStats.objects.count()
+        table = np.empty((count, len(fields) + 1), dtype=np.float64)
+        rows = PlayerStats.objects.order_by("pk").values_list(
+            "player_id", *fields).iterator(chunk_size=self.LOAD_CHUNK_SIZE)
+        position = 0
+        while position < count:
+            chunk = [row for _, row in zip(
+                range(min(self.LOAD_CHUNK_SIZE, count - position)), rows)]
+            if not chunk:
+                break
+            table[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        table = table[:position]
+
+        row_players = np.searchsorted(
+            player_ids, table[:, 0].astype(np.int64))
+        games = np.bincount(row_players, minlength=len(players))
+        columns = {field: np.ascontiguousarray(table[:, column + 1])
+                   for column, field in enumerate(fields)}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = {field: np.bincount(row_players, weights=values, minlength=len(players)) / games
+                        for field, values in columns.items()}
+
+        self.player_ids = player_ids
+        self.player_names = [player[1] for player in players]
+        self.positions = np.array([player[2] for player in players], dtype="U2")
+        self.games_played = np.array([player[3] for player in players], dtype=np.int64)
+        self.player_index = {player_name: index for index,
+                             player_name in enumerate(self.player_names)}
+        self.columns = columns
+        self.row_players = row_players
+        self.games = games
+        self.averages = averages
+
+    def ensure_loaded(self):
+        """
+        Loads the data if it has not been loaded for the current dataset version.
+        """
+        version = dataset_version.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self.load()
+                    self._version = version
+
+    def _aggregated_stats(self, index):
+        aggregated_data = {f"avg_{field}": float(values[index])
+                           for field, values in self.averages.items()}
+        aggregated_data["player"] = Player(
+            id=int(self.player_ids[index]), player_name=self.player_names[index],
+            position=str(self.positions[index]), games_played=int(self.games_played[index]))
+        return aggregated_data
+
+    def get_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        self.ensure_loaded()
+        index = self.player_index.get(player_name)
+        if index is None or not self.games[index]:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        return self._aggregated_stats(index)
+
+    async def aget_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player from an async context.
+
+        When the data for the current dataset version is already loaded the answer comes straight from memory,
+        otherwise the data is loaded in a worker thread.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        if self._version == dataset_version.version:
+            return self.get_aggregated_stats(player_name)
+        return await sync_to_async(self.get_aggregated_stats)(player_name)
+
+    def get_aggregated_stats_for_players(self, player_names):
+        """
+        Gets the aggregated statistics for several players.
+
+        Args:
+            player_names (iterable): The names of the players.
+
+        Returns:
+            dict: A dictionary mapping the name of every player that was found to its aggregated statistics,
+                  in the format returned by 'get_aggregated_stats'.
+        """
+        self.ensure_loaded()
+        result = {}
+        for player_name in player_names:
+            index = self.player_index.get(player_name)
+            if index is not None and self.games[index]:
+                result[player_name] = self._aggregated_stats(index)
+        return result
+
+    def derived_metrics(self):
+        """
+        Computes the derived statistics of every player at once, with the formulas of the PlayerStats properties.
+
+        Returns:
+            dict: A dictionary mapping the name of every derived PlayerStats property to an array with one
+                  unrounded value per player, in the order of 'player_names'. Players without games have NaN values.
+        """
+        self.ensure_loaded()
+        return derived_statistics(self.averages, guarded_percentage)
+
+
+class ColumnarStatsEngine:
+    """
+    An engine that reads the games of players from the memory-mapped columnar store in STATS_COLUMNAR_DIR.
+
+    The store is opened without reading the column files, and the statistics of a player are summed from the
+    contiguous slices of its games, so the engine needs neither the database nor a copy of the data in memory.
+    When the dataset version changes, the store is reopened if a new generation was written.
+    """
+
+    def __init__(self):
+        self.directory = getattr(settings, "STATS_COLUMNAR_DIR", None)
+        if not self.directory:
+            raise ImproperlyConfigured(
+                "The 'columnar' stats engine requires the STATS_COLUMNAR_DIR setting.")
+        self._lock = threading.Lock()
+        self._version = None
+        self.store = None
+
+    def ensure_loaded(self):
+        """
+        Opens the current generation of the store if it has not been opened for the current dataset version.
+        """
+        version = dataset_version.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    generation = current_generation(self.directory)
+                    if generation is None:
+                        self.store = None
+                    elif self.store is None or self.store.generation != generation:
+                        self.store = ColumnarStore(self.directory)
+                    self._version = version
+
+    def _aggregated_stats(self, player_name):
+        totals = self.store.totals(player_name) if self.store else None
+        if totals is None or not totals[1]:
+            return None
+        position, games, sums = totals
+        aggregated_data = {f"avg_{field}": total / games for field, total in sums.items()}
+        aggregated_data["player"] = Player(player_name=player_name, position=position, games_played=games)
+        return aggregated_data
+
+    def get_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        self.ensure_loaded()
+        aggregated_data = self._aggregated_stats(player_name)
+        if aggregated_data is None:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        return aggregated_data
+
+    async def aget_aggregated_stats(self, player_name):
+        """
+        Gets the aggregated statistics for a player from an async context.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        if self._version == dataset_version.version:
+            return self.get_aggregated_stats(player_name)
+        return await sync_to_async(self.get_aggregated_stats)(player_name)
+
+    def get_aggregated_stats_for_players(self, player_names):
+        """
+        Gets the aggregated statistics for several players.
+
+        Args:
+            player_names (iterable): The names of the players.
+
+        Returns:
+            dict: A dictionary mapping the name of every player that was found to its aggregated statistics,
+                  in the format returned by 'get_aggregated_stats'.
+        """
+        self.ensure_loaded()
+        result = {}
+        for player_name in player_names:
+            aggregated_data = self._aggregated_stats(player_name)
+            if aggregated_data is not None:
+                result[player_name] = aggregated_data
+        return result
+
+
+def guarded_percentage(numerator, denominator):
+    """
+    Computes '(numerator / denominator) * 100' element-wise, or 0 where the denominator is 0.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator != 0, (numerator / denominator) * 100, 0.0)
+
+
+ENGINES = {
+    "orm": OrmStatsEngine,
+    "numpy": NumpyStatsEngine,
+    "columnar": ColumnarStatsEngine,
+}
+
+_engine = None
+
+
+def get_stats_engine():
+    """
+    Returns the engine selected by the STATS_ENGINE setting.
+
+    Returns:
+        OrmStatsEngine, NumpyStatsEngine or ColumnarStatsEngine: The process-wide engine.
+
+    Raises:
+        ImproperlyConfigured: If the setting names an unknown engine.
+    """
+    global _engine
+    if _engine is None:
+        name = getattr(settings, "STATS_ENGINE", "orm")
+        if name not in ENGINES:
+            raise ImproperlyConfigured(
+                f"Unknown STATS_ENGINE '{name}'. Choose one of: {', '.join(ENGINES)}.")
+        _engine = ENGINES[name]()
+    return _engine
+
+
+@receiver(setting_changed)
+def reset_stats_engine(setting, **kwargs):
+    global _engine
+    if setting in ("STATS_ENGINE", "STATS_COLUMNAR_DIR"):
+        _engine = None
@@ -0,0 +1,79 @@
+"""
+ORM expressions for the derived player statistics.
+
+The formulas are the ones of stats_api.formulas, applied to expressions with a divide-by-zero guard written as a
+CASE, so the database returns the same values as the derived properties of PlayerStats before rounding. They are
+built on top of a mapping from each PlayerStats field to an expression, which lets the same formulas run over
+PlayerStats rows or over the per game averages of PlayerAggregate.
+The statistics and their totals are stored as integers, so the expressions cast them to floats first: divisions
+then give fractions instead of truncated integer quotients.
+"""
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import Exact
+
+from .formulas import derived_statistics
+from .models import PlayerAggregate, PlayerStats
+
+
+def guarded_percentage(numerator, denominator):
+    """
+    Builds '(numerator / denominator) * 100', or 0 when the denominator is 0.
+
+    Args:
+        numerator (Expression): The numerator.
+        denominator (Expression): The denominator.
+
+    Returns:
+        Expression: The guarded percentage.
+    """
+    return Case(
+        When(Exact(denominator, Value(0.0)), then=Value(0.0)),
+        default=(numerator / denominator) * Value(100),
+        output_field=FloatField())
+
+
+def stat_expressions():
+    """
+    Builds expressions for the base statistics of PlayerStats rows.
+
+    Returns:
+        dict: A dictionary mapping each PlayerStats field name to its value as a float.
+    """
+    return {field: Cast(field, FloatField()) for field in PlayerStats.CSV_MAPPING.values()}
+
+
+def average_expressions():
+    """
+    Builds expressions for the per game averages of PlayerAggregate rows.
+
+    Returns:
+        dict: A dictionary mapping each PlayerStats field name to the average of its total over the games played.
+    """
+    return {field: Cast(sum_field, FloatField()) / F("games")
+            for field, sum_field in PlayerAggregate.SUM_FIELDS.items()}
+
+
+def derived_expressions(stats):
+    """
+    Builds expressions for the derived statistics.
+
+    Args:
+        stats (dict): A dictionary mapping each PlayerStats field name to an expression,
+                      as returned by 'stat_expressions' or 'average_expressions'.
+
+    Returns:
+        dict: A dictionary mapping the name of every derived PlayerStats property to an expression.
+    """
+    return derived_statistics(stats, guarded_percentage)
+
+
+def metric_expressions():
+    """
+    Builds expressions for every per game metric of a player, to be annotated onto PlayerAggregate querysets.
+
+    Returns:
+        dict: A dictionary mapping the names of the base and derived statistics to expressions.
+    """
+    averages = average_expressions()
+    return {**averages, **derived_expressions(averages)}
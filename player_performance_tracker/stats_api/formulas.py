@@ -0,0 +1,48 @@
+"""
+The formulas of the derived player statistics.
+
+The derived properties of PlayerStats (ftp, two_pp, three_pp, pts, val, efgp, tsp and hastp) round the values of
+these formulas, and every other place computing derived statistics uses them as well. The formulas only use
+arithmetic operators and a 'percentage' function given by the caller, which guards against a zero denominator, so
+the same formulas compute the statistics of one game or player from numbers, of all players at once from NumPy
+arrays (stats_api.engines), or in the database from ORM expressions (stats_api.expressions).
+Like 'parsing', this module does not import Django.
+"""
+
+
+def share(numerator, denominator):
+    """
+    Computes '(numerator / denominator) * 100' for numbers, or 0 when the denominator is 0.
+    """
+    return (numerator / denominator) * 100 if denominator else 0
+
+
+def derived_statistics(stats, percentage=share):
+    """
+    Computes the derived statistics from the base statistics.
+
+    Args:
+        stats (dict): A dictionary mapping each PlayerStats field name to its value, an array or an expression.
+        percentage (callable): The function computing '(numerator / denominator) * 100' for the values of 'stats',
+                               or 0 where the denominator is 0. Defaults to 'share', for numbers.
+
+    Returns:
+        dict: A dictionary mapping the name of every derived PlayerStats property to its unrounded value.
+    """
+    ftm, fta = stats["ftm"], stats["fta"]
+    two_pm, two_pa = stats["two_pm"], stats["two_pa"]
+    three_pm, three_pa = stats["three_pm"], stats["three_pa"]
+    reb, blk, ast, stl, to = stats["reb"], stats["blk"], stats["ast"], stats["stl"], stats["to"]
+
+    pts = ftm + 2 * two_pm + 3 * three_pm
+    shot_attempts = two_pa + three_pa + 0.475 * fta
+    return {
+        "ftp": percentage(ftm, fta),
+        "two_pp": percentage(two_pm, two_pa),
+        "three_pp": percentage(three_pm, three_pa),
+        "pts": pts,
+        "val": (pts + reb + blk + ast + stl) - (fta - ftm + two_pa - two_pm + three_pa - three_pm + to),
+        "efgp": percentage(two_pm + three_pm + 0.5 * three_pm, two_pa + three_pa),
+        "tsp": percentage(pts, 2 * shot_attempts),
+        "hastp": percentage(ast, shot_attempts + ast + to),
+    }
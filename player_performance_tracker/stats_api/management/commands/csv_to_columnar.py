@@ -0,0 +1,40 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stats_api.columnar import current_generation
+from stats_api.services import DataService
+
+
+class Command(BaseCommand):
+    """
+    Management command for converting a CSV file to the memory-mapped columnar format read by the 'columnar' engine.
+
+    The file is converted without the database, so an existing CSV file can be served by the 'columnar' engine
+    without ingesting it first.
+    """
+    help = "Converts a CSV file of player statistics to a columnar store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_path", nargs="?", default=DataService.FILE_PATH,
+                            help="The CSV file to convert. Defaults to DataService.FILE_PATH.")
+        parser.add_argument("--output", default=getattr(settings, "STATS_COLUMNAR_DIR", None),
+                            help="The directory of the store. Defaults to the STATS_COLUMNAR_DIR setting.")
+
+    def handle(self, *args, **options):
+        directory = options["output"]
+        if not directory:
+            raise CommandError("Pass --output or set STATS_COLUMNAR_DIR.")
+        start = time.perf_counter()
+        try:
+            rows = DataService.csv_to_columnar(options["file_path"], directory)
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - start
+        path = os.path.join(directory, current_generation(directory))
+        size = sum(entry.stat().st_size for entry in os.scandir(path))
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {rows} rows in {elapsed:.2f} s to {directory} ({size / 1024 / 1024:.1f} MiB)."))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from stats_api.services import DataService
+
+
+class Command(BaseCommand):
+    """
+    Management command for loading a CSV file into the database in resumable chunks.
+
+    Each chunk is committed together with a checkpoint, so running the command again after it was
+    interrupted continues from the last committed chunk. Progress and throughput are reported after
+    every chunk. With --workers the file is parsed by several processes and loaded in a single transaction instead.
+    """
+    help = "Ingests a CSV file of player statistics in resumable, committed chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_path", nargs="?", default=DataService.FILE_PATH,
+                            help="The CSV file to ingest. Defaults to DataService.FILE_PATH.")
+        parser.add_argument("--chunk-size", type=int, default=DataService.CHUNK_SIZE,
+                            help="The number of rows committed per chunk.")
+        parser.add_argument("--batch-size", type=int, default=DataService.BATCH_SIZE,
+                            help="The number of rows per insert.")
+        parser.add_argument("--workers", type=int, default=0,
+                            help="Parse the file in this many processes and load it in one transaction "
+                                 "instead of resumable chunks.")
+
+    def handle(self, *args, **options):
+        # The startup migration is skipped for this command, so make sure the tables exist
+        call_command("migrate", "stats_api", "--noinput", verbosity=0)
+        start = time.perf_counter()
+
+        def report(checkpoint, rows):
+            elapsed = time.perf_counter() - start
+            rate = rows / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{checkpoint.rows_done} rows done, offset {checkpoint.byte_offset} ({rate:,.0f} rows/sec)")
+
+        try:
+            if options["workers"]:
+                rows = DataService.fill_db_from_csv_parallel(
+                    options["file_path"], workers=options["workers"], batch_size=options["batch_size"])
+            else:
+                rows = DataService.fill_db_from_csv_resumable(
+                    options["file_path"], chunk_size=options["chunk_size"], batch_size=options["batch_size"],
+                    progress=report)
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - start
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {rows} rows in {elapsed:.2f} s ({rate:,.0f} rows/sec)."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stats_api.models import PlayerAggregate, PlayerStats
+
+
+class Command(BaseCommand):
+    """
+    Management command for recomputing the PlayerAggregate table from the PlayerStats rows.
+
+    The games of every player are renumbered and their running totals recomputed as well. With '--check' the
+    stored totals are only compared with the recomputed ones, the game numbers and running totals are checked,
+    and the command fails if any of them are wrong.
+    """
+    help = "Recomputes the per-player aggregate totals from the raw player statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Only report players whose stored totals differ from the raw rows, and games whose "
+                                 "number or running totals are wrong.")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            errors = []
+            inconsistent = PlayerAggregate.find_inconsistent()
+            if inconsistent:
+                errors.append(f"{len(inconsistent)} player aggregates are inconsistent: {inconsistent}")
+            misnumbered = PlayerStats.find_misnumbered()
+            if misnumbered:
+                players = sorted({player_id for player_id, _, _ in misnumbered.values()})
+                errors.append(f"{len(misnumbered)} games have a wrong game number or running totals, "
+                              f"for the players {players}")
+            if errors:
+                raise CommandError(" ".join(errors))
+            self.stdout.write(self.style.SUCCESS(
+                "All player aggregates are consistent."))
+            return
+
+        count = PlayerAggregate.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} player aggregates."))
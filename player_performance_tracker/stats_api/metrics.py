@@ -0,0 +1,297 @@
+"""
+Request timings and process-wide metrics.
+
+ProfilingMiddleware (stats_api/middleware.py) starts a RequestTimings for every request. While it is active, database
+queries and the blocks wrapped in 'timed' add their durations to it, and the totals are sent in the Server-Timing
+header. When no request is being profiled, 'timed' returns a shared no-op context manager.
+
+The process-wide 'metrics' collect request latency histograms and ingest counters, and render them together with
+the response cache counters and the memory of the process in the Prometheus text format for the /metrics endpoint.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .cache import dataset_version, get_response_cache
+
+_current_timings = ContextVar("stats_request_timings", default=None)
+_not_timed = nullcontext()
+
+
+class RequestTimings:
+    """
+    The time spent in each phase of a request.
+
+    Attributes:
+        queries (int): The number of database queries.
+        phases (dict): A dictionary mapping each phase ('db', 'service', 'serialize', ...) to seconds.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def server_timing(self, total):
+        """
+        Formats the timings as the value of a Server-Timing header.
+
+        Args:
+            total (float): The total time of the request in seconds.
+
+        Returns:
+            str: The header value, with durations in milliseconds.
+        """
+        entries = [f'db;dur={self.phases.get("db", 0.0) * 1000:.2f};desc="queries: {self.queries}"']
+        entries += [f"{phase};dur={seconds * 1000:.2f}" for phase,
+                    seconds in self.phases.items() if phase != "db"]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def start_request_timings():
+    """
+    Starts collecting the timings of the current request.
+
+    Returns:
+        tuple: The RequestTimings and the token to pass to 'stop_request_timings'.
+    """
+    timings = RequestTimings()
+    return timings, _current_timings.set(timings)
+
+
+def stop_request_timings(token):
+    _current_timings.reset(token)
+
+
+def timed(phase):
+    """
+    Returns a context manager that adds the time spent in its block to a phase of the profiled request.
+
+    Args:
+        phase (str): The name of the phase, e.g. 'service' or 'serialize'.
+
+    Returns:
+        A context manager. It does nothing if the current request is not being profiled.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return _not_timed
+    return timings.phase(phase)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    A database execute wrapper that adds every query to the timings of the profiled request.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add("db", time.perf_counter() - start)
+
+
+def install_query_recorder():
+    """
+    Adds 'record_query' to the open database connections of this thread and to every connection created later.
+    """
+    connection_created.connect(_add_query_recorder, dispatch_uid="stats_api_record_query")
+    for connection in connections.all(initialized_only=True):
+        _add_query_recorder(None, connection)
+
+
+def _add_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """
+    A Prometheus style histogram with cumulative buckets.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets in seconds.
+        counts (list): The number of observations per bucket (not cumulative), with a last bucket for '+Inf'.
+        total (float): The sum of all observations.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+def process_memory(pid="self"):
+    """
+    Reads the memory of a process from /proc/<pid>/smaps_rollup (Linux 4.14 and later).
+
+    RSS counts every resident page of the process, including the pages it shares with other processes, such as the
+    pages forked workers share with the master. PSS divides every shared page between the processes sharing it, so
+    the PSS of all processes adds up to the memory they use together. USS counts the pages of the process alone.
+
+    Args:
+        pid (int): The process. Defaults to the current process.
+
+    Returns:
+        dict: A dictionary mapping 'rss', 'pss', 'uss' and 'shared' to bytes, or an empty dictionary if the file
+              cannot be read.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as rollup_file:
+            for line in rollup_file:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[name] = int(parts[0]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Process-wide request and ingest metrics.
+
+    Attributes:
+        BUCKETS (tuple): The upper bounds of the request latency buckets in seconds.
+    """
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_durations = {}
+            self.request_counts = {}
+            self.ingest_rows = 0
+            self.ingest_commits = 0
+            self.ingest_seconds = 0.0
+            self.ingest_errors = 0
+
+    def observe_request(self, route, method, status, seconds):
+        """
+        Records a finished request.
+
+        Args:
+            route (str): The URL pattern the request matched.
+            method (str): The HTTP method.
+            status (int): The response status code.
+            seconds (float): The total time of the request.
+        """
+        with self._lock:
+            histogram = self.request_durations.get((route, method))
+            if histogram is None:
+                histogram = self.request_durations[(route, method)] = Histogram(self.BUCKETS)
+            histogram.observe(seconds)
+            key = (route, method, status)
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    def record_ingest(self, rows, seconds):
+        """
+        Records a committed ingest.
+
+        Args:
+            rows (int): The number of rows written.
+            seconds (float): The time the ingest took.
+        """
+        with self._lock:
+            self.ingest_rows += rows
+            self.ingest_commits += 1
+            self.ingest_seconds += seconds
+
+    def record_ingest_error(self):
+        with self._lock:
+            self.ingest_errors += 1
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        with self._lock:
+            durations = []
+            for (route, method), histogram in sorted(self.request_durations.items()):
+                labels = [("route", route), ("method", method)]
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    durations.append(("_bucket", labels + [("le", bound)], cumulative))
+                durations.append(("_sum", labels, histogram.total))
+                durations.append(("_count", labels, cumulative))
+            requests = [("", [("route", route), ("method", method), ("status", status)], count)
+                        for (route, method, status), count in sorted(self.request_counts.items())]
+            ingest = (self.ingest_rows, self.ingest_commits, self.ingest_seconds, self.ingest_errors)
+
+        metric("stats_request_duration_seconds", "histogram", "Time spent answering requests.", durations)
+        metric("stats_requests_total", "counter", "Requests answered, by status code.", requests)
+        metric("stats_ingest_rows_total", "counter", "CSV rows written to the database.", [("", [], ingest[0])])
+        metric("stats_ingest_commits_total", "counter", "Committed ingests or ingest chunks.", [("", [], ingest[1])])
+        metric("stats_ingest_seconds_total", "counter", "Time spent in committed ingests.", [("", [], ingest[2])])
+        metric("stats_ingest_errors_total", "counter", "Ingests that failed.", [("", [], ingest[3])])
+
+        cache_stats = get_response_cache().stats()
+        metric("stats_response_cache_hits_total", "counter", "Response cache hits.",
+               [("", [], cache_stats["hits"])])
+        metric("stats_response_cache_misses_total", "counter", "Response cache misses.",
+               [("", [], cache_stats["misses"])])
+        metric("stats_response_cache_evictions_total", "counter", "Response cache evictions.",
+               [("", [], cache_stats["evictions"])])
+        metric("stats_response_cache_entries", "gauge", "Entries in the local response cache.",
+               [("", [], cache_stats["size"])])
+        metric("stats_dataset_version", "gauge", "The version of the loaded dataset.",
+               [("", [], dataset_version.version)])
+        # Every worker process answers for itself, so the samples carry its pid
+        pid = os.getpid()
+        metric("stats_process_memory_bytes", "gauge", "Resident memory of the process answering, by kind.",
+               [("", [("pid", pid), ("kind", kind)], value) for kind, value in process_memory().items()])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,61 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import install_query_recorder, metrics, start_request_timings, stop_request_timings
+
+
+class ProfilingMiddleware:
+    """
+    Middleware that profiles every request.
+
+    It records the number and duration of database queries, the time spent in the phases marked with
+    'stats_api.metrics.timed' (such as 'service' and 'serialize') and the total time of the request. The timings are
+    sent in a Server-Timing response header, and the total time is added to the latency histograms of the /metrics
+    endpoint.
+
+    The middleware is only used when the STATS_PROFILING setting is enabled. Otherwise Django drops it from the
+    middleware chain when the handler is built, so it costs nothing per request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "STATS_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_query_recorder()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timings, token = start_request_timings()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        timings, token = start_request_timings()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        return self.finish(request, response, timings, start)
+
+    @staticmethod
+    def finish(request, response, timings, start):
+        total = time.perf_counter() - start
+        response.headers["Server-Timing"] = timings.server_timing(total)
+        resolver_match = getattr(request, "resolver_match", None)
+        route = resolver_match.route if resolver_match else "unmatched"
+        metrics.observe_request(route, request.method, response.status_code, total)
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+STAT_FIELDS = ["ftm", "fta", "two_pm", "two_pa", "three_pm",
+               "three_pa", "reb", "blk", "ast", "stl", "to"]
+
+
+def fill_player_aggregates(apps, schema_editor):
+    PlayerStats = apps.get_model("stats_api", "PlayerStats")
+    PlayerAggregate = apps.get_model("stats_api", "PlayerAggregate")
+    rows = PlayerStats.objects.values("player_id").annotate(
+        games=models.Count("id"), **{f"sum_{field}": models.Sum(field) for field in STAT_FIELDS})
+    PlayerAggregate.objects.bulk_create(PlayerAggregate(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats_api', '0002_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerAggregate',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='stats_api.player')),
+                ('games', models.IntegerField(default=0, verbose_name='games')),
+                ('sum_ftm', models.FloatField(default=0.0, verbose_name='total free throw made')),
+                ('sum_fta', models.FloatField(default=0.0, verbose_name='total free throw attempted')),
+                ('sum_two_pm', models.FloatField(default=0.0, verbose_name='total two points made')),
+                ('sum_two_pa', models.FloatField(default=0.0, verbose_name='total two points attempted')),
+                ('sum_three_pm', models.FloatField(default=0.0, verbose_name='total three points made')),
+                ('sum_three_pa', models.FloatField(default=0.0, verbose_name='total three points attempted')),
+                ('sum_reb', models.FloatField(default=0.0, verbose_name='total rebounds')),
+                ('sum_blk', models.FloatField(default=0.0, verbose_name='total blocks')),
+                ('sum_ast', models.FloatField(default=0.0, verbose_name='total assists')),
+                ('sum_stl', models.FloatField(default=0.0, verbose_name='total steals')),
+                ('sum_to', models.FloatField(default=0.0, verbose_name='total turnovers')),
+            ],
+        ),
+        migrations.RunPython(fill_player_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+STAT_FIELDS = ["ftm", "fta", "two_pm", "two_pa", "three_pm",
+               "three_pa", "reb", "blk", "ast", "stl", "to"]
+
+
+def merge_duplicate_players(apps, schema_editor):
+    """
+    Merges players that share a name into the one that was created first, so the unique index can be built.
+    """
+    Player = apps.get_model("stats_api", "Player")
+    PlayerStats = apps.get_model("stats_api", "PlayerStats")
+    PlayerAggregate = apps.get_model("stats_api", "PlayerAggregate")
+    duplicates = Player.objects.values("player_name").annotate(
+        count=models.Count("id")).filter(count__gt=1).values_list("player_name", flat=True)
+    for player_name in duplicates:
+        kept, *others = Player.objects.filter(
+            player_name=player_name).order_by("id")
+        other_ids = [other.id for other in others]
+        PlayerStats.objects.filter(player_id__in=other_ids).update(player=kept)
+        kept.games_played += sum(other.games_played for other in others)
+        kept.save()
+        PlayerAggregate.objects.filter(player_id__in=[kept.id, *other_ids]).delete()
+        totals = PlayerStats.objects.filter(player=kept).aggregate(
+            games=models.Count("id"), **{f"sum_{field}": models.Sum(field) for field in STAT_FIELDS})
+        if totals["games"]:
+            PlayerAggregate.objects.create(player=kept, **totals)
+        Player.objects.filter(id__in=other_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats_api', '0003_playeraggregate'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_players, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='player',
+            name='player_name',
+            field=models.CharField(max_length=50, unique=True, verbose_name="player's  name"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats_api', '0004_unique_player_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingestcheckpoint',
+            name='file_path',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='file path'),
+        ),
+    ]
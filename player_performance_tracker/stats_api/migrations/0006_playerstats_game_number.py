@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+STAT_FIELDS = ["ftm", "fta", "two_pm", "two_pa", "three_pm",
+               "three_pa", "reb", "blk", "ast", "stl", "to"]
+
+
+def number_games(apps, schema_editor):
+    PlayerStats = apps.get_model("stats_api", "PlayerStats")
+    cum_fields = [f"cum_{field}" for field in STAT_FIELDS]
+    player_id, game_number, totals, batch = None, 0, None, []
+    for stats in PlayerStats.objects.order_by("player_id", "pk").iterator(chunk_size=5000):
+        if stats.player_id != player_id:
+            player_id, game_number, totals = stats.player_id, 0, [0.0] * len(STAT_FIELDS)
+        game_number += 1
+        stats.game_number = game_number
+        for index, field in enumerate(STAT_FIELDS):
+            totals[index] += getattr(stats, field)
+            setattr(stats, cum_fields[index], totals[index])
+        batch.append(stats)
+        if len(batch) >= 5000:
+            PlayerStats.objects.bulk_update(batch, ["game_number", *cum_fields])
+            batch.clear()
+    PlayerStats.objects.bulk_update(batch, ["game_number", *cum_fields])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats_api', '0005_ingestcheckpoint_file_path_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_ast',
+            field=models.FloatField(default=0.0, verbose_name='running assists'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_blk',
+            field=models.FloatField(default=0.0, verbose_name='running blocks'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_fta',
+            field=models.FloatField(default=0.0, verbose_name='running free throw attempted'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_ftm',
+            field=models.FloatField(default=0.0, verbose_name='running free throw made'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_reb',
+            field=models.FloatField(default=0.0, verbose_name='running rebounds'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_stl',
+            field=models.FloatField(default=0.0, verbose_name='running steals'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_three_pa',
+            field=models.FloatField(default=0.0, verbose_name='running three points attempted'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_three_pm',
+            field=models.FloatField(default=0.0, verbose_name='running three points made'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_to',
+            field=models.FloatField(default=0.0, verbose_name='running turnovers'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_two_pa',
+            field=models.FloatField(default=0.0, verbose_name='running two points attempted'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='cum_two_pm',
+            field=models.FloatField(default=0.0, verbose_name='running two points made'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='game_number',
+            field=models.PositiveIntegerField(default=0, verbose_name='game number'),
+        ),
+        migrations.RunPython(number_games, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playerstats',
+            constraint=models.UniqueConstraint(fields=('player', 'game_number'), name='unique_player_game_number'),
+        ),
+    ]
@@ -0,0 +1,199 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:37
+
+from django.db import migrations, models
+from django.db.models import IntegerField, Q
+from django.db.models.functions import Cast
+
+
+STAT_FIELDS = ["ftm", "fta", "two_pm", "two_pa", "three_pm",
+               "three_pa", "reb", "blk", "ast", "stl", "to"]
+
+
+def check_counts(apps, schema_editor):
+    """
+    Stops the migration if a stored statistic is fractional or negative, since the integer columns cannot hold it.
+    """
+    PlayerStats = apps.get_model("stats_api", "PlayerStats")
+    invalid = Q()
+    for field in STAT_FIELDS:
+        invalid |= Q(**{f"{field}__lt": 0}) | ~Q(**{field: Cast(field, IntegerField())})
+    count = PlayerStats.objects.filter(invalid).count()
+    if count:
+        raise ValueError(f"{count} stored games have fractional or negative statistics. Fix or delete them before "
+                         f"migrating to integer statistics.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats_api', '0006_playerstats_game_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_counts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_ast',
+            field=models.PositiveIntegerField(default=0, verbose_name='total assists'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_blk',
+            field=models.PositiveIntegerField(default=0, verbose_name='total blocks'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_fta',
+            field=models.PositiveIntegerField(default=0, verbose_name='total free throw attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_ftm',
+            field=models.PositiveIntegerField(default=0, verbose_name='total free throw made'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_reb',
+            field=models.PositiveIntegerField(default=0, verbose_name='total rebounds'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_stl',
+            field=models.PositiveIntegerField(default=0, verbose_name='total steals'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_three_pa',
+            field=models.PositiveIntegerField(default=0, verbose_name='total three points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_three_pm',
+            field=models.PositiveIntegerField(default=0, verbose_name='total three points made'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_to',
+            field=models.PositiveIntegerField(default=0, verbose_name='total turnovers'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_two_pa',
+            field=models.PositiveIntegerField(default=0, verbose_name='total two points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playeraggregate',
+            name='sum_two_pm',
+            field=models.PositiveIntegerField(default=0, verbose_name='total two points made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='ast',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='assists'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='blk',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='blocks'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_ast',
+            field=models.PositiveIntegerField(default=0, verbose_name='running assists'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_blk',
+            field=models.PositiveIntegerField(default=0, verbose_name='running blocks'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_fta',
+            field=models.PositiveIntegerField(default=0, verbose_name='running free throw attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_ftm',
+            field=models.PositiveIntegerField(default=0, verbose_name='running free throw made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_reb',
+            field=models.PositiveIntegerField(default=0, verbose_name='running rebounds'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_stl',
+            field=models.PositiveIntegerField(default=0, verbose_name='running steals'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_three_pa',
+            field=models.PositiveIntegerField(default=0, verbose_name='running three points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_three_pm',
+            field=models.PositiveIntegerField(default=0, verbose_name='running three points made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_to',
+            field=models.PositiveIntegerField(default=0, verbose_name='running turnovers'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_two_pa',
+            field=models.PositiveIntegerField(default=0, verbose_name='running two points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='cum_two_pm',
+            field=models.PositiveIntegerField(default=0, verbose_name='running two points made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='fta',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='free throw attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='ftm',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='free throw made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='reb',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='rebounds'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='stl',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='steals'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='three_pa',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='three points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='three_pm',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='three points made'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='to',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='turnovers'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='two_pa',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='two points attempted'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='two_pm',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='two points made'),
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+
+from .cache import dataset_version
+from .formulas import derived_statistics
+from .parsing import parse_count
 
 
 class Player(models.Model):
@@ -9,7 +13,7 @@ class Player(models.Model):
     The player's position is one of the following: Point guard (PG), Shooting guard (SG), Small forward (SF), Power forward (PF), or Center (C).
 
     Attributes:
-        player_name (CharField): The name of the player. This field cannot be null.
+        player_name (CharField): The name of the player. This field cannot be null and is unique.
         position (CharField): The position of the player. This field can only take one of the predefined choices in POSITIONS.
         games_played (IntegerField): The number of games the player has played. This field defaults to 0.
         CSV_MAPPING (dict): A dictionary mapping CSV column names to model field names.
@@ -23,7 +27,7 @@ class Player(models.Model):
     ]
 
     player_name = models.CharField(
-        max_length=50, null=False, verbose_name="player's  name")
+        max_length=50, null=False, unique=True, verbose_name="player's  name")
     position = models.CharField(max_length=2, choices=POSITIONS)
     games_played = models.IntegerField(default=0, verbose_name="games played")
 
@@ -39,9 +43,8 @@ class Player(models.Model):
 
         This class represents a basketball player with attributes for their name, position, and the number of games they've played. The player's position is one of the predefined choices. The class also includes a mapping from CSV column names to model field names for data import.
         """
-        player_data = {cls.CSV_MAPPING[key]: value for key,
-                       value in row.items() if key in cls.CSV_MAPPING}
-        player, _ = cls.objects.get_or_create(**player_data)
+        player, _ = cls.objects.get_or_create(
+            player_name=row["PLAYER"], defaults={"position": row["POSITION"]})
         return player
 
     def __str__(self):
@@ -54,58 +57,86 @@ class PlayerStats(models.Model):
 
     This class represents a player's statistics in a basketball game. It includes base statistics such as free throws made and attempted, two-point shots made and attempted, three-point shots made and attempted, rebounds, blocks, assists, steals, and turnovers.
 
+    The base statistics are counts, stored as small non-negative integers. Averages over several games are floats.
+
     It also includes derived statistics which are calculated based on the base statistics. These include free throw percentage, two-point percentage, three-point percentage, points, valuation, effective field goal percentage, true shooting percentage, and assist to turnover ratio.
+
+    Every game is numbered per player in the order it was ingested, and carries the running totals of the player's
+    base statistics up to and including the game. The totals over any window of consecutive games are the difference
+    of two running totals, so averages over a player's last N games are read from at most two rows.
+
+    Attributes:
+        game_number (PositiveIntegerField): The number of the game among the player's games, starting at 1.
+        cum_* (PositiveIntegerField): The total of the corresponding base statistic over the player's games up to
+                                      this one.
+        CUMULATIVE_FIELDS (dict): A dictionary mapping base statistic field names to the running total field names.
+        INSERT_FIELDS (list): The fields written by DataService.insert_stats, in the order of its values.
     """
     player = models.ForeignKey(
         Player, on_delete=models.CASCADE, related_name="statistics")
+    game_number = models.PositiveIntegerField(default=0, verbose_name="game number")
 
     # Base statistics
-    ftm = models.FloatField(default=0.0, verbose_name="free throw made")
-    fta = models.FloatField(default=0.0, verbose_name="free throw attempted")
-    two_pm = models.FloatField(default=0.0, verbose_name="two points made")
-    two_pa = models.FloatField(
-        default=0.0, verbose_name="two points attempted")
-    three_pm = models.FloatField(default=0.0, verbose_name="three points made")
-    three_pa = models.FloatField(
-        default=0.0, verbose_name="three points attempted")
-    reb = models.FloatField(default=0.0, verbose_name="rebounds")
-    blk = models.FloatField(default=0.0, verbose_name="blocks")
-    ast = models.FloatField(default=0.0, verbose_name="assists")
-    stl = models.FloatField(default=0.0, verbose_name="steals")
-    to = models.FloatField(default=0.0, verbose_name="turnovers")
+    ftm = models.PositiveSmallIntegerField(default=0, verbose_name="free throw made")
+    fta = models.PositiveSmallIntegerField(default=0, verbose_name="free throw attempted")
+    two_pm = models.PositiveSmallIntegerField(default=0, verbose_name="two points made")
+    two_pa = models.PositiveSmallIntegerField(default=0, verbose_name="two points attempted")
+    three_pm = models.PositiveSmallIntegerField(default=0, verbose_name="three points made")
+    three_pa = models.PositiveSmallIntegerField(default=0, verbose_name="three points attempted")
+    reb = models.PositiveSmallIntegerField(default=0, verbose_name="rebounds")
+    blk = models.PositiveSmallIntegerField(default=0, verbose_name="blocks")
+    ast = models.PositiveSmallIntegerField(default=0, verbose_name="assists")
+    stl = models.PositiveSmallIntegerField(default=0, verbose_name="steals")
+    to = models.PositiveSmallIntegerField(default=0, verbose_name="turnovers")
+
+    # Running totals
+    cum_ftm = models.PositiveIntegerField(default=0, verbose_name="running free throw made")
+    cum_fta = models.PositiveIntegerField(default=0, verbose_name="running free throw attempted")
+    cum_two_pm = models.PositiveIntegerField(default=0, verbose_name="running two points made")
+    cum_two_pa = models.PositiveIntegerField(default=0, verbose_name="running two points attempted")
+    cum_three_pm = models.PositiveIntegerField(default=0, verbose_name="running three points made")
+    cum_three_pa = models.PositiveIntegerField(default=0, verbose_name="running three points attempted")
+    cum_reb = models.PositiveIntegerField(default=0, verbose_name="running rebounds")
+    cum_blk = models.PositiveIntegerField(default=0, verbose_name="running blocks")
+    cum_ast = models.PositiveIntegerField(default=0, verbose_name="running assists")
+    cum_stl = models.PositiveIntegerField(default=0, verbose_name="running steals")
+    cum_to = models.PositiveIntegerField(default=0, verbose_name="running turnovers")
 
     # Derived statistics
+    def _derived(self, name):
+        return derived_statistics({field: getattr(self, field) for field in self.CSV_MAPPING.values()})[name]
+
     @property
     def ftp(self):
-        return round((self.ftm / self.fta) * 100 if self.fta else 0, 1)
+        return round(self._derived("ftp"), 1)
 
     @property
     def two_pp(self):
-        return round((self.two_pm / self.two_pa) * 100 if self.two_pa else 0, 1)
+        return round(self._derived("two_pp"), 1)
 
     @property
     def three_pp(self):
-        return round((self.three_pm / self.three_pa) * 100 if self.three_pa else 0, 1)
+        return round(self._derived("three_pp"), 1)
 
     @property
     def pts(self):
-        return self.ftm + 2 * self.two_pm + 3 * self.three_pm
+        return self._derived("pts")
 
     @property
     def val(self):
-        return round((self.ftm + 2 * self.two_pm + 3 * self.three_pm + self.reb + self.blk + self.ast + self.stl) - (self.fta - self.ftm + self.two_pa - self.two_pm + self.three_pa - self.three_pm + self.to), 1)
+        return round(self._derived("val"), 1)
 
     @property
     def efgp(self):
-        return round(((self.two_pm + self.three_pm + 0.5 * self.three_pm) / (self.two_pa + self.three_pa)) * 100 if (self.two_pa + self.three_pa) else 0, 1)
+        return round(self._derived("efgp"), 1)
 
     @property
     def tsp(self):
-        return round((self.pts / (2 * (self.two_pa + self.three_pa + 0.475 * self.fta))) * 100 if (2 * (self.two_pa + self.three_pa + 0.475 * self.fta)) else 0, 1)
+        return round(self._derived("tsp"), 1)
 
     @property
     def hastp(self):
-        return round((self.ast / (self.two_pa + self.three_pa + 0.475 * self.fta + self.ast + self.to)) * 100 if (self.two_pa + self.three_pa + 0.475 * self.fta + self.ast + self.to) else 0, 1)
+        return round(self._derived("hastp"), 1)
 
     CSV_MAPPING = {
         "FTM": "ftm",
@@ -121,18 +152,56 @@ class PlayerStats(models.Model):
         "TOV": "to",
     }
 
+    CUMULATIVE_FIELDS = {field: f"cum_{field}" for field in CSV_MAPPING.values()}
+    INSERT_FIELDS = ["player", "game_number", *CSV_MAPPING.values(), *CUMULATIVE_FIELDS.values()]
+
+    def number_after(self, previous):
+        """
+        Sets the game number and the running totals of an unsaved game that follows the games of 'previous'.
+
+        Args:
+            previous (PlayerAggregate): The totals of the player's earlier games, or None if there are none.
+        """
+        self.game_number = (previous.games if previous else 0) + 1
+        for field, cum_field in self.CUMULATIVE_FIELDS.items():
+            total = getattr(previous, f"sum_{field}") if previous else 0
+            setattr(self, cum_field, total + getattr(self, field))
+
+    @classmethod
+    def build_from_csv_row(cls, player, row):
+        """
+        Class method to build an unsaved player's stats instance from a row of CSV data.
+
+        Only the keys present in 'CSV_MAPPING' are considered, and their values are converted to integers with
+        'parse_count'.
+        The instance is not written to the database, which lets the caller number it after the player's earlier
+        games before saving it (see 'create_from_csv_row'). Bulk ingests do not build instances at all and write
+        plain tuples with DataService.insert_stats.
+
+        Args:
+            player (Player): The player object for whom the stats are being built.
+            row (dict): A dictionary representing a row of CSV data.
+
+        Returns:
+            player_stats (PlayerStats): The unsaved player stats object.
+
+        Raises:
+            ValueError: If a statistic is not a whole non-negative number.
+        """
+        stats_data = {field: parse_count(row[key])
+                      for key, field in cls.CSV_MAPPING.items()}
+        return cls(player=player, **stats_data)
+
     @classmethod
     def create_from_csv_row(cls, player, row):
         """
         Class method to create a player's stats from a row of CSV data.
 
-        This method takes a player object and a row of CSV data as input. It creates a dictionary 'stats_data' where
-        each key-value pair is a stat and its corresponding value from the CSV row. Only the keys present in 'CSV_MAPPING'
-        are considered, and their values are converted to float.
+        This method takes a player object and a row of CSV data as input. The stats are built with 'build_from_csv_row'
+        and a new player stat is created in the database using this data.
 
-        The 'player' object is then added to 'stats_data', and a new player stat is created in the database using this data.
-
-        After the player stat is successfully created, the 'games_played' count for the player is incremented by 1.
+        After the player stat is successfully created, it is added to the player's aggregate, the 'games_played'
+        count for the player is incremented by 1 and the dataset version is bumped.
 
         Args:
             player (Player): The player object for whom the stats are being created.
@@ -141,16 +210,72 @@ class PlayerStats(models.Model):
         Returns:
             player_stats (PlayerStats): The newly created player stats object.
         """
-        stats_data = {cls.CSV_MAPPING[key]: float(value) for key,
-                      value in row.items() if key in cls.CSV_MAPPING}
-        stats_data["player"] = player
-        player_stats = cls.objects.create(**stats_data)
+        player_stats = cls.build_from_csv_row(player, row)
+        player_stats.number_after(PlayerAggregate.objects.filter(player=player).first())
+        player_stats.save()
+        PlayerAggregate.add_stats([player_stats])
 
         # After the stat was successfully created, increment the game count
         player.games_played += 1
         player.save()
+        dataset_version.bump()
         return player_stats
 
+    @classmethod
+    def find_misnumbered(cls):
+        """
+        Class method to find the games whose number or running totals do not follow from the player's earlier games.
+
+        The games of every player are taken in the order of their numbers, then of their ids, and must be numbered
+        1, 2, 3, ... without gaps, with running totals equal to the sums of the statistics up to the game. Gaps are
+        left behind, for example, when rows are deleted.
+
+        Returns:
+            dict: A dictionary mapping the ids of the misnumbered games to (player id, game number, running totals)
+                  tuples with the correct values, the running totals in the order of CUMULATIVE_FIELDS.
+        """
+        fields = list(cls.CSV_MAPPING.values())
+        rows = cls.objects.order_by("player_id", "game_number", "pk").values_list(
+            "pk", "player_id", "game_number", *fields, *cls.CUMULATIVE_FIELDS.values())
+        misnumbered = {}
+        player_id = None
+        for pk, row_player_id, game_number, *values in rows.iterator(chunk_size=10000):
+            if row_player_id != player_id:
+                player_id, number, totals = row_player_id, 0, [0] * len(fields)
+            number += 1
+            totals = [total + value for total, value in zip(totals, values)]
+            if game_number != number or values[len(fields):] != totals:
+                misnumbered[pk] = (player_id, number, tuple(totals))
+        return misnumbered
+
+    @classmethod
+    def renumber(cls):
+        """
+        Class method to correct the numbers and running totals of the games returned by 'find_misnumbered'.
+
+        The games that change number are first moved past the highest number in use, so that no two games of a
+        player hold the same number at any time. The caller is responsible for the transaction.
+
+        Returns:
+            list: The ids of the players whose games were corrected.
+        """
+        misnumbered = cls.find_misnumbered()
+        if not misnumbered:
+            return []
+        offset = cls.objects.aggregate(highest=models.Max("game_number"))["highest"] + 1
+        ids = list(misnumbered)
+        for start in range(0, len(ids), 500):
+            cls.objects.filter(pk__in=ids[start:start + 500]).update(game_number=models.F("game_number") + offset)
+
+        games = []
+        for pk, (player_id, number, totals) in misnumbered.items():
+            game = cls(pk=pk, player_id=player_id, game_number=number)
+            for cum_field, total in zip(cls.CUMULATIVE_FIELDS.values(), totals):
+                setattr(game, cum_field, total)
+            games.append(game)
+        cls.objects.bulk_update(games, ["game_number", *cls.CUMULATIVE_FIELDS.values()], batch_size=500)
+        return sorted({player_id for player_id, _, _ in misnumbered.values()})
+
     def traditional_to_dict(self):
         """
         Calculate and return the per game traditional statistics of a player rounded to 1 decimal.
@@ -198,6 +323,207 @@ class PlayerStats(models.Model):
 
     class Meta:
         verbose_name_plural = "player stats"
+        constraints = [
+            models.UniqueConstraint(fields=["player", "game_number"], name="unique_player_game_number"),
+        ]
 
     def __str__(self):
         return f"{self.player.player_name}'s statistics"
+
+
+class PlayerAggregate(models.Model):
+    """
+    Django model for the running totals of a player's statistics.
+
+    The totals are updated whenever statistics are written, so the per game averages of a player can be read
+    from a single row instead of being aggregated over all of the player's games on every request.
+    The table can always be recomputed from the PlayerStats rows with 'rebuild'.
+
+    Attributes:
+        player (OneToOneField): The player the totals belong to. It is also the primary key.
+        games (IntegerField): The number of PlayerStats rows included in the totals.
+        sum_* (PositiveIntegerField): The total of the corresponding PlayerStats field over all games.
+        SUM_FIELDS (dict): A dictionary mapping PlayerStats field names to the total field names.
+    """
+    player = models.OneToOneField(
+        Player, on_delete=models.CASCADE, primary_key=True, related_name="aggregate")
+    games = models.IntegerField(default=0, verbose_name="games")
+
+    sum_ftm = models.PositiveIntegerField(default=0, verbose_name="total free throw made")
+    sum_fta = models.PositiveIntegerField(default=0, verbose_name="total free throw attempted")
+    sum_two_pm = models.PositiveIntegerField(default=0, verbose_name="total two points made")
+    sum_two_pa = models.PositiveIntegerField(default=0, verbose_name="total two points attempted")
+    sum_three_pm = models.PositiveIntegerField(default=0, verbose_name="total three points made")
+    sum_three_pa = models.PositiveIntegerField(default=0, verbose_name="total three points attempted")
+    sum_reb = models.PositiveIntegerField(default=0, verbose_name="total rebounds")
+    sum_blk = models.PositiveIntegerField(default=0, verbose_name="total blocks")
+    sum_ast = models.PositiveIntegerField(default=0, verbose_name="total assists")
+    sum_stl = models.PositiveIntegerField(default=0, verbose_name="total steals")
+    sum_to = models.PositiveIntegerField(default=0, verbose_name="total turnovers")
+
+    SUM_FIELDS = {field: f"sum_{field}" for field in PlayerStats.CSV_MAPPING.values()}
+
+    def averages(self):
+        """
+        Calculate the per game averages of the player.
+
+        Returns:
+            dict: A dictionary mapping 'avg_<field>' to the average of each PlayerStats field.
+        """
+        return {f"avg_{field}": getattr(self, sum_field) / self.games
+                for field, sum_field in self.SUM_FIELDS.items()}
+
+    @classmethod
+    def collect(cls, totals, stats_list):
+        """
+        Class method to add player stats to running totals kept in memory.
+
+        Args:
+            totals (dict): A dictionary mapping player ids to unsaved PlayerAggregate objects. It is updated in place.
+            stats_list (iterable): The PlayerStats objects to add.
+        """
+        for stats in stats_list:
+            aggregate = totals.get(stats.player_id)
+            if aggregate is None:
+                aggregate = totals[stats.player_id] = cls(
+                    player_id=stats.player_id)
+            aggregate.games += 1
+            for field, sum_field in cls.SUM_FIELDS.items():
+                setattr(aggregate, sum_field, getattr(
+                    aggregate, sum_field) + getattr(stats, field))
+
+    @classmethod
+    def save_totals(cls, totals):
+        """
+        Class method to add totals collected with 'collect' to the stored aggregates.
+
+        The stored aggregates of the players are read with one query, the totals are added to them,
+        and all of them are written back with one upsert.
+
+        Args:
+            totals (dict): A dictionary mapping player ids to unsaved PlayerAggregate objects.
+        """
+        if not totals:
+            return
+        aggregates = cls.objects.in_bulk(list(totals))
+        for player_id, total in totals.items():
+            aggregate = aggregates.get(player_id)
+            if aggregate is None:
+                aggregates[player_id] = total
+                continue
+            aggregate.games += total.games
+            for sum_field in cls.SUM_FIELDS.values():
+                setattr(aggregate, sum_field, getattr(
+                    aggregate, sum_field) + getattr(total, sum_field))
+        cls.write(aggregates.values())
+
+    @classmethod
+    def write(cls, aggregates):
+        """
+        Class method to store aggregates with one upsert, replacing the stored totals of their players.
+
+        Args:
+            aggregates (iterable): Unsaved PlayerAggregate objects.
+        """
+        cls.objects.bulk_create(aggregates, update_conflicts=True, unique_fields=["player"],
+                                update_fields=["games", *cls.SUM_FIELDS.values()])
+
+    @classmethod
+    def add_stats(cls, stats_list):
+        """
+        Class method to add player stats to the running totals of their players.
+
+        Args:
+            stats_list (iterable): The PlayerStats objects to add.
+        """
+        totals = {}
+        cls.collect(totals, stats_list)
+        cls.save_totals(totals)
+
+    @classmethod
+    def compute_from_stats(cls):
+        """
+        Class method to compute the totals of every player from the PlayerStats rows.
+
+        Returns:
+            dict: A dictionary mapping player ids to unsaved PlayerAggregate objects.
+        """
+        rows = PlayerStats.objects.values("player_id").annotate(
+            games=models.Count("id"),
+            **{sum_field: models.Sum(field) for field, sum_field in cls.SUM_FIELDS.items()})
+        return {row["player_id"]: cls(**row) for row in rows}
+
+    @classmethod
+    def find_inconsistent(cls):
+        """
+        Class method to compare the stored totals with totals computed from the PlayerStats rows.
+
+        Returns:
+            list: The ids of the players whose stored totals are missing, stale or have no statistics.
+        """
+        expected = cls.compute_from_stats()
+        inconsistent = []
+        for stored in cls.objects.all():
+            computed = expected.pop(stored.pk, None)
+            fields = ["games", *cls.SUM_FIELDS.values()]
+            if computed is None or any(getattr(stored, field) != getattr(computed, field) for field in fields):
+                inconsistent.append(stored.pk)
+        inconsistent.extend(expected)
+        return sorted(inconsistent)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Class method to replace all stored totals with totals computed from the PlayerStats rows.
+
+        The games of every player are renumbered and their running totals recomputed first (see
+        'PlayerStats.renumber'), so the next game ingested for a player follows the stored totals, and the
+        'games_played' of every player is set to the number of their games.
+
+        Returns:
+            int: The number of aggregates written.
+        """
+        with transaction.atomic():
+            PlayerStats.renumber()
+            aggregates = cls.compute_from_stats()
+            cls.objects.all().delete()
+            cls.objects.bulk_create(aggregates.values())
+            players = list(Player.objects.all())
+            for player in players:
+                aggregate = aggregates.get(player.pk)
+                player.games_played = aggregate.games if aggregate else 0
+            Player.objects.bulk_update(players, ["games_played"], batch_size=1000)
+        dataset_version.bump()
+        return len(aggregates)
+
+    def __str__(self):
+        return f"{self.player.player_name}'s totals"
+
+
+class IngestCheckpoint(models.Model):
+    """
+    Django model for the progress of a resumable CSV ingest.
+
+    A checkpoint is saved in the same transaction as the chunk of rows it describes, so it always points
+    to the end of the last chunk that was committed.
+
+    Attributes:
+        file_hash (CharField): The SHA-256 hash of the file content up to 'byte_offset', which is the hash of the
+                               whole file once it is ingested. A file is identified by its content.
+        file_path (CharField): The path the file was ingested from.
+        byte_offset (BigIntegerField): The position in the file right after the last committed row.
+        rows_done (BigIntegerField): The number of rows committed so far.
+        completed (BooleanField): Whether the whole file has been ingested.
+        updated_at (DateTimeField): When the checkpoint was last saved.
+    """
+    file_hash = models.CharField(
+        max_length=64, unique=True, verbose_name="file hash")
+    file_path = models.CharField(
+        max_length=255, db_index=True, verbose_name="file path")
+    byte_offset = models.BigIntegerField(default=0, verbose_name="byte offset")
+    rows_done = models.BigIntegerField(default=0, verbose_name="rows done")
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="updated at")
+
+    def __str__(self):
+        return f"{self.file_path} ({self.rows_done} rows)"
@@ -0,0 +1,119 @@
+"""
+CSV parsing helpers for the parallel ingest of DataService.
+
+This module does not import Django, so its functions can run in worker processes started with any multiprocessing
+start method without setting Django up.
+"""
+import csv
+import io
+import os
+
+# The largest count a PlayerStats field (a PositiveSmallIntegerField) holds
+MAX_COUNT = 32767
+
+
+def parse_count(value):
+    """
+    Converts a box-score count from a CSV file to an integer.
+
+    Counts are whole numbers from 0 to MAX_COUNT. Values written as floats, like '3.0', are accepted if they are whole.
+
+    Args:
+        value (str): The value of the CSV column.
+
+    Returns:
+        int: The count.
+
+    Raises:
+        ValueError: If the value is not a number, has a fractional part, is negative or is larger than MAX_COUNT.
+    """
+    try:
+        count = int(value)
+    except ValueError:
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{value!r} is not a whole number.") from None
+        count = int(number)
+    if not 0 <= count <= MAX_COUNT:
+        raise ValueError(f"{value!r} is not a count from 0 to {MAX_COUNT}.")
+    return count
+
+
+def parse_counts(values):
+    """
+    Converts the box-score counts of a CSV row to integers, like 'parse_count' does for each of them.
+
+    Rows of plain integers in range, which is nearly all of them, are converted and checked in bulk.
+
+    Args:
+        values (list): The values of the CSV columns.
+
+    Returns:
+        tuple: The counts.
+
+    Raises:
+        ValueError: If a value is not a count, with the message of 'parse_count' for the first one.
+    """
+    try:
+        counts = tuple(map(int, values))
+    except ValueError:
+        return tuple(map(parse_count, values))
+    if counts and (min(counts) < 0 or max(counts) > MAX_COUNT):
+        return tuple(map(parse_count, values))
+    return counts
+
+
+def split_file(file_path, start, range_size):
+    """
+    Splits a file into byte ranges that begin and end on line boundaries.
+
+    Every range except the last one is at least 'range_size' bytes long and ends right after a newline, so no line
+    is split between two ranges. The ranges only depend on the file and 'range_size', not on the number of workers.
+    Lines are assumed not to contain quoted newlines, which holds for the player statistics files.
+
+    Args:
+        file_path (str): The path of the file.
+        start (int): The offset of the first range, usually the end of the header line.
+        range_size (int): The approximate size of a range in bytes.
+
+    Returns:
+        list: (start, end) tuples covering the file from 'start' to its end.
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    with open(file_path, mode="rb") as file:
+        while start < size:
+            file.seek(min(start + range_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(file_path, start, end, columns, encoding="utf-8"):
+    """
+    Parses a byte range of a CSV file into records.
+
+    Args:
+        file_path (str): The path of the file.
+        start (int): The offset of the first byte of the range.
+        end (int): The offset after the last byte of the range.
+        columns (list): The indexes of the player name, the position and the numeric columns, in that order.
+        encoding (str): The encoding of the file.
+
+    Returns:
+        list: A (player name, position, values) tuple per non-empty line, in file order. The values are the
+              numeric columns converted with 'parse_counts'.
+
+    Raises:
+        ValueError: If a numeric column does not contain a count.
+        IndexError: If a line has fewer columns than the header.
+    """
+    with open(file_path, mode="rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode(encoding)
+    name_column, position_column, *value_columns = columns
+    return [(values[name_column], values[position_column],
+             parse_counts([values[column] for column in value_columns]))
+            for values in csv.reader(io.StringIO(text, newline="")) if values]
@@ -0,0 +1,150 @@
+"""
+Percentile ranks of players among the players of the same position.
+
+The index keeps, for every position, the per game value of every statistic of all players at that position in a
+sorted list. It is rebuilt from the PlayerAggregate table, with one query, the first time it is used after the
+dataset version changed, so its size and build time depend on the number of players, not on the number of games.
+A percentile is then found with two binary searches. The values are kept in arrays of doubles rather than lists of
+float objects, which makes the index four times smaller and keeps its pages shared between forked workers.
+"""
+import bisect
+import threading
+from array import array
+
+from asgiref.sync import sync_to_async
+
+from .cache import dataset_version
+from .formulas import derived_statistics
+from .models import PlayerAggregate
+
+# The position of every statistic in the 'traditional' and 'advanced' blocks of the stats response
+RESPONSE_PATHS = {
+    "fta": ("traditional", "freeThrows", "attempts"),
+    "ftm": ("traditional", "freeThrows", "made"),
+    "ftp": ("traditional", "freeThrows", "shootingPercentage"),
+    "two_pa": ("traditional", "twoPoints", "attempts"),
+    "two_pm": ("traditional", "twoPoints", "made"),
+    "two_pp": ("traditional", "twoPoints", "shootingPercentage"),
+    "three_pa": ("traditional", "threePoints", "attempts"),
+    "three_pm": ("traditional", "threePoints", "made"),
+    "three_pp": ("traditional", "threePoints", "shootingPercentage"),
+    "pts": ("traditional", "points"),
+    "reb": ("traditional", "rebounds"),
+    "blk": ("traditional", "blocks"),
+    "ast": ("traditional", "assists"),
+    "stl": ("traditional", "steals"),
+    "to": ("traditional", "turnovers"),
+    "val": ("advanced", "valorization"),
+    "efgp": ("advanced", "effectiveFieldGoalPercentage"),
+    "tsp": ("advanced", "trueShootingPercentage"),
+    "hastp": ("advanced", "hollingerAssistRatio"),
+}
+
+
+def metric_values(aggregated_data):
+    """
+    Calculates the unrounded value of every statistic in the stats response from the per game averages.
+
+    Args:
+        aggregated_data (dict): The aggregated statistics returned by PlayerStatsService.
+
+    Returns:
+        dict: A dictionary mapping every key of RESPONSE_PATHS to its value.
+    """
+    stats = {field: aggregated_data[f"avg_{field}"] for field in PlayerAggregate.SUM_FIELDS}
+    return {**stats, **derived_statistics(stats)}
+
+
+def percentile_rank(values, value):
+    """
+    Calculates the percentile rank of a value in a sorted sequence.
+
+    Values equal to 'value' count half, so the rank of a value is 50 if it is the only one in the list or if
+    every value in the list is equal to it.
+
+    Args:
+        values (array): The sorted values.
+        value (float): The value to rank.
+
+    Returns:
+        float: The percentage of the values below 'value', from 0 to 100.
+    """
+    below = bisect.bisect_left(values, value)
+    equal = bisect.bisect_right(values, value, lo=below) - below
+    return (below + 0.5 * equal) / len(values) * 100
+
+
+class PercentileIndex:
+    """
+    Sorted per position arrays of the per game statistics of all players.
+
+    Attributes:
+        positions (dict): A dictionary mapping every position to a dictionary mapping every key of RESPONSE_PATHS to
+                          the sorted values of the players at that position.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.positions = {}
+
+    def load(self):
+        """
+        Builds the index from the PlayerAggregate table.
+        """
+        positions = {}
+        for aggregate in PlayerAggregate.objects.select_related("player").filter(games__gt=0):
+            aggregated_data = aggregate.averages()
+            values = positions.setdefault(aggregate.player.position, {metric: [] for metric in RESPONSE_PATHS})
+            for metric, value in metric_values(aggregated_data).items():
+                values[metric].append(value)
+        self.positions = {position: {metric: array("d", sorted(metric_list)) for metric, metric_list in values.items()}
+                          for position, values in positions.items()}
+
+    def ensure_loaded(self):
+        """
+        Builds the index if it has not been built for the current dataset version.
+        """
+        version = dataset_version.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self.load()
+                    self._version = version
+
+    def percentiles(self, aggregated_data):
+        """
+        Ranks the statistics of a player among the players of the same position.
+
+        The statistics in 'aggregated_data' do not have to be the ones in the index, so the per game averages of a
+        player's last games can be ranked among the career averages of the player's peers.
+
+        Args:
+            aggregated_data (dict): The aggregated statistics returned by PlayerStatsService.
+
+        Returns:
+            dict: The position, the number of players at the position and the percentile rank of every statistic,
+                  rounded to 1 decimal, in 'traditional' and 'advanced' blocks shaped like the stats response.
+        """
+        self.ensure_loaded()
+        position = aggregated_data["player"].position
+        peers = self.positions.get(position)
+        result = {"position": position, "peers": len(peers["pts"]) if peers else 0, "traditional": {}, "advanced": {}}
+        for metric, value in metric_values(aggregated_data).items():
+            *parents, key = RESPONSE_PATHS[metric]
+            block = result
+            for parent in parents:
+                block = block.setdefault(parent, {})
+            block[key] = round(percentile_rank(peers[metric], value), 1) if peers else None
+        return result
+
+    async def apercentiles(self, aggregated_data):
+        """
+        Ranks the statistics of a player from an async context, building the index in a worker thread if needed.
+        """
+        if self._version == dataset_version.version:
+            return self.percentiles(aggregated_data)
+        return await sync_to_async(self.percentiles)(aggregated_data)
+
+
+percentile_index = PercentileIndex()
@@ -0,0 +1,59 @@
+"""
+Loading the data once before a server forks its worker processes.
+
+With gunicorn's 'preload_app' (gunicorn.preload.conf.py next to manage.py), the application is loaded in the
+master process, so the startup ingest runs there once instead of in every worker. 'preload' then builds the
+in-memory structures answering requests (the selected stats engine, the percentile index and the name index), and
+the forked workers inherit them already built. A worker shares the master's memory pages until one of the two
+processes writes to a page. Python writes to an object whenever it takes a reference to it, and its garbage
+collector writes to every tracked object it scans, so these structures keep their bulk in flat arrays, and
+'preload' moves every object into the permanent generation with gc.freeze(), which the collector never scans.
+
+Preloading needs a file-backed database. SQLite connections must not be used across fork(), and the connection to
+the in-memory database cannot be closed in the master without losing the data, so 'preload' refuses to run with it.
+The master closes its connections before forking and stays the writer, and 'after_fork' makes each worker a reader
+that opens its own connections.
+"""
+import gc
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from .db import become_reader, uses_file_database
+
+
+def preload():
+    """
+    Builds the in-memory structures answering requests and freezes the objects of the process.
+
+    Called in the master process once the application is loaded, before the workers are forked.
+
+    Raises:
+        ImproperlyConfigured: If the default database is not a database file.
+    """
+    if not uses_file_database(connections["default"]):
+        raise ImproperlyConfigured(
+            "Preloading workers requires a file-backed database: SQLite connections cannot be used across fork(), "
+            "and the in-memory database would be lost with the connection holding it.")
+
+    from .engines import get_stats_engine
+    from .percentiles import percentile_index
+    from .search import name_index
+
+    engine = get_stats_engine()
+    if hasattr(engine, "ensure_loaded"):
+        engine.ensure_loaded()
+    percentile_index.ensure_loaded()
+    name_index.ensure_loaded()
+
+    # A connection to a database file must not be used by two processes
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork():
+    """
+    Prepares a worker process forked from a master that called 'preload'.
+    """
+    become_reader()
@@ -0,0 +1,73 @@
+"""
+JSON renderers for the player statistics responses.
+
+The renderer is selected with the STATS_JSON_RENDERER setting:
+
+- 'drf' (the default) is Django REST framework's JSONRenderer.
+- 'orjson' encodes the payload with orjson in a single call. It requires orjson to be installed.
+
+Both renderers produce the same compact UTF-8 output for the statistics payloads.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    A JSONRenderer that encodes data with orjson.
+
+    It can also be listed in DRF's DEFAULT_RENDERER_CLASSES. Indentation requested by the client is ignored.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                "The 'orjson' JSON renderer requires orjson to be installed.")
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data)
+
+
+RENDERERS = {
+    "drf": JSONRenderer,
+    "orjson": OrjsonRenderer,
+}
+
+_renderer = None
+
+
+def get_json_renderer():
+    """
+    Returns the renderer selected by the STATS_JSON_RENDERER setting.
+
+    Returns:
+        JSONRenderer: The process-wide renderer.
+
+    Raises:
+        ImproperlyConfigured: If the setting names an unknown renderer.
+    """
+    global _renderer
+    if _renderer is None:
+        name = getattr(settings, "STATS_JSON_RENDERER", "drf")
+        if name not in RENDERERS:
+            raise ImproperlyConfigured(
+                f"Unknown STATS_JSON_RENDERER '{name}'. Choose one of: {', '.join(RENDERERS)}.")
+        _renderer = RENDERERS[name]()
+    return _renderer
+
+
+@receiver(setting_changed)
+def reset_json_renderer(setting, **kwargs):
+    global _renderer
+    if setting == "STATS_JSON_RENDERER":
+        _renderer = None
@@ -0,0 +1,234 @@
+"""
+Player name search.
+
+Names are normalized by removing accents, case and punctuation, and the index keeps a sorted list of keys: one for
+the normalized name and one for every later word of it, so 'jam' finds 'LeBron James' as well as 'James Harden'.
+The player of every key is kept in a parallel array rather than in a tuple per key, so the index does not
+multiply the objects a forked worker's reads write to (see 'stats_api.preload'). A prefix is looked up with two
+binary searches.
+
+Fuzzy lookups find the keys that begin with a string within a given number of edits of the query. They walk the
+sorted list like a trie, with the slice of keys beginning with a prefix as the node of the prefix: the
+Levenshtein row of every prefix is computed once for all keys sharing it, and a slice is left as soon as the
+distance of all its keys is decided.
+
+The index is patched with the players added since it was last used when the dataset version changes, and rebuilt
+if players were removed, for instance when a snapshot was restored.
+"""
+import bisect
+import threading
+import unicodedata
+from array import array
+
+from .cache import dataset_version
+from .models import Player
+
+# Sorts after every character of a normalized key, so prefix + LAST sorts after every key beginning with prefix
+LAST = "\U0010ffff"
+# Sorts before every character of a normalized key
+FIRST = "\x00"
+
+
+def normalize_name(name):
+    """
+    Normalizes a name for searching.
+
+    Accents are removed, the name is case folded, apostrophes and periods are dropped and every other run of
+    characters that are not letters or digits becomes a single space.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        str: The normalized name, e.g. 'shaquille oneal' for "Shaquille O'Neal".
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    characters = "".join(character for character in decomposed if not unicodedata.combining(character))
+    characters = "".join(character if character.isalnum() else " "
+                         for character in characters.casefold() if character not in "'’.")
+    return " ".join(characters.split())
+
+
+def name_keys(normalized):
+    """
+    Lists the search keys of a normalized name: the name itself and the part starting at every later word.
+    """
+    words = normalized.split(" ")
+    return [" ".join(words[index:]) for index in range(len(words))]
+
+
+def next_row(row, query, character):
+    """
+    Calculates the Levenshtein row of a prefix extended by one character from the row of the prefix.
+    """
+    new_row = [row[0] + 1]
+    for index, query_character in enumerate(query, start=1):
+        new_row.append(min(new_row[-1] + 1, row[index] + 1,
+                           row[index - 1] + (query_character != character)))
+    return new_row
+
+
+def prefix_range(keys, prefix):
+    """
+    Finds the keys beginning with a prefix.
+
+    Args:
+        keys (list): The sorted keys of a NameIndex.
+        prefix (str): The normalized prefix.
+
+    Returns:
+        tuple: The (start, end) slice of 'keys'.
+    """
+    start = bisect.bisect_left(keys, prefix)
+    return start, bisect.bisect_left(keys, prefix + LAST, start)
+
+
+def fuzzy_ranges(keys, query, max_distance):
+    """
+    Finds the keys beginning with a string at most 'max_distance' edits away from the query.
+
+    The distance of a key is the smallest Levenshtein distance between the query and a prefix of the key. The keys
+    are walked like a trie, one slice of keys per prefix. A prefix is not extended once no extension can lower
+    the distance found so far or bring it within 'max_distance', and all keys beginning with it get that distance.
+    Once every distance in the row of a prefix is 'max_distance', only the characters of the query can keep an
+    extension within it, so only the slices of those characters are visited.
+
+    Args:
+        keys (list): The sorted keys of a NameIndex.
+        query (str): The normalized query.
+        max_distance (int): The largest number of edits.
+
+    Returns:
+        list: (distance, start, end) tuples for slices of 'keys' with the same distance.
+    """
+    ranges = []
+
+    def extend(prefix, row, best, start, end):
+        row = next_row(row, query, prefix[-1])
+        best = min(best, row[-1])
+        lowest = min(row)
+        if lowest >= best or lowest > max_distance:
+            if best <= max_distance:
+                ranges.append((best, start, end))
+            return
+        # The keys equal to the prefix sort before its extensions, which all sort after prefix + FIRST
+        extensions = bisect.bisect_left(keys, prefix + FIRST, start, end)
+        if start < extensions and best <= max_distance:
+            ranges.append((best, start, extensions))
+        start = extensions
+        if lowest == max_distance:
+            characters = sorted({character for character, distance in zip(query, row) if distance == lowest})
+            for character in characters:
+                child_start = bisect.bisect_left(keys, prefix + character, start, end)
+                child_end = bisect.bisect_left(keys, prefix + character + LAST, child_start, end)
+                if child_start < child_end:
+                    extend(prefix + character, row, best, child_start, child_end)
+            return
+        depth = len(prefix)
+        while start < end:
+            child = keys[start][:depth + 1]
+            child_end = bisect.bisect_left(keys, child + LAST, start, end)
+            extend(child, row, best, start, child_end)
+            start = child_end
+
+    root = list(range(len(query) + 1))
+    start = 0
+    while start < len(keys):
+        character = keys[start][0]
+        end = bisect.bisect_left(keys, character + LAST, start)
+        extend(character, root, len(query), start, end)
+        start = end
+    return ranges
+
+
+class NameIndex:
+    """
+    A sorted index of the normalized names of all players.
+
+    Attributes:
+        entries (tuple): The sorted keys and an array with the player of every key, as an index into 'players'.
+                         They are replaced together, so a search never sees the keys of one load with the players
+                         of another.
+        players (list): (player name, position) tuples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._last_id = 0
+        self._last_name = None
+        self.entries = ([], array("l"))
+        self.players = []
+
+    def load(self):
+        """
+        Adds the players created since the last load to the index, or rebuilds it if players were removed.
+
+        The new lists replace the old ones once they are complete, so concurrent searches never see a partial
+        update.
+        """
+        players, entries = list(self.players), list(zip(*self.entries))
+        new_players = list(Player.objects.filter(id__gt=self._last_id).order_by("id").values_list(
+            "id", "player_name", "position"))
+        count = Player.objects.count()
+        last_loaded = Player.objects.filter(id=self._last_id).values_list("player_name", flat=True).first()
+        if count != len(players) + len(new_players) or (players and last_loaded != self._last_name):
+            players, entries = [], []
+            self._last_id, self._last_name = 0, None
+            new_players = list(Player.objects.order_by("id").values_list("id", "player_name", "position"))
+        for player_id, player_name, position in new_players:
+            entries.extend((key, len(players)) for key in name_keys(normalize_name(player_name)))
+            players.append((player_name, position))
+            self._last_id, self._last_name = player_id, player_name
+        # Sorting merges the sorted run of the previous entries with the entries of the new players
+        entries.sort()
+        self.players = players
+        self.entries = ([key for key, _ in entries], array("l", [player for _, player in entries]))
+
+    def ensure_loaded(self):
+        """
+        Updates the index if it has not been updated for the current dataset version.
+        """
+        version = dataset_version.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self.load()
+                    self._version = version
+
+    def search(self, query, max_distance=0, limit=10):
+        """
+        Finds the players with a name or a word of their name beginning with a query.
+
+        Args:
+            query (str): The query. It is normalized like the names.
+            max_distance (int): The number of edits allowed between the query and the beginning of a name.
+            limit (int): The largest number of players returned.
+
+        Returns:
+            list: (player name, position, distance) tuples, ordered by distance and normalized key.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        self.ensure_loaded()
+        (keys, key_players), players = self.entries, self.players
+        if max_distance:
+            ranges = sorted(fuzzy_ranges(keys, query, max_distance))
+        else:
+            ranges = [(0, *prefix_range(keys, query))]
+
+        results = []
+        found = set()
+        for distance, start, end in ranges:
+            for index in range(start, end):
+                player = key_players[index]
+                if player not in found:
+                    found.add(player)
+                    results.append((*players[player], distance))
+                    if len(results) == limit:
+                        return results
+        return results
+
+
+name_index = NameIndex()
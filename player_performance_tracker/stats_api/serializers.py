@@ -1,5 +1,8 @@
 from rest_framework import serializers
 
+from .formulas import derived_statistics
+from .models import PlayerStats
+
 
 class PlayerStatsAggregateSerializer(serializers.Serializer):
     """
@@ -45,3 +48,54 @@ class PlayerStatsAggregateSerializer(serializers.Serializer):
             dict: The advanced statistics of the player.
         """
         return obj.advanced_to_dict()
+
+
+def player_stats_to_dict(aggregated_data):
+    """
+    Builds the same representation as PlayerStatsAggregateSerializer straight from aggregated data.
+
+    The derived statistics are calculated once with stats_api.formulas, like the PlayerStats properties,
+    and every value is rounded once, without building a PlayerStats instance or running the serializer fields.
+
+    Args:
+        aggregated_data (dict): The aggregated statistics returned by PlayerStatsService.
+
+    Returns:
+        dict: The player's name, the number of games played and the traditional and advanced statistics.
+    """
+    stats = {field: aggregated_data[f"avg_{field}"] for field in PlayerStats.CSV_MAPPING.values()}
+    derived = derived_statistics(stats)
+    player = aggregated_data["player"]
+    return {
+        "playerName": player.player_name,
+        "gamesPlayed": player.games_played,
+        "traditional": {
+            "freeThrows": {
+                "attempts": round(stats["fta"], 1),
+                "made": round(stats["ftm"], 1),
+                "shootingPercentage": round(derived["ftp"], 1),
+            },
+            "twoPoints": {
+                "attempts": round(stats["two_pa"], 1),
+                "made": round(stats["two_pm"], 1),
+                "shootingPercentage": round(derived["two_pp"], 1),
+            },
+            "threePoints": {
+                "attempts": round(stats["three_pa"], 1),
+                "made": round(stats["three_pm"], 1),
+                "shootingPercentage": round(derived["three_pp"], 1),
+            },
+            "points": round(derived["pts"], 1),
+            "rebounds": round(stats["reb"], 1),
+            "blocks": round(stats["blk"], 1),
+            "assists": round(stats["ast"], 1),
+            "steals": round(stats["stl"], 1),
+            "turnovers": round(stats["to"], 1),
+        },
+        "advanced": {
+            "valorization": round(derived["val"], 1),
+            "effectiveFieldGoalPercentage": round(derived["efgp"], 1),
+            "trueShootingPercentage": round(derived["tsp"], 1),
+            "hollingerAssistRatio": round(derived["hastp"], 1),
+        },
+    }
@@ -1,8 +1,25 @@
 import os
 import logging
 import csv
-from django.db.models import Avg
-from .models import Player, PlayerStats
+import hashlib
+import itertools
+import sqlite3
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import F
+from .cache import dataset_version
+from .columnar import ColumnarBuilder, ColumnarStore, current_generation
+from .engines import get_stats_engine
+from .expressions import metric_expressions
+from .metrics import metrics
+from .models import IngestCheckpoint, Player, PlayerAggregate, PlayerStats
+from .parsing import parse_counts, parse_range, split_file
+from .percentiles import percentile_index
+from .search import name_index
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -11,60 +28,841 @@ class DataService:
     """
     A service class for handling CSV data and filling the database.
 
-    This class provides methods to validate a CSV file and fill the database with data from the CSV file.
+    This class provides methods to validate the header of a CSV file and fill the database with data from it.
     The CSV file is expected to be in a specific format, with certain required columns.
     """
     FILE_NAME = "L9HomeworkChallengePlayersInput.csv" # TODO Change the name of the file
     FILE_PATH = os.path.join(BASE_DIR, f"stats_api/data/{FILE_NAME}")
     MODE = "r"
     ENCODING = "utf-8-sig"
+    BATCH_SIZE = 5000
+    CHUNK_SIZE = 50000
+    HASH_BLOCK_SIZE = 1024 * 1024
+    PARALLEL_RANGE_SIZE = 4 * 1024 * 1024
 
     REQUIRED_COLUMNS = ["PLAYER", "POSITION", "FTM", "FTA", "2PM",
                         "2PA", "3PM", "3PA", "REB", "BLK", "AST", "STL", "TOV"]
 
     @staticmethod
-    def validate_csv_file():
+    def validate_columns(fieldnames):
         """
-        Validates the CSV file.
+        Validates the header of a CSV file.
 
-        Checks if the file exists and if it contains the required columns.
-        Raises a FileNotFoundError if the file does not exist, and a ValueError if the required columns are missing.
+        Args:
+            fieldnames (list): The column names read from the first line of the file.
+
+        Raises:
+            ValueError: If any of the required columns is missing.
+        """
+        if not fieldnames or not set(DataService.REQUIRED_COLUMNS).issubset(fieldnames):
+            logging.error("CSV file is missing required columns.")
+            raise ValueError("CSV file is missing required columns.")
+
+    @staticmethod
+    def read_header(line):
+        """
+        Parses and validates the header line of a CSV file.
+
+        Args:
+            line (bytes): The first line of the file.
+
+        Returns:
+            tuple: The column names, and the indexes of the PLAYER, POSITION and PlayerStats.CSV_MAPPING columns,
+                   in that order.
+
+        Raises:
+            ValueError: If any of the required columns is missing.
+        """
+        fieldnames = next(csv.reader([line.decode(DataService.ENCODING)]), None)
+        DataService.validate_columns(fieldnames)
+        return fieldnames, [fieldnames.index(column) for column in ["PLAYER", "POSITION", *PlayerStats.CSV_MAPPING]]
+
+    @staticmethod
+    def check_file_exists(file_path):
+        """
+        Checks that a file exists before it is read.
+
+        Args:
+            file_path (str): The path of the file.
+
+        Raises:
+            FileNotFoundError: If there is no file at 'file_path'.
         """
-        if not os.path.exists(DataService.FILE_PATH):
-            logging.error(
-                f"File {DataService.FILE_PATH} does not exist.")
-            raise FileNotFoundError(
-                f"File {DataService.FILE_PATH} does not exist.")
+        if not os.path.exists(file_path):
+            logging.error(f"File {file_path} does not exist.")
+            raise FileNotFoundError(f"File {file_path} does not exist.")
+
+    @staticmethod
+    def find_checkpoint(file_path, by_path=False):
+        """
+        Finds the IngestCheckpoint recording what was ingested from a CSV file.
+
+        The checkpoint is looked up by the hash of the file content. With 'by_path', the latest checkpoint saved for
+        the path is returned first if there is one, without hashing the file.
+
+        Args:
+            file_path (str): The CSV file.
+            by_path (bool): Whether to look the checkpoint up by path before looking it up by content.
+
+        Returns:
+            IngestCheckpoint: The checkpoint, or an unsaved checkpoint for the path and the hash of the file if
+                              nothing was ingested from it yet.
+        """
+        if by_path:
+            checkpoint = IngestCheckpoint.objects.filter(
+                file_path=file_path).order_by("-updated_at", "-pk").first()
+            if checkpoint is not None:
+                return checkpoint
+        file_hash = DataService.hash_file(file_path)
+        checkpoint = IngestCheckpoint.objects.filter(file_hash=file_hash).first()
+        return checkpoint or IngestCheckpoint(file_path=file_path, file_hash=file_hash)
+
+    @staticmethod
+    def complete_checkpoint(checkpoint, file_path, rows):
+        """
+        Saves a checkpoint recording that a whole file was ingested.
+
+        Args:
+            checkpoint (IngestCheckpoint): The checkpoint returned by 'find_checkpoint'.
+            file_path (str): The CSV file.
+            rows (int): The number of rows ingested from it.
+        """
+        checkpoint.file_path = file_path
+        checkpoint.byte_offset = os.path.getsize(file_path)
+        checkpoint.rows_done = rows
+        checkpoint.completed = True
+        checkpoint.save()
+
+    @staticmethod
+    def hash_file(file_path):
+        """
+        Calculates the SHA-256 hash of a file without reading it into memory at once.
+
+        Args:
+            file_path (str): The path of the file.
+
+        Returns:
+            str: The hexadecimal digest of the file content.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, mode="rb") as file:
+            for block in iter(lambda: file.read(DataService.HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def load_players():
+        """
+        Loads the existing players into a map used to resolve CSV rows without a query per row.
+
+        Returns:
+            dict: A dictionary mapping player names to Player objects.
+        """
+        return {player.player_name: player for player in Player.objects.all()}
+
+    @staticmethod
+    def write_rows(rows, players, batch_size):
+        """
+        Writes CSV rows to the database with 'write_records'.
+
+        Args:
+            rows (iterable): Dictionaries representing rows of CSV data.
+            players (dict): The map returned by 'load_players'.
+            batch_size (int): The number of rows per insert.
+
+        Returns:
+            int: The number of rows written.
+        """
+        mapping = PlayerStats.CSV_MAPPING
+        return DataService.write_records(
+            ((row["PLAYER"], row["POSITION"], parse_counts([row[key] for key in mapping])) for row in rows),
+            players, batch_size)
+
+    @staticmethod
+    def write_records(records, players, batch_size):
+        """
+        Writes parsed CSV rows to the database.
+
+        Players that are not in 'players' yet are created and added to it. Every game is numbered after the
+        player's earlier games and given the running totals of the player's statistics, starting from the stored
+        PlayerAggregate totals, which are read for the players of every chunk of 'batch_size' rows that were not
+        seen before. Statistics are inserted with 'insert_stats' in chunks of 'batch_size' rows, and the
+        PlayerAggregate totals and 'games_played' are updated once for every player that appears in 'records'.
+        The caller is responsible for the transaction.
+
+        Args:
+            records (iterable): (player name, position, values) tuples, where the values are integers in the
+                                order of the PlayerStats.CSV_MAPPING fields.
+            players (dict): The map returned by 'load_players'.
+            batch_size (int): The number of rows per insert.
+
+        Returns:
+            int: The number of rows written.
+        """
+        # The games and running totals of the players seen so far, starting from the stored totals
+        sum_fields = list(PlayerAggregate.SUM_FIELDS.values())
+        running = {}
+        empty = [0] * (len(PlayerStats.CSV_MAPPING) + 1)
+        games = Counter()
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            chunk_players = []
+            for key, position, _ in chunk:
+                player = players.get(key)
+                if player is None:
+                    player = Player.objects.create(
+                        player_name=key, position=position)
+                    players[key] = player
+                chunk_players.append(player)
+            # Only the totals of the players first seen in this chunk are read
+            new_ids = {player.pk for player in chunk_players} - running.keys()
+            if new_ids:
+                stored = PlayerAggregate.objects.in_bulk(new_ids, field_name="player_id")
+                for player_id in new_ids:
+                    aggregate = stored.get(player_id)
+                    running[player_id] = list(empty) if aggregate is None else \
+                        [aggregate.games, *(getattr(aggregate, field) for field in sum_fields)]
+
+            batch = []
+            for player, (key, _, values) in zip(chunk_players, chunk):
+                totals = running[player.pk]
+                totals[0] += 1
+                totals[1:] = [total + value for total, value in zip(totals[1:], values)]
+                batch.append((player.pk, totals[0], *values, *totals[1:]))
+                games[key] += 1
+            DataService.insert_stats(batch)
+
+        PlayerAggregate.write([
+            PlayerAggregate(player_id=player_id, games=totals[0], **dict(zip(sum_fields, totals[1:])))
+            for player_id, totals in ((players[key].pk, running[players[key].pk]) for key in games)])
+        for key, count in games.items():
+            players[key].games_played += count
+        Player.objects.bulk_update(
+            [players[key] for key in games], ["games_played"], batch_size=batch_size)
+        return sum(games.values())
+
+    @staticmethod
+    def insert_stats(rows):
+        """
+        Inserts PlayerStats rows with a single prepared statement.
+
+        The rows are passed to the database as plain tuples, which avoids building a model instance and compiling
+        the SQL of every value as 'bulk_create' does.
+
+        Args:
+            rows (list): Tuples with the values of the columns in 'PlayerStats.INSERT_FIELDS', in that order.
+        """
+        table = connection.ops.quote_name(PlayerStats._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(PlayerStats._meta.get_field(field).column)
+                            for field in PlayerStats.INSERT_FIELDS)
+        placeholders = ", ".join(["%s"] * len(PlayerStats.INSERT_FIELDS))
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+    @staticmethod
+    def fill_db_from_csv(file_path=None, batch_size=None):
+        """
+        Fills the database with data from the CSV file.
+
+        The file is read in a single pass inside one transaction. The header is validated when the
+        first line is read, and the rows are written with 'write_records': players are resolved through an
+        in-memory name map, statistics are inserted with 'insert_stats' (one prepared statement executed for
+        'batch_size' rows at a time), and each player's 'games_played' and aggregate are updated once after
+        all rows have been read.
+        A completed IngestCheckpoint is saved in the same transaction, and a file whose content was
+        already ingested is skipped. The dataset version is bumped once the transaction is committed.
+        Raises an exception if there is an error while filling the database.
+
+        Args:
+            file_path (str, optional): The CSV file to read. Defaults to FILE_PATH.
+            batch_size (int, optional): The number of rows per insert. Defaults to BATCH_SIZE.
+
+        Returns:
+            int: The number of rows inserted.
+        """
+        file_path = file_path or DataService.FILE_PATH
+        batch_size = batch_size or DataService.BATCH_SIZE
+        DataService.check_file_exists(file_path)
         try:
-            with open(file=DataService.FILE_PATH,  mode=DataService.MODE, encoding=DataService.ENCODING) as csv_file:
+            checkpoint = DataService.find_checkpoint(file_path)
+            if checkpoint.completed:
+                logging.info(f"File {file_path} was already ingested.")
+                return 0
+            start = time.perf_counter()
+            with open(file=file_path, mode=DataService.MODE, encoding=DataService.ENCODING) as csv_file, \
+                    transaction.atomic():
                 reader = csv.DictReader(csv_file)
-                if not set(DataService.REQUIRED_COLUMNS).issubset(reader.fieldnames):
-                    logging.error("CSV file is missing required columns.")
-                    raise ValueError("CSV file is missing required columns.")
+                DataService.validate_columns(reader.fieldnames)
+                rows = DataService.write_rows(
+                    reader, DataService.load_players(), batch_size)
+                DataService.complete_checkpoint(checkpoint, file_path, rows)
+            metrics.record_ingest(rows, time.perf_counter() - start)
+            DataService.publish_changes()
+            return rows
         except Exception as e:
-            logging.error(f"Error opening file {
-                          DataService.FILE_PATH}: {str(e)}")
+            metrics.record_ingest_error()
+            logging.error(f"Error filling database from CSV: {str(e)}")
             raise
 
     @staticmethod
-    def fill_db_from_csv():
+    def fill_db_from_csv_parallel(file_path=None, workers=None, batch_size=None, range_size=None):
         """
-        Fills the database with data from the CSV file.
+        Fills the database with data from the CSV file, parsing it in several processes.
 
-        Validates the CSV file, then reads the file and creates Player and PlayerStats objects for each row.
-        Raises an exception if there is an error while filling the database.
+        The file is split into byte ranges of about 'range_size' bytes that end on line boundaries. Worker processes
+        read the columns they need by index and convert them to counts, and this process writes the parsed ranges
+        in file order with 'write_records', inside one transaction. At most two ranges per worker are parsed ahead
+        of the writer, so memory use does not depend on the file size. Because the ranges do not depend on the
+        number of workers and are written in order, the database ends up the same for any number of workers.
+        Checkpoints, the dataset version and errors are handled like in 'fill_db_from_csv'.
+
+        Args:
+            file_path (str, optional): The CSV file to read. Defaults to FILE_PATH.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            batch_size (int, optional): The number of rows per insert. Defaults to BATCH_SIZE.
+            range_size (int, optional): The size of the byte ranges. Defaults to PARALLEL_RANGE_SIZE.
+
+        Returns:
+            int: The number of rows inserted.
         """
+        file_path = file_path or DataService.FILE_PATH
+        workers = workers or os.cpu_count() or 1
+        batch_size = batch_size or DataService.BATCH_SIZE
+        range_size = range_size or DataService.PARALLEL_RANGE_SIZE
+        DataService.check_file_exists(file_path)
         try:
-            DataService.validate_csv_file()
-            with open(file=DataService.FILE_PATH, mode=DataService.MODE, encoding=DataService.ENCODING) as csv_file:
-                reader = csv.DictReader(csv_file)
-                for row in reader:
-                    player = Player.create_from_csv_row(row)
-                    PlayerStats.create_from_csv_row(player, row)
+            checkpoint = DataService.find_checkpoint(file_path)
+            if checkpoint.completed:
+                logging.info(f"File {file_path} was already ingested.")
+                return 0
+            start = time.perf_counter()
+            with open(file_path, mode="rb") as csv_file:
+                header = csv_file.readline()
+            _, columns = DataService.read_header(header)
+            ranges = split_file(file_path, len(header), range_size)
+
+            def records(executor):
+                pending = deque()
+                for range_start, range_end in ranges:
+                    pending.append(executor.submit(
+                        parse_range, file_path, range_start, range_end, columns))
+                    if len(pending) >= 2 * workers:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+
+            with ProcessPoolExecutor(max_workers=workers) as executor, transaction.atomic():
+                rows = DataService.write_records(
+                    records(executor), DataService.load_players(), batch_size)
+                DataService.complete_checkpoint(checkpoint, file_path, rows)
+            metrics.record_ingest(rows, time.perf_counter() - start)
+            DataService.publish_changes()
+            return rows
+        except Exception as e:
+            metrics.record_ingest_error()
+            logging.error(f"Error filling database from CSV: {str(e)}")
+            raise
+
+    @staticmethod
+    def fill_db_from_csv_resumable(file_path=None, chunk_size=None, batch_size=None, progress=None):
+        """
+        Fills the database from the CSV file in chunks that are committed one by one.
+
+        The file is streamed 'chunk_size' rows at a time with 'ingest_from_checkpoint', so memory use does not
+        depend on the file size. Each chunk is written in its own transaction together with an IngestCheckpoint
+        that records the byte offset reached, the number of rows done and the hash of the file up to the offset.
+        If the process is interrupted, the next call for the same file continues after the last committed chunk,
+        and rows appended to the file since it was ingested are added the same way. A chunk that was not committed
+        leaves neither statistics nor 'games_played' changes behind, so nothing is counted twice. The dataset
+        version is bumped after every committed chunk.
+
+        Args:
+            file_path (str, optional): The CSV file to read. Defaults to FILE_PATH.
+            chunk_size (int, optional): The number of rows per committed chunk. Defaults to CHUNK_SIZE.
+            batch_size (int, optional): The number of rows per insert. Defaults to BATCH_SIZE.
+            progress (callable, optional): Called after every chunk with the checkpoint and the number
+                of rows inserted by this call so far.
+
+        Returns:
+            int: The number of rows inserted by this call.
+        """
+        file_path = file_path or DataService.FILE_PATH
+        DataService.check_file_exists(file_path)
+        try:
+            checkpoint = DataService.find_checkpoint(file_path, by_path=True)
+            if checkpoint.completed and (checkpoint.file_path != file_path
+                                         or checkpoint.byte_offset == os.path.getsize(file_path)):
+                logging.info(f"File {file_path} was already ingested.")
+                return 0
+            return DataService.ingest_from_checkpoint(
+                file_path, checkpoint, chunk_size, batch_size, progress=progress)
         except Exception as e:
+            metrics.record_ingest_error()
             logging.error(f"Error filling database from CSV: {str(e)}")
             raise
 
+    @staticmethod
+    def ingest_new_rows(file_path, chunk_size=None, batch_size=None):
+        """
+        Ingests the rows of a CSV file that have not been ingested yet.
+
+        Files are tracked by path with an IngestCheckpoint holding the byte offset reached and the hash of the
+        content up to it. A file without a checkpoint is ingested from the start, unless a file with the same
+        content was already ingested. For a file with a checkpoint only the rows after the offset are ingested
+        with 'ingest_from_checkpoint', provided the content before it is unchanged, so rows appended to a file are
+        added without counting the earlier ones twice. A file whose ingested part was modified is skipped with an
+        error. A last line without a newline may still be being written, so it is left for a later call.
+
+        Args:
+            file_path (str): The CSV file to read.
+            chunk_size (int, optional): The number of rows per committed chunk. Defaults to CHUNK_SIZE.
+            batch_size (int, optional): The number of rows per insert. Defaults to BATCH_SIZE.
+
+        Returns:
+            int: The number of rows inserted.
+        """
+        DataService.check_file_exists(file_path)
+        try:
+            checkpoint = DataService.find_checkpoint(file_path, by_path=True)
+            if checkpoint.pk is not None and checkpoint.file_path != file_path:
+                logging.info(f"File {file_path} has the same content as an ingested file.")
+                return 0
+            return DataService.ingest_from_checkpoint(
+                file_path, checkpoint, chunk_size, batch_size, complete_lines_only=True)
+        except Exception as e:
+            metrics.record_ingest_error()
+            logging.error(f"Error ingesting new rows from {file_path}: {str(e)}")
+            raise
+
+    @staticmethod
+    def ingest_from_checkpoint(file_path, checkpoint, chunk_size=None, batch_size=None, complete_lines_only=False,
+                               progress=None):
+        """
+        Ingests the rows of a CSV file after the byte offset of its IngestCheckpoint.
+
+        The hash of a checkpoint is always the hash of the file content up to its offset, so the content before the
+        offset is hashed first and compared with it, and nothing is ingested from a file whose ingested part was
+        modified. Every chunk of 'chunk_size' rows is committed together with the checkpoint and bumps the dataset
+        version, so readers see the new data chunk by chunk. The columnar store is updated once, before the
+        version is bumped for the last chunk.
+
+        Args:
+            file_path (str): The CSV file to read.
+            checkpoint (IngestCheckpoint): The checkpoint returned by 'find_checkpoint'.
+            chunk_size (int, optional): The number of rows per committed chunk. Defaults to CHUNK_SIZE.
+            batch_size (int, optional): The number of rows per insert. Defaults to BATCH_SIZE.
+            complete_lines_only (bool): Whether to leave a last line without a newline for a later call.
+            progress (callable, optional): Called after every chunk with the checkpoint and the number
+                of rows inserted by this call so far.
+
+        Returns:
+            int: The number of rows inserted.
+        """
+        chunk_size = chunk_size or DataService.CHUNK_SIZE
+        batch_size = batch_size or DataService.BATCH_SIZE
+        size = os.path.getsize(file_path)
+        if checkpoint.byte_offset == size:
+            return 0
+        elif checkpoint.byte_offset > size:
+            logging.error(f"File {file_path} is shorter than the part that was already ingested.")
+            return 0
+
+        digest = hashlib.sha256()
+        rows_before = checkpoint.rows_done
+        with open(file_path, mode="rb") as csv_file:
+            header = csv_file.readline()
+            fieldnames, _ = DataService.read_header(header)
+            offset = checkpoint.byte_offset
+            if offset:
+                csv_file.seek(0)
+                remaining = offset
+                while remaining:
+                    block = csv_file.read(min(remaining, DataService.HASH_BLOCK_SIZE))
+                    digest.update(block)
+                    remaining -= len(block)
+                if digest.hexdigest() != checkpoint.file_hash:
+                    logging.error(f"File {file_path} was modified after it was ingested.")
+                    return 0
+            else:
+                digest.update(header)
+                offset = len(header)
+
+            players = DataService.load_players()
+            unterminated = last_chunk = False
+            while not unterminated:
+                lines = list(itertools.islice(iter(csv_file.readline, b""), chunk_size))
+                if complete_lines_only and lines and not lines[-1].endswith(b"\n"):
+                    lines.pop()
+                    unterminated = True
+                if not lines:
+                    break
+                digest.update(b"".join(lines))
+                offset += sum(len(line) for line in lines)
+                rows = (dict(zip(fieldnames, values))
+                        for values in csv.reader(line.decode("utf-8") for line in lines) if values)
+                start = time.perf_counter()
+                with transaction.atomic():
+                    chunk_rows = DataService.write_rows(
+                        rows, players, batch_size)
+                    checkpoint.rows_done += chunk_rows
+                    checkpoint.byte_offset = offset
+                    checkpoint.file_hash = digest.hexdigest()
+                    checkpoint.completed = offset >= size
+                    checkpoint.save()
+                last_chunk = checkpoint.completed or unterminated
+                DataService.publish_changes(update_store=last_chunk and checkpoint.rows_done > rows_before)
+                metrics.record_ingest(chunk_rows, time.perf_counter() - start)
+                if progress:
+                    progress(checkpoint, checkpoint.rows_done - rows_before)
+        rows = checkpoint.rows_done - rows_before
+        if rows and not last_chunk:
+            DataService.publish_changes()
+        return rows
+
+    @staticmethod
+    def snapshot_path(file_hash):
+        """
+        Gets the path of the snapshot for a CSV file.
+
+        The snapshot name combines the hash of the file with the migrations applied to the database,
+        so a snapshot is never restored into a different schema.
+
+        Args:
+            file_hash (str): The hash of the CSV file, as returned by 'hash_file'.
+
+        Returns:
+            str: The path of the snapshot, or None if snapshots are disabled or the database is not SQLite.
+        """
+        snapshot_dir = getattr(settings, "STATS_SNAPSHOT_DIR", None)
+        if not snapshot_dir or connection.vendor != "sqlite":
+            return None
+        migrations = sorted(MigrationRecorder(
+            connection).applied_migrations())
+        key = hashlib.sha256(
+            f"{file_hash}:{migrations}".encode()).hexdigest()
+        return os.path.join(snapshot_dir, f"{key}.sqlite3")
+
+    @staticmethod
+    def save_snapshot(snapshot_path):
+        """
+        Writes a compacted copy of the whole database to a snapshot file.
+
+        The copy is written next to the snapshot and then renamed, so a snapshot is either complete or missing.
+
+        Args:
+            snapshot_path (str): The path returned by 'snapshot_path'.
+        """
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM INTO %s", [temporary_path])
+        os.replace(temporary_path, snapshot_path)
+
+    @staticmethod
+    def restore_snapshot(snapshot_path):
+        """
+        Replaces the content of the database with a snapshot written by 'save_snapshot'.
+
+        Args:
+            snapshot_path (str): The path returned by 'snapshot_path'.
+        """
+        connection.ensure_connection()
+        source = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(connection.connection)
+        finally:
+            source.close()
+        DataService.publish_changes()
+
+    @staticmethod
+    def write_columnar_store(directory):
+        """
+        Writes the games in the database as a new generation of a columnar store.
+
+        A generation records the id of the last game it holds. If the current generation still holds all the
+        games up to that id, only the games added after it are read from the database and appended to it, and
+        no generation is written if there are none. Otherwise, e.g. after games were deleted or when there is no
+        store yet, all games are read. The games read are collected in memory grouped by player, so a full
+        rewrite needs about as much memory as the NumPy engine.
+
+        Args:
+            directory (str): The directory of the store.
+
+        Returns:
+            int: The number of games read from the database.
+        """
+        fields = list(PlayerStats.CSV_MAPPING.values())
+        games = PlayerStats.objects.order_by("pk")
+        try:
+            base = ColumnarStore(directory)
+        except (FileNotFoundError, ValueError):
+            base = None
+        # Game ids are never reused, so the generation is current if none of its games were deleted
+        if base is not None and base.last_id is not None and \
+                games.filter(pk__lte=base.last_id).count() == base.rows:
+            games = games.filter(pk__gt=base.last_id)
+        else:
+            base = None
+
+        builder = ColumnarBuilder(fields)
+        rows = games.values_list("pk", "player__player_name", "player__position", *fields).iterator(
+            chunk_size=DataService.CHUNK_SIZE)
+        for pk, player_name, position, *values in rows:
+            builder.add(player_name, position, values)
+            builder.last_id = pk
+        if base is not None and not builder.rows:
+            return 0
+        builder.write(directory, base)
+        return builder.rows
+
+    @staticmethod
+    def update_columnar_store():
+        """
+        Updates the columnar store in the STATS_COLUMNAR_DIR setting after an ingest, if the setting is set.
+
+        Errors are logged, so a failure to write the store does not fail the ingest. The dataset version is not
+        bumped, see 'publish_changes'.
+        """
+        directory = getattr(settings, "STATS_COLUMNAR_DIR", None)
+        if not directory:
+            return
+        try:
+            DataService.write_columnar_store(directory)
+        except (OSError, DatabaseError) as e:
+            logging.error(f"Error writing columnar store {directory}: {str(e)}")
+
+    @staticmethod
+    def publish_changes(update_store=True):
+        """
+        Makes committed changes visible to the readers of the data.
+
+        The columnar store is updated first, so the dataset version is bumped once for the changes and the store
+        that includes them.
+
+        Args:
+            update_store (bool): Whether to update the columnar store before bumping the dataset version.
+        """
+        if update_store:
+            DataService.update_columnar_store()
+        dataset_version.bump()
+
+    @staticmethod
+    def csv_to_columnar(file_path, directory, range_size=None):
+        """
+        Converts a CSV file to a columnar store without using the database.
+
+        Args:
+            file_path (str): The CSV file to read.
+            directory (str): The directory of the store.
+            range_size (int, optional): The number of bytes parsed at a time. Defaults to PARALLEL_RANGE_SIZE.
+
+        Returns:
+            int: The number of games written.
+        """
+        range_size = range_size or DataService.PARALLEL_RANGE_SIZE
+        DataService.check_file_exists(file_path)
+        with open(file_path, mode="rb") as csv_file:
+            header = csv_file.readline()
+        _, columns = DataService.read_header(header)
+        builder = ColumnarBuilder(PlayerStats.CSV_MAPPING.values())
+        for range_start, range_end in split_file(file_path, len(header), range_size):
+            for player_name, position, values in parse_range(file_path, range_start, range_end, columns):
+                builder.add(player_name, position, values)
+        builder.write(directory)
+        return builder.rows
+
+    @staticmethod
+    def ensure_columnar_store():
+        """
+        Writes the columnar store in STATS_COLUMNAR_DIR if the setting is set and the store is missing.
+        """
+        columnar_dir = getattr(settings, "STATS_COLUMNAR_DIR", None)
+        if columnar_dir and current_generation(columnar_dir) is None:
+            DataService.publish_changes()
+
+    @staticmethod
+    def load_on_startup(file_path=None):
+        """
+        Loads the CSV file into the database when the application starts.
+
+        A file that was ingested into the database before is handed to 'ingest_new_rows', which adds the rows
+        appended to it since and refuses a file whose ingested part was modified, so no game is counted twice.
+        A file with the content of an ingested file is skipped. Any other file is only loaded into an empty
+        database, and is not loaded with an error otherwise. If a snapshot for the file exists, the snapshot is
+        restored instead of reading the CSV file. Otherwise the file is ingested, in parallel if the
+        STATS_INGEST_WORKERS setting is greater than 1, and a snapshot is saved for the next start.
+        The columnar store in STATS_COLUMNAR_DIR is written if it is missing.
+
+        Args:
+            file_path (str, optional): The CSV file to load. Defaults to FILE_PATH.
+        """
+        file_path = file_path or DataService.FILE_PATH
+        DataService.check_file_exists(file_path)
+        checkpoint = DataService.find_checkpoint(file_path, by_path=True)
+        if checkpoint.pk is not None and checkpoint.file_path == file_path:
+            DataService.ingest_new_rows(file_path)
+            DataService.ensure_columnar_store()
+            return
+        if checkpoint.completed:
+            DataService.ensure_columnar_store()
+            return
+        if Player.objects.exists():
+            logging.error(f"File {file_path} does not match the data in the database and is not loaded.")
+            return
+
+        snapshot_path = DataService.snapshot_path(checkpoint.file_hash)
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                DataService.restore_snapshot(snapshot_path)
+                return
+            except sqlite3.Error as e:
+                logging.error(
+                    f"Error restoring snapshot {snapshot_path}: {str(e)}")
+
+        workers = getattr(settings, "STATS_INGEST_WORKERS", 1)
+        if workers > 1:
+            DataService.fill_db_from_csv_parallel(file_path, workers)
+        else:
+            DataService.fill_db_from_csv(file_path)
+        if snapshot_path:
+            try:
+                DataService.save_snapshot(snapshot_path)
+            except (OSError, DatabaseError) as e:
+                logging.error(
+                    f"Error saving snapshot {snapshot_path}: {str(e)}")
+
+
+class CsvStreamIngestor:
+    """
+    Ingests CSV data that arrives in pieces, such as the body of an upload.
+
+    Data is fed with 'feed' as it is received. The first line is validated against DataService.REQUIRED_COLUMNS
+    as soon as it is complete, before any further data is needed. Complete lines are collected and written with
+    'DataService.write_records' every 'chunk_size' rows, each chunk in its own transaction followed by a bump of the
+    dataset version, so only one chunk is held in memory at a time. Rows that cannot be ingested are counted by
+    error type and skipped instead of failing the whole upload.
+
+    Attributes:
+        ERROR_SAMPLES (int): The number of rejected rows described in the result.
+        rows (int): The number of rows ingested so far.
+        errors (Counter): The number of rejected rows per error type.
+        samples (list): The line number and reason of the first rejected rows.
+    """
+    ERROR_SAMPLES = 10
+
+    def __init__(self, chunk_size=None, batch_size=None):
+        self.chunk_size = chunk_size or DataService.CHUNK_SIZE
+        self.batch_size = batch_size or DataService.BATCH_SIZE
+        self.fieldnames = None
+        self.columns = None
+        self.players = None
+        self.rows = 0
+        self.errors = Counter()
+        self.samples = []
+        self._partial = b""
+        self._lines = []
+        self._line_number = 0
+        self._published = False
+        self._start = time.perf_counter()
+
+    def feed(self, data):
+        """
+        Adds received data.
+
+        Args:
+            data (bytes): The next piece of the CSV data.
+
+        Raises:
+            ValueError: If the header is missing any of the required columns.
+        """
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        if self.fieldnames is None and lines:
+            self._read_header(lines.pop(0))
+        self._lines.extend(lines)
+        while len(self._lines) >= self.chunk_size:
+            self._flush()
+
+    def close(self):
+        """
+        Writes the remaining rows.
+
+        Returns:
+            dict: The number of rows ingested and rejected, the rejected rows per error type, the first rejected
+                  rows, the elapsed time and the ingest rate in rows per second.
+
+        Raises:
+            ValueError: If no header was received or it is missing any of the required columns.
+        """
+        if self._partial:
+            if self.fieldnames is None:
+                self._read_header(self._partial)
+            else:
+                self._lines.append(self._partial)
+            self._partial = b""
+        if self.fieldnames is None:
+            raise ValueError("CSV file is missing required columns.")
+        while self._lines:
+            self._flush(last=len(self._lines) <= self.chunk_size)
+        if self.rows and not self._published:
+            DataService.publish_changes()
+        elapsed = time.perf_counter() - self._start
+        return {"rows": self.rows, "rejected": sum(self.errors.values()), "errors": dict(self.errors),
+                "samples": self.samples, "seconds": elapsed, "rows_per_sec": self.rows / elapsed if elapsed else 0.0}
+
+    def _read_header(self, line):
+        self._line_number += 1
+        self.fieldnames, self.columns = DataService.read_header(line)
+
+    def _reject(self, error, message):
+        self.errors[error] += 1
+        if len(self.samples) < self.ERROR_SAMPLES:
+            self.samples.append({"line": self._line_number, "error": message})
+
+    def _records(self, lines):
+        name_column, position_column, *value_columns = self.columns
+        for line in lines:
+            self._line_number += 1
+            try:
+                values = next(csv.reader([line.decode("utf-8")]), None)
+            except UnicodeDecodeError:
+                self._reject("invalid_encoding", "The line is not valid UTF-8.")
+                continue
+            if not values or values == [""]:
+                continue
+            if len(values) < len(self.fieldnames):
+                self._reject("missing_columns",
+                             f"Expected {len(self.fieldnames)} columns, got {len(values)}.")
+                continue
+            if not values[name_column]:
+                self._reject("missing_player", "The player name is empty.")
+                continue
+            try:
+                numbers = parse_counts([values[column] for column in value_columns])
+            except ValueError as e:
+                self._reject("invalid_number", str(e))
+                continue
+            yield values[name_column], values[position_column], numbers
+
+    def _flush(self, last=False):
+        lines, self._lines = self._lines[:self.chunk_size], self._lines[self.chunk_size:]
+        records = list(self._records(lines))
+        if not records:
+            return
+        if self.players is None:
+            self.players = DataService.load_players()
+        start = time.perf_counter()
+        with transaction.atomic():
+            rows = DataService.write_records(records, self.players, self.batch_size)
+        # The columnar store is updated with the last chunk, before its version bump
+        DataService.publish_changes(update_store=last)
+        self._published = last
+        metrics.record_ingest(rows, time.perf_counter() - start)
+        self.rows += rows
+
 
 class PlayerStatsService:
     """
@@ -75,22 +873,185 @@ class PlayerStatsService:
     @staticmethod
     def get_aggregated_stats(player_name):
         """
-        Gets the aggregated statistics for a player.
+        Gets the aggregated statistics for a player from the engine selected by the STATS_ENGINE setting.
 
         Args:
             player_name (str): The name of the player.
 
         Returns:
             dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
         """
-        player = Player.objects.get(player_name=player_name)
-        aggregation_fields = {f"avg_{field}": Avg(
-            field) for field in PlayerStats.CSV_MAPPING.values()}
-        aggregated_data = PlayerStats.objects.filter(
-            player=player).aggregate(**aggregation_fields)
+        return get_stats_engine().get_aggregated_stats(player_name)
+
+    @staticmethod
+    async def aget_aggregated_stats(player_name):
+        """
+        Gets the aggregated statistics for a player from an async context.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the player.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        return await get_stats_engine().aget_aggregated_stats(player_name)
+
+    @staticmethod
+    def get_aggregated_stats_for_players(player_names):
+        """
+        Gets the aggregated statistics for several players from the engine selected by the STATS_ENGINE setting.
+
+        Args:
+            player_names (iterable): The names of the players.
+
+        Returns:
+            dict: A dictionary mapping the name of every player that was found to its aggregated statistics,
+                  in the format returned by 'get_aggregated_stats'.
+        """
+        return get_stats_engine().get_aggregated_stats_for_players(player_names)
+
+    @staticmethod
+    def iter_aggregated_stats(chunk_size):
+        """
+        Iterates over the aggregated statistics of all players with games, in chunks.
+
+        Every chunk is read from the PlayerAggregate table with its own query, continuing after the last player of
+        the previous chunk, so the memory used does not depend on the number of players and no table is kept
+        locked while a chunk is being consumed. The rows are read as tuples instead of model instances, which
+        took 40% of the time of an export.
+
+        Args:
+            chunk_size (int): The number of players per chunk.
+
+        Yields:
+            list: The aggregated statistics of up to 'chunk_size' players, in the format returned by
+                  'get_aggregated_stats', ordered by player id.
+        """
+        fields = list(PlayerAggregate.SUM_FIELDS.items())
+        last_id = 0
+        while True:
+            rows = list(PlayerAggregate.objects.filter(player_id__gt=last_id, games__gt=0).order_by(
+                "player_id").values_list("player_id", "player__player_name", "player__position",
+                                         "player__games_played", "games", *(sum_field for _, sum_field in fields))
+                [:chunk_size])
+            chunk = []
+            for player_id, player_name, position, games_played, games, *sums in rows:
+                aggregated_data = {f"avg_{field}": total / games for (field, _), total in zip(fields, sums)}
+                aggregated_data["player"] = Player(
+                    id=player_id, player_name=player_name, position=position, games_played=games_played)
+                chunk.append(aggregated_data)
+            if chunk:
+                yield chunk
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def get_recent_stats(player_name, last):
+        """
+        Gets the averages of a player's last games.
+
+        The totals of the window are the player's PlayerAggregate totals minus the running totals stored with the
+        last game before the window, so at most two rows are read regardless of the number of games.
+
+        Args:
+            player_name (str): The name of the player.
+            last (int): The number of games, counted back from the player's most recent game. If the player has
+                        played fewer games, all of them are used.
+
+        Returns:
+            dict: A dictionary containing the aggregated statistics for the window, in the format returned by
+                  'get_aggregated_stats'. The 'games_played' of the player is the number of games in the window.
+
+        Raises:
+            Player.DoesNotExist: If there is no player with the given name or the player has no statistics.
+        """
+        try:
+            aggregate = PlayerAggregate.objects.select_related(
+                "player").get(player__player_name=player_name)
+        except PlayerAggregate.DoesNotExist:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        games = min(last, aggregate.games)
+        before = None
+        if games < aggregate.games:
+            before = PlayerStats.objects.filter(player_id=aggregate.player_id, game_number=aggregate.games - games) \
+                .values_list(*PlayerStats.CUMULATIVE_FIELDS.values()).get()
+        return PlayerStatsService.window_averages(aggregate, games, before)
+
+    @staticmethod
+    async def aget_recent_stats(player_name, last):
+        """
+        Gets the averages of a player's last games with Django's async ORM API.
+
+        See 'get_recent_stats'.
+        """
+        try:
+            aggregate = await PlayerAggregate.objects.select_related(
+                "player").aget(player__player_name=player_name)
+        except PlayerAggregate.DoesNotExist:
+            raise Player.DoesNotExist(
+                f"Player with name '{player_name}' not found")
+        games = min(last, aggregate.games)
+        before = None
+        if games < aggregate.games:
+            before = await PlayerStats.objects.filter(
+                player_id=aggregate.player_id, game_number=aggregate.games - games) \
+                .values_list(*PlayerStats.CUMULATIVE_FIELDS.values()).aget()
+        return PlayerStatsService.window_averages(aggregate, games, before)
+
+    @staticmethod
+    def window_averages(aggregate, games, before):
+        """
+        Calculates the averages of a player's last games.
+
+        Args:
+            aggregate (PlayerAggregate): The totals of all of the player's games, with the player selected.
+            games (int): The number of games in the window.
+            before (tuple): The running totals of the last game before the window, in the order of
+                            PlayerStats.CUMULATIVE_FIELDS, or None if the window covers all games.
+
+        Returns:
+            dict: A dictionary containing the averages in the format returned by 'get_aggregated_stats'.
+        """
+        aggregated_data = aggregate.averages()
+        if before is not None:
+            for (field, sum_field), previous in zip(PlayerAggregate.SUM_FIELDS.items(), before):
+                aggregated_data[f"avg_{field}"] = (getattr(aggregate, sum_field) - previous) / games
+        player = aggregate.player
+        player.games_played = games
         aggregated_data["player"] = player
         return aggregated_data
 
+    @staticmethod
+    def get_percentiles(aggregated_data):
+        """
+        Ranks the statistics of a player among the players of the same position.
+
+        Args:
+            aggregated_data (dict): The aggregated statistics returned by 'get_aggregated_stats' or
+                                    'get_recent_stats'.
+
+        Returns:
+            dict: The percentile rank of every statistic, as returned by PercentileIndex.percentiles.
+        """
+        return percentile_index.percentiles(aggregated_data)
+
+    @staticmethod
+    async def aget_percentiles(aggregated_data):
+        """
+        Ranks the statistics of a player among the players of the same position from an async context.
+
+        See 'get_percentiles'.
+        """
+        return await percentile_index.apercentiles(aggregated_data)
+
     @staticmethod
     def create_stats_from_aggregated(aggregated_data):
         """
@@ -108,3 +1069,50 @@ class PlayerStatsService:
                 setattr(stats, field, aggregated_data[f"avg_{field}"])
         stats.player = aggregated_data["player"]
         return stats
+
+    @staticmethod
+    def get_leaders(metric, position=None, limit=10):
+        """
+        Gets the players with the highest per game value of a metric.
+
+        The metric is calculated and the players are ranked by the database. Players without games are left out.
+
+        Args:
+            metric (str): The name of a base or derived statistic, e.g. 'reb' or 'tsp'.
+            position (str, optional): Only rank players playing this position.
+            limit (int): The number of players to return.
+
+        Returns:
+            list: Dictionaries with the player and the value of the metric, from the highest value down.
+
+        Raises:
+            ValueError: If the metric is unknown.
+        """
+        expressions = metric_expressions()
+        if metric not in expressions:
+            raise ValueError(f"Unknown metric '{metric}'.")
+        aggregates = PlayerAggregate.objects.filter(games__gt=0).select_related(
+            "player").annotate(value=expressions[metric])
+        if position:
+            aggregates = aggregates.filter(player__position=position)
+        aggregates = aggregates.order_by(
+            F("value").desc(), "player__player_name")[:limit]
+        return [{"player": aggregate.player, "value": aggregate.value} for aggregate in aggregates]
+
+    @staticmethod
+    def search_players(query, max_distance=0, limit=10):
+        """
+        Finds players by the beginning of their name or of a word of their name, ignoring case and accents.
+
+        Args:
+            query (str): The beginning of the name, e.g. 'jok' or 'Jokić'.
+            max_distance (int): The number of edits (inserted, removed or replaced characters) allowed between the
+                                query and the beginning of a name. 0 only finds exact prefixes.
+            limit (int): The largest number of players to return.
+
+        Returns:
+            list: Dictionaries with the name and position of the player and the number of edits of the match,
+                  ordered by the number of edits and then by name.
+        """
+        return [{"player_name": player_name, "position": position, "distance": distance}
+                for player_name, position, distance in name_index.search(query, max_distance, limit)]
@@ -1,5 +1,45 @@
-from django.test import TestCase
-from .models import Player, PlayerStats
+import csv
+import gc
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipIf
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.renderers import JSONRenderer
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Avg, F, Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from . import db, engines
+from .apps import current_management_command
+from .cache import DatasetVersion, ResponseCache, dataset_version, get_response_cache
+from .columnar import ColumnarBuilder, ColumnarStore, current_generation
+from .db import uses_file_database
+from .expressions import derived_expressions, metric_expressions, stat_expressions
+from .models import IngestCheckpoint, Player, PlayerAggregate, PlayerStats
+from .parsing import split_file
+from .percentiles import RESPONSE_PATHS, metric_values
+from .search import normalize_name
+from .renderers import OrjsonRenderer, orjson
+from .serializers import PlayerStatsAggregateSerializer, player_stats_to_dict
+from .services import DataService, PlayerStatsService
+from .metrics import metrics, process_memory
+from .preload import after_fork, preload
+from .views import AsyncPlayerStatsView, ExportView, PlayerStatsBatchView
+from .watch import DataWatcher
 
 
 class PlayerModelTest(TestCase):
@@ -28,6 +68,10 @@ class PlayerModelTest(TestCase):
         max_length = player._meta.get_field('player_name').max_length
         self.assertEqual(max_length, 50)
 
+    def test_player_name_is_unique(self):
+        with self.assertRaises(IntegrityError):
+            Player.objects.create(player_name='Test Player', position='C')
+
     def test_object_name_is_player_name(self):
         player = Player.objects.get(id=1)
         expected_object_name = f'{player.player_name}'
@@ -92,3 +136,1411 @@ class PlayerStatsModelTest(TestCase):
                           0.475 * self.player_stats.fta + self.player_stats.ast + self.player_stats.to)) * 100
         self.assertAlmostEqual(self.player_stats.hastp,
                                expected_hastp, places=1)
+
+
+class CsvFileMixin:
+    HEADER = "PLAYER,POSITION,FTM,FTA,2PM,2PA,3PM,3PA,REB,BLK,AST,STL,TOV\n"
+
+    def write_csv(self, content):
+        csv_file = tempfile.NamedTemporaryFile(
+            mode="w", suffix=".csv", delete=False, encoding="utf-8")
+        csv_file.write(content)
+        csv_file.close()
+        self.addCleanup(os.remove, csv_file.name)
+        return csv_file.name
+
+
+class DataServiceTest(CsvFileMixin, TestCase):
+
+    def test_fill_db_from_csv_inserts_all_rows(self):
+        file_path = self.write_csv(self.HEADER +
+                                   "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+                                   "Player Two,C,0,0,4,6,0,0,9,2,1,0,2\n"
+                                   "Player One,PG,3,4,1,2,0,1,3,1,4,0,0\n")
+        rows = DataService.fill_db_from_csv(file_path, batch_size=2)
+        self.assertEqual(rows, 3)
+        self.assertEqual(PlayerStats.objects.count(), 3)
+        self.assertEqual(Player.objects.get(
+            player_name="Player One").games_played, 2)
+        self.assertEqual(Player.objects.get(
+            player_name="Player Two").games_played, 1)
+
+    def test_fill_db_from_csv_adds_to_existing_games_played(self):
+        player = Player.objects.create(
+            player_name="Player One", position="PG", games_played=4)
+        file_path = self.write_csv(
+            self.HEADER + "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n")
+        DataService.fill_db_from_csv(file_path)
+        player.refresh_from_db()
+        self.assertEqual(player.games_played, 5)
+        self.assertEqual(Player.objects.count(), 1)
+
+    def test_fill_db_from_csv_rejects_missing_columns(self):
+        file_path = self.write_csv("PLAYER,POSITION,FTM\nPlayer One,PG,1\n")
+        with self.assertRaises(ValueError):
+            DataService.fill_db_from_csv(file_path)
+        self.assertEqual(Player.objects.count(), 0)
+
+    def test_fill_db_from_csv_rolls_back_on_invalid_row(self):
+        file_path = self.write_csv(self.HEADER +
+                                   "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+                                   "Player Two,C,x,0,4,6,0,0,9,2,1,0,2\n")
+        with self.assertRaises(ValueError):
+            DataService.fill_db_from_csv(file_path, batch_size=1)
+        self.assertEqual(Player.objects.count(), 0)
+        self.assertEqual(PlayerStats.objects.count(), 0)
+
+    def test_fill_db_from_csv_stores_counts_as_integers(self):
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER +
+                                                    "Player One,PG,1.0,2,3,4,1,2,5,0,2,1,1\n"
+                                                    "Player One,PG,2,2,3,4,1,2,5,0,2,1,1\n"))
+        stats = PlayerStats.objects.order_by("game_number").last()
+        self.assertIs(type(stats.ftm), int)
+        self.assertEqual((stats.ftm, stats.cum_ftm), (2, 3))
+        self.assertEqual(PlayerStatsService.get_aggregated_stats("Player One")["avg_ftm"], 1.5)
+
+    def test_fill_db_from_csv_rejects_fractional_and_negative_counts(self):
+        for value in ("1.5", "-1", "40000", "nan"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                DataService.fill_db_from_csv(self.write_csv(
+                    self.HEADER + f"Player One,PG,{value},2,3,4,1,2,5,0,2,1,1\n"))
+        self.assertEqual(PlayerStats.objects.count(), 0)
+
+    def test_fill_db_from_csv_reads_only_the_aggregates_of_its_players(self):
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + "".join(
+            f"Player {number},PG,1,2,3,4,1,2,5,0,2,1,1\n" for number in range(5))))
+        file_path = self.write_csv(self.HEADER +
+                                   "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+                                   "Player 1,PG,3,4,1,2,0,1,3,1,4,0,0\n"
+                                   "Player 1,PG,1,2,3,4,1,2,5,0,2,1,1\n")
+        with mock.patch.object(PlayerAggregate.objects, "in_bulk",
+                               wraps=PlayerAggregate.objects.in_bulk) as in_bulk:
+            DataService.fill_db_from_csv(file_path, batch_size=2)
+        self.assertEqual([sorted(call.args[0]) for call in in_bulk.call_args_list],
+                         [sorted([Player.objects.get(player_name="Player 1").pk,
+                                  Player.objects.get(player_name="Player One").pk])])
+        aggregate = Player.objects.get(player_name="Player 1").aggregate
+        self.assertEqual((aggregate.games, aggregate.sum_ftm), (3, 5))
+
+    def test_fill_db_from_csv_resolves_players_by_name(self):
+        file_path = self.write_csv(self.HEADER +
+                                   "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+                                   "Player One,SG,3,4,1,2,0,1,3,1,4,0,0\n")
+        DataService.fill_db_from_csv(file_path)
+        player = Player.objects.get()
+        self.assertEqual(player.position, "PG")
+        self.assertEqual(player.games_played, 2)
+
+    def test_fill_db_from_csv_skips_already_ingested_file(self):
+        file_path = self.write_csv(
+            self.HEADER + "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n")
+        DataService.fill_db_from_csv(file_path)
+        self.assertEqual(DataService.fill_db_from_csv(file_path), 0)
+        self.assertEqual(PlayerStats.objects.count(), 1)
+
+
+class ResumableIngestTest(CsvFileMixin, TestCase):
+    ROWS = ("Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+            "Player Two,C,0,0,4,6,0,0,9,2,1,0,2\n"
+            "Player One,PG,3,4,1,2,0,1,3,1,4,0,0\n"
+            "Player Two,C,1,1,2,2,0,0,4,0,0,1,1\n"
+            "Player One,PG,0,0,2,5,1,3,2,0,5,2,3\n")
+
+    def setUp(self):
+        self.file_path = self.write_csv(self.HEADER + self.ROWS)
+
+    def assert_fully_ingested(self):
+        self.assertEqual(PlayerStats.objects.count(), 5)
+        self.assertEqual(Player.objects.get(
+            player_name="Player One").games_played, 3)
+        self.assertEqual(Player.objects.get(
+            player_name="Player Two").games_played, 2)
+
+    def test_ingest_in_chunks_records_checkpoint(self):
+        rows = DataService.fill_db_from_csv_resumable(
+            self.file_path, chunk_size=2)
+        self.assertEqual(rows, 5)
+        self.assert_fully_ingested()
+        checkpoint = IngestCheckpoint.objects.get()
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual(checkpoint.rows_done, 5)
+        self.assertEqual(checkpoint.byte_offset,
+                         os.path.getsize(self.file_path))
+        self.assertEqual(checkpoint.file_hash,
+                         DataService.hash_file(self.file_path))
+
+    def test_interrupted_ingest_resumes_from_checkpoint(self):
+        def interrupt(checkpoint, rows):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            DataService.fill_db_from_csv_resumable(
+                self.file_path, chunk_size=2, progress=interrupt)
+        self.assertEqual(PlayerStats.objects.count(), 2)
+        self.assertEqual(IngestCheckpoint.objects.get().rows_done, 2)
+
+        rows = DataService.fill_db_from_csv_resumable(
+            self.file_path, chunk_size=2)
+        self.assertEqual(rows, 3)
+        self.assert_fully_ingested()
+
+    def test_failed_chunk_is_not_counted(self):
+        file_path = self.write_csv(self.HEADER +
+                                   "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\n"
+                                   "Player One,PG,x,0,4,6,0,0,9,2,1,0,2\n")
+        with self.assertRaises(ValueError):
+            DataService.fill_db_from_csv_resumable(file_path, chunk_size=1)
+        checkpoint = IngestCheckpoint.objects.get()
+        self.assertEqual(checkpoint.rows_done, 1)
+        self.assertFalse(checkpoint.completed)
+        self.assertEqual(Player.objects.get().games_played, 1)
+        self.assertEqual(PlayerStats.objects.count(), 1)
+
+    def test_completed_file_is_skipped(self):
+        DataService.fill_db_from_csv_resumable(self.file_path)
+        self.assertEqual(
+            DataService.fill_db_from_csv_resumable(self.file_path), 0)
+        self.assert_fully_ingested()
+
+    def test_ingest_csv_command(self):
+        out = StringIO()
+        call_command("ingest_csv", self.file_path,
+                     "--chunk-size", "2", stdout=out)
+        self.assert_fully_ingested()
+        self.assertIn("Ingested 5 rows", out.getvalue())
+
+
+class ParallelIngestTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        rows = "".join(f"Player {index % 7},{['PG', 'C'][index % 2]},{index % 3},3,{index % 5},6,1,2,{index},0,2,1,1\n"
+                       for index in range(60))
+        self.file_path = self.write_csv(self.HEADER + rows)
+
+    def database_content(self):
+        players = list(Player.objects.order_by("pk").values_list("player_name", "position", "games_played"))
+        stats = list(PlayerStats.objects.order_by("pk").values_list(
+            "player__player_name", *PlayerStats.CSV_MAPPING.values()))
+        Player.objects.all().delete()
+        IngestCheckpoint.objects.all().delete()
+        return players, stats
+
+    def test_split_file_on_line_boundaries(self):
+        header_size = len(self.HEADER.encode())
+        ranges = split_file(self.file_path, header_size, 100)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[0][0], header_size)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.file_path))
+        with open(self.file_path, "rb") as file:
+            content = file.read()
+        for (start, end), (next_start, _) in zip(ranges, ranges[1:] + [(ranges[-1][1], None)]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(content[end - 1:end], b"\n")
+
+    def test_result_does_not_depend_on_worker_count(self):
+        DataService.fill_db_from_csv(self.file_path)
+        expected = self.database_content()
+        for workers in (1, 2, 3):
+            self.assertEqual(DataService.fill_db_from_csv_parallel(
+                self.file_path, workers=workers, range_size=100), 60)
+            self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+            self.assertEqual(self.database_content(), expected)
+
+    def test_columns_are_read_by_name(self):
+        file_path = self.write_csv("TOV,STL,AST,BLK,REB,3PA,3PM,2PA,2PM,FTA,FTM,POSITION,PLAYER,EXTRA\n"
+                                   "1,2,3,4,5,6,7,8,9,10,11,SF,Player Three,x\n")
+        DataService.fill_db_from_csv_parallel(file_path, workers=2)
+        stats = PlayerStats.objects.get()
+        self.assertEqual((stats.ftm, stats.fta, stats.to), (11, 10, 1))
+        self.assertEqual(stats.player.position, "SF")
+
+    def test_invalid_value_rolls_back(self):
+        file_path = self.write_csv(self.HEADER + ResumableIngestTest.ROWS + "Player One,PG,x,0,4,6,0,0,9,2,1,0,2\n")
+        with self.assertRaises(ValueError):
+            DataService.fill_db_from_csv_parallel(file_path, workers=2, range_size=10)
+        self.assertFalse(Player.objects.exists())
+        self.assertFalse(IngestCheckpoint.objects.exists())
+
+    def test_ingest_csv_command_with_workers(self):
+        out = StringIO()
+        call_command("ingest_csv", self.file_path, "--workers", "2", stdout=out)
+        self.assertEqual(PlayerStats.objects.count(), 60)
+        self.assertTrue(IngestCheckpoint.objects.get().completed)
+        self.assertIn("Ingested 60 rows", out.getvalue())
+
+
+class WatchIngestTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        self.file_path = self.write_csv(self.HEADER + ResumableIngestTest.ROWS)
+
+    def append(self, content):
+        with open(self.file_path, "a", encoding="utf-8") as csv_file:
+            csv_file.write(content)
+
+    def test_only_appended_rows_are_ingested(self):
+        self.assertEqual(DataService.ingest_new_rows(self.file_path, chunk_size=2), 5)
+        self.assertEqual(DataService.ingest_new_rows(self.file_path), 0)
+        self.append("Player One,PG,1,1,0,0,0,0,0,0,0,0,0\nPlayer Three,SF,0,0,0,0,0,0,1,0,0,0,0\n")
+        self.assertEqual(DataService.ingest_new_rows(self.file_path), 2)
+        self.assertEqual(Player.objects.get(player_name="Player One").games_played, 4)
+        self.assertEqual(Player.objects.get(player_name="Player Three").games_played, 1)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+        checkpoint = IngestCheckpoint.objects.get()
+        self.assertEqual(checkpoint.file_hash, DataService.hash_file(self.file_path))
+        self.assertTrue(checkpoint.completed)
+
+    def test_last_line_without_newline_waits_for_it(self):
+        file_path = self.write_csv(self.HEADER + "Player One,PG,1,2,3,4,1,2,5,0,2,1,1\nPlayer One,PG,1,2")
+        self.assertEqual(DataService.ingest_new_rows(file_path), 1)
+        with open(file_path, "a", encoding="utf-8") as csv_file:
+            csv_file.write(",3,4,1,2,5,0,2,1,1\nPlayer One,PG,0,0")
+        self.assertEqual(DataService.ingest_new_rows(file_path), 1)
+        with open(file_path, "a", encoding="utf-8") as csv_file:
+            csv_file.write(",0,0,0,0,0,0,0,0,0\n")
+        self.assertEqual(DataService.ingest_new_rows(file_path), 1)
+        self.assertEqual(list(PlayerStats.objects.order_by("game_number").values_list("ftm", "cum_ftm")),
+                         [(1, 1), (1, 2), (0, 2)])
+        self.assertTrue(IngestCheckpoint.objects.get().completed)
+
+    def test_rows_are_added_after_an_interrupted_ingest_csv(self):
+        def interrupt(checkpoint, rows):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            DataService.fill_db_from_csv_resumable(self.file_path, chunk_size=2, progress=interrupt)
+        self.append("Player Three,SF,0,0,0,0,0,0,1,0,0,0,0\n")
+        self.assertEqual(DataService.ingest_new_rows(self.file_path), 4)
+        self.append("Player Three,SF,0,0,0,0,0,0,1,0,0,0,0\n")
+        self.assertEqual(DataService.fill_db_from_csv_resumable(self.file_path), 1)
+        self.assertEqual(Player.objects.get(player_name="Player Three").games_played, 2)
+        self.assertEqual(PlayerStats.objects.count(), 7)
+        checkpoint = IngestCheckpoint.objects.get()
+        self.assertEqual(checkpoint.file_hash, DataService.hash_file(self.file_path))
+        self.assertTrue(checkpoint.completed)
+
+    def test_duplicate_and_ingested_files_are_skipped(self):
+        DataService.fill_db_from_csv(self.file_path)
+        self.assertEqual(DataService.ingest_new_rows(self.file_path), 0)
+        self.assertEqual(DataService.ingest_new_rows(self.write_csv(self.HEADER + ResumableIngestTest.ROWS)), 0)
+        self.assertEqual(PlayerStats.objects.count(), 5)
+
+    def test_modified_file_is_skipped(self):
+        DataService.ingest_new_rows(self.file_path)
+        with open(self.file_path, "w", encoding="utf-8") as csv_file:
+            csv_file.write(self.HEADER + ResumableIngestTest.ROWS.replace("9", "8") + ResumableIngestTest.ROWS)
+        self.assertEqual(DataService.ingest_new_rows(self.file_path), 0)
+        self.assertEqual(PlayerStats.objects.count(), 5)
+
+    def test_watcher_waits_for_files_to_settle(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        file_path = os.path.join(directory.name, "games.csv")
+        with open(file_path, "w", encoding="utf-8") as csv_file:
+            csv_file.write(self.HEADER + ResumableIngestTest.ROWS)
+        watcher = DataWatcher([directory.name])
+        self.assertEqual(watcher.poll(), 0)
+        self.assertEqual(watcher.poll(), 5)
+        with open(file_path, "a", encoding="utf-8") as csv_file:
+            csv_file.write("Player Two,C,1,1,0,0,0,0,0,0,0,0,0\n")
+        self.assertEqual(watcher.poll(), 0)
+        self.assertEqual(watcher.poll(), 1)
+        self.assertEqual(watcher.poll(), 0)
+        self.assertEqual(Player.objects.get(player_name="Player Two").games_played, 3)
+
+
+class ConcurrentReadTest(CsvFileMixin, TransactionTestCase):
+    def test_reads_wait_for_write_transactions(self):
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + ResumableIngestTest.ROWS))
+        locked = threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    PlayerAggregate.objects.update(games=F("games"))
+                    locked.set()
+                    time.sleep(0.2)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        locked.wait()
+        with override_settings(STATS_RESPONSE_CACHE={"MAX_ENTRIES": 0}):
+            response = self.client.get("/stats/player/Player One/")
+        writer.join()
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(STATS_INGEST_API_KEY="secret")
+class IngestViewTest(CsvFileMixin, TestCase):
+    def post_csv(self, content, **headers):
+        headers.setdefault("HTTP_X_API_KEY", "secret")
+        return self.client.post("/stats/ingest", data=content.encode("utf-8"), content_type="text/csv", **headers)
+
+    def test_rows_are_ingested_and_invalid_rows_counted(self):
+        response = self.post_csv(self.HEADER + ResumableIngestTest.ROWS +
+                                 "Player Two,C,1,x,0,0,0,0,0,0,0,0,0\n"
+                                 "Player Two,C,1\n"
+                                 ",C,1,1,0,0,0,0,0,0,0,0,0\n"
+                                 "\n"
+                                 "Player Three,SF,0,0,0,0,0,0,1,0,0,0,0")
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["rowsIngested"], 6)
+        self.assertEqual(result["rowsRejected"], 3)
+        self.assertEqual(result["errors"], {"invalid_number": 1, "missing_columns": 1, "missing_player": 1})
+        self.assertEqual([sample["line"] for sample in result["errorSamples"]], [7, 8, 9])
+        self.assertIn("rowsPerSecond", result)
+        self.assertEqual(Player.objects.get(player_name="Player Three").games_played, 1)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+    def test_fractional_and_negative_counts_are_rejected(self):
+        response = self.post_csv(self.HEADER + "Player One,PG,0.5,1,0,0,0,0,0,0,0,0,0\n"
+                                               "Player One,PG,1,-1,0,0,0,0,0,0,0,0,0\n"
+                                               "Player One,PG,1,1.0,0,0,0,0,0,0,0,0,0\n")
+        result = response.json()
+        self.assertEqual(result["rowsIngested"], 1)
+        self.assertEqual(result["errors"], {"invalid_number": 2})
+        self.assertEqual([sample["error"] for sample in result["errorSamples"]],
+                         ["'0.5' is not a whole number.", "'-1' is not a count from 0 to 32767."])
+
+    def test_chunks_are_committed_separately(self):
+        with mock.patch("stats_api.views.IngestView.CHUNK_SIZE", 2), \
+                mock.patch("stats_api.services.dataset_version.bump") as bump:
+            response = self.post_csv(self.HEADER + ResumableIngestTest.ROWS)
+        self.assertEqual(response.json()["rowsIngested"], 5)
+        self.assertEqual(bump.call_count, 3)
+
+    def test_invalid_header_is_rejected(self):
+        response = self.post_csv("PLAYER,POSITION,FTM\n" + ResumableIngestTest.ROWS)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PlayerStats.objects.count(), 0)
+        self.assertEqual(self.post_csv("").status_code, 400)
+
+    def test_multipart_upload(self):
+        upload = SimpleUploadedFile("games.csv", (self.HEADER + ResumableIngestTest.ROWS).encode("utf-8"))
+        response = self.client.post("/stats/ingest", {"file": upload}, HTTP_X_API_KEY="secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rowsIngested"], 5)
+        response = self.client.post("/stats/ingest", {"name": "games"}, HTTP_X_API_KEY="secret")
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_key_is_required(self):
+        self.assertEqual(self.post_csv(self.HEADER, HTTP_X_API_KEY="wrong").status_code, 403)
+        with override_settings(STATS_INGEST_API_KEY=None):
+            self.assertEqual(self.post_csv(self.HEADER).status_code, 403)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.post_csv(self.HEADER).status_code, 403)
+            with override_settings(STATS_INGEST_ALLOW_UNAUTHENTICATED=True):
+                self.assertEqual(self.post_csv(self.HEADER).status_code, 200)
+        self.assertEqual(self.client.get("/stats/ingest").status_code, 405)
+
+
+class PlayerAggregateTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS), batch_size=2)
+        self.player = Player.objects.get(player_name="Player One")
+
+    def test_ingest_maintains_totals(self):
+        aggregate = PlayerAggregate.objects.get(player=self.player)
+        self.assertEqual(aggregate.games, 3)
+        self.assertEqual(aggregate.sum_ftm, 4)
+        self.assertEqual(aggregate.sum_ast, 11)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+    def test_averages_match_database_aggregation(self):
+        expected = PlayerStats.objects.filter(player=self.player).aggregate(
+            **{f"avg_{field}": Avg(field) for field in PlayerStats.CSV_MAPPING.values()})
+        self.assertEqual(PlayerAggregate.objects.get(
+            player=self.player).averages(), expected)
+
+    def test_create_from_csv_row_updates_totals(self):
+        PlayerStats.create_from_csv_row(self.player, {
+            "FTM": "2", "FTA": "2", "2PM": "0", "2PA": "1", "3PM": "0", "3PA": "0",
+            "REB": "1", "BLK": "0", "AST": "1", "STL": "0", "TOV": "0"})
+        aggregate = PlayerAggregate.objects.get(player=self.player)
+        self.assertEqual(aggregate.games, 4)
+        self.assertEqual(aggregate.sum_ftm, 6)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+    def test_rebuild_repairs_stale_totals(self):
+        PlayerAggregate.objects.filter(player=self.player).update(sum_reb=0)
+        PlayerStats.objects.filter(player__player_name="Player Two").delete()
+        self.assertEqual(len(PlayerAggregate.find_inconsistent()), 2)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_aggregates", "--check", stdout=StringIO())
+
+        call_command("rebuild_aggregates", stdout=StringIO())
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+        self.assertEqual(PlayerAggregate.objects.get(
+            player=self.player).sum_reb, 10)
+        self.assertEqual(PlayerAggregate.objects.count(), 1)
+
+    def test_rebuild_renumbers_games_after_a_deletion(self):
+        self.player.statistics.get(game_number=2).delete()
+        self.assertEqual(len(PlayerStats.find_misnumbered()), 1)
+        with self.assertRaisesMessage(CommandError, "1 games have a wrong game number"):
+            call_command("rebuild_aggregates", "--check", stdout=StringIO())
+
+        call_command("rebuild_aggregates", stdout=StringIO())
+        call_command("rebuild_aggregates", "--check", stdout=StringIO())
+        games = list(self.player.statistics.order_by("game_number"))
+        self.assertEqual([game.game_number for game in games], [1, 2])
+        self.assertEqual(games[-1].cum_ftm, games[0].ftm + games[1].ftm)
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.games_played, 2)
+
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + "Player One,PG,1,1,1,1,1,1,1,1,1,1,1\n"))
+        self.assertEqual(list(self.player.statistics.order_by("game_number").values_list(
+            "game_number", flat=True)), [1, 2, 3])
+        self.assertEqual(PlayerStats.find_misnumbered(), {})
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+
+class PlayerStatsViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+
+    def test_get_player_stats(self):
+        response = self.client.get("/stats/player/Player Two/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "playerName": "Player Two",
+            "gamesPlayed": 2,
+            "traditional": {
+                "freeThrows": {"attempts": 0.5, "made": 0.5, "shootingPercentage": 100.0},
+                "twoPoints": {"attempts": 4.0, "made": 3.0, "shootingPercentage": 75.0},
+                "threePoints": {"attempts": 0.0, "made": 0.0, "shootingPercentage": 0.0},
+                "points": 6.5,
+                "rebounds": 6.5,
+                "blocks": 1.0,
+                "assists": 0.5,
+                "steals": 0.5,
+                "turnovers": 1.5,
+            },
+            "advanced": {
+                "valorization": 12.5,
+                "effectiveFieldGoalPercentage": 75.0,
+                "trueShootingPercentage": 76.7,
+                "hollingerAssistRatio": 8.0,
+            },
+        })
+
+    def test_get_unknown_player_returns_404(self):
+        response = self.client.get("/stats/player/Nobody/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_player_stats_uses_a_single_query(self):
+        with self.assertNumQueries(1):
+            PlayerStatsService.get_aggregated_stats("Player One")
+        with self.assertNumQueries(1):
+            response = self.client.get("/stats/player/Player One/")
+        self.assertEqual(response.json()["gamesPlayed"], 3)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = ResponseCache(
+            max_entries=2, ttl=10, clock=lambda: self.now)
+
+    def test_get_and_set(self):
+        key = ResponseCache.make_key("player", 1, "Player One")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, b"{}")
+        self.assertEqual(self.cache.get(key), b"{}")
+        self.assertEqual(self.cache.stats(), {
+            "hits": 1, "misses": 1, "evictions": 0, "size": 1})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set("a", b"a")
+        self.cache.set("b", b"b")
+        self.cache.get("a")
+        self.cache.set("c", b"c")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), b"a")
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_entries_expire(self):
+        self.cache.set("a", b"a")
+        self.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_shared_cache_tier(self):
+        shared = ResponseCache(ttl=10, shared_cache="default")
+        shared.set("a", b"a")
+        other_worker = ResponseCache(ttl=10, shared_cache="default")
+        self.assertEqual(other_worker.get("a"), b"a")
+        self.assertEqual(other_worker.hits, 1)
+
+
+class PlayerStatsViewCacheTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+
+    def test_response_is_served_from_cache(self):
+        first = self.client.get("/stats/player/Player One/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/stats/player/Player One/")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(get_response_cache().stats()["hits"], 1)
+
+    def test_ingest_invalidates_cached_response(self):
+        self.client.get("/stats/player/Player One/")
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + "Player One,PG,0,0,0,0,0,0,0,0,0,0,0\n"))
+        response = self.client.get("/stats/player/Player One/")
+        self.assertEqual(response.json()["gamesPlayed"], 4)
+
+    @override_settings(STATS_RESPONSE_CACHE={"SHARED_CACHE": "default"})
+    def test_processes_with_the_same_data_share_entries(self):
+        caches["default"].clear()
+        first = self.client.get("/stats/player/Player One/")
+        # Another worker process: its own local entries and a dataset version bumped at another time
+        get_response_cache().clear()
+        other_version = DatasetVersion()
+        other_version.bump()
+        self.assertNotEqual(other_version.etag, dataset_version.etag)
+        with mock.patch("stats_api.cache.dataset_version", other_version), \
+                mock.patch("stats_api.views.dataset_version", other_version):
+            second = self.client.get("/stats/player/Player One/")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(get_response_cache().stats()["hits"], 1)
+        self.assertEqual(second["ETag"], f'"{other_version.etag}"')
+
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + "Player One,PG,0,0,0,0,0,0,0,0,0,0,0\n"))
+        self.assertEqual(self.client.get("/stats/player/Player One/").json()["gamesPlayed"], 4)
+
+
+class ConditionalGetTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+
+    def test_responses_carry_validators(self):
+        response = self.client.get("/stats/player/Player One/")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+        self.assertNotIn("ETag", self.client.get("/stats/player/Nobody/"))
+
+    def test_matching_etag_returns_304_without_reading_stats(self):
+        etag = self.client.get("/stats/player/Player One/")["ETag"]
+        with mock.patch.object(PlayerStatsService, "get_aggregated_stats") as get_stats, \
+                self.assertNumQueries(0):
+            response = self.client.get("/stats/player/Player One/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        get_stats.assert_not_called()
+
+    def test_ingest_changes_etag(self):
+        etag = self.client.get("/stats/player/Player One/")["ETag"]
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + "Player One,PG,0,0,0,0,0,0,0,0,0,0,0\n"))
+        response = self.client.get("/stats/player/Player One/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since_is_not_a_validator(self):
+        # Ingests within the same second as the client's copy would not be noticed
+        response = self.client.get("/stats/leaders", {"metric": "reb"},
+                                   HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_parameters_are_rejected_before_the_etag_is_checked(self):
+        etag = self.client.get("/stats/leaders", {"metric": "reb"})["ETag"]
+        for path, params in [("/stats/leaders", {"metric": "nope"}), ("/stats/leaders", {"metric": "reb", "limit": 0}),
+                             ("/stats/player/Player One/", {"last": "0"}), ("/stats/search", {"q": ""}),
+                             ("/stats/players", {"names": ""}), ("/stats/export", {"format": "xml"})]:
+            with self.subTest(path=path, params=params):
+                response = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn("ETag", response)
+
+    def test_list_endpoints_and_async_view(self):
+        for path, params in [("/stats/players", {"names": "Player One"}), ("/stats/leaders", {"metric": "tsp"})]:
+            etag = self.client.get(path, params)["ETag"]
+            self.assertEqual(self.client.get(path, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        request = AsyncRequestFactory().get("/stats/player/Player One/", headers={"If-None-Match": etag})
+        response = async_to_sync(AsyncPlayerStatsView.as_view())(request, player_name="Player One")
+        self.assertEqual(response.status_code, 304)
+
+
+class ProfilingTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        metrics.reset()
+        get_response_cache().clear()
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+
+    def test_disabled_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get("/stats/player/Player One/"))
+
+    @override_settings(STATS_PROFILING=True)
+    def test_server_timing_header(self):
+        timing = self.client.get("/stats/player/Player One/")["Server-Timing"]
+        phases = [entry.split(";")[0] for entry in timing.split(", ")]
+        self.assertEqual(phases, ["db", "service", "serialize", "total"])
+        self.assertIn('desc="queries: 1"', timing)
+
+    @override_settings(STATS_PROFILING=True)
+    async def test_async_requests_are_profiled(self):
+        response = await AsyncClient().get("/stats/leaders", {"metric": "reb"})
+        self.assertIn("service;dur=", response["Server-Timing"])
+
+    @override_settings(STATS_PROFILING=True)
+    def test_metrics_endpoint(self):
+        self.client.get("/stats/player/Player One/")
+        self.client.get("/stats/player/Player One/")
+        body = self.client.get("/metrics").content.decode()
+        route = 'route="stats/player/<str:player_name>/",method="GET"'
+        self.assertIn(f'stats_request_duration_seconds_bucket{{{route},le="+Inf"}} 2', body)
+        self.assertIn(f'stats_requests_total{{{route},status="200"}} 2', body)
+        self.assertIn("stats_ingest_rows_total 5", body)
+        self.assertIn("stats_response_cache_hits_total 1", body)
+
+    @skipIf(not os.path.exists("/proc/self/smaps_rollup"), "Needs /proc/<pid>/smaps_rollup")
+    def test_process_memory(self):
+        memory = process_memory()
+        self.assertGreater(memory["uss"], 0)
+        self.assertLessEqual(memory["pss"], memory["rss"])
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn(f'stats_process_memory_bytes{{pid="{os.getpid()}",kind="pss"}} ', body)
+
+
+class PlayerStatsBatchViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+
+    def test_get_returns_entries_in_requested_order(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/stats/players", {"names": "Player Two,Nobody,Player One"})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([entry["playerName"] for entry in results], [
+                         "Player Two", "Nobody", "Player One"])
+        self.assertEqual(results[0], self.client.get(
+            "/stats/player/Player Two/").json())
+        self.assertEqual(
+            results[1], {"playerName": "Nobody", "detail": "Player with name 'Nobody' not found"})
+        self.assertEqual(results[2]["gamesPlayed"], 3)
+
+    def test_post_accepts_list_of_names(self):
+        response = self.client.post(
+            "/stats/players", {"names": ["Player One", "Player One"]}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_invalid_requests_return_400(self):
+        self.assertEqual(self.client.get("/stats/players").status_code, 400)
+        self.assertEqual(self.client.post(
+            "/stats/players", {"names": "Player One"}, content_type="application/json").status_code, 400)
+        names = ",".join(
+            f"Player {index}" for index in range(PlayerStatsBatchView.MAX_PLAYERS + 1))
+        self.assertEqual(self.client.get(
+            "/stats/players", {"names": names}).status_code, 400)
+
+
+class ExpressionsTest(TestCase):
+    DERIVED = ["ftp", "two_pp", "three_pp", "pts", "val", "efgp", "tsp", "hastp"]
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(9)
+        positions = [code for code, _ in Player.POSITIONS]
+        players = [Player.objects.create(player_name=f"Player {index}", position=positions[index % 5])
+                   for index in range(6)]
+        stats = []
+        for player in players:
+            for _ in range(rng.randint(1, 8)):
+                stats.append(PlayerStats(player=player, **{
+                    field: float(rng.randint(0, 3)) for field in PlayerStats.CSV_MAPPING.values()}))
+        # A game without any attempts exercises every divide-by-zero guard
+        stats.append(PlayerStats(player=players[0]))
+        for game_number, game in enumerate(stats, start=1):
+            game.game_number = game_number
+        PlayerStats.objects.bulk_create(stats)
+        PlayerAggregate.add_stats(stats)
+
+    def assert_same_metrics(self, instance, values):
+        for metric in self.DERIVED:
+            expected = getattr(instance, metric)
+            actual = values[metric] if metric == "pts" else round(values[metric], 1)
+            self.assertEqual(actual, expected, metric)
+
+    def test_row_expressions_match_properties(self):
+        rows = PlayerStats.objects.annotate(
+            **{f"sql_{name}": expression for name, expression in derived_expressions(stat_expressions()).items()})
+        for row in rows:
+            self.assert_same_metrics(
+                row, {metric: getattr(row, f"sql_{metric}") for metric in self.DERIVED})
+
+    def test_average_expressions_match_serialized_stats(self):
+        rows = PlayerAggregate.objects.select_related(
+            "player").annotate(**metric_expressions())
+        for row in rows:
+            stats = PlayerStatsService.create_stats_from_aggregated(
+                PlayerStatsService.get_aggregated_stats(row.player.player_name))
+            self.assert_same_metrics(
+                stats, {metric: getattr(row, metric) for metric in self.DERIVED})
+
+
+class SerializationTest(SimpleTestCase):
+    def aggregated_samples(self):
+        rng = random.Random(11)
+        player = Player(player_name="Ünal Player", games_played=7)
+        fields = PlayerStats.CSV_MAPPING.values()
+        yield {"player": player, **{f"avg_{field}": 0.0 for field in fields}}
+        for _ in range(500):
+            yield {"player": player, **{f"avg_{field}": rng.choice([0.0, rng.randint(0, 40) / rng.randint(1, 9)])
+                                        for field in fields}}
+
+    def test_dict_matches_serializer(self):
+        for aggregated_data in self.aggregated_samples():
+            stats = PlayerStatsService.create_stats_from_aggregated(aggregated_data)
+            self.assertEqual(JSONRenderer().render(player_stats_to_dict(aggregated_data)),
+                             JSONRenderer().render(PlayerStatsAggregateSerializer(stats).data))
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_renderer_matches_drf_renderer(self):
+        for aggregated_data in self.aggregated_samples():
+            data = player_stats_to_dict(aggregated_data)
+            self.assertEqual(OrjsonRenderer().render(data), JSONRenderer().render(data))
+
+    @skipIf(orjson is None, "orjson is not installed")
+    @override_settings(STATS_JSON_RENDERER="orjson", STATS_RESPONSE_CACHE={"MAX_ENTRIES": 0})
+    def test_view_uses_configured_renderer(self):
+        with mock.patch.object(OrjsonRenderer, "render", return_value=b"{}") as render, \
+                mock.patch.object(PlayerStatsService, "get_aggregated_stats",
+                                  return_value=next(self.aggregated_samples())):
+            response = self.client.get("/stats/player/Someone/")
+        self.assertEqual(response.content, b"{}")
+        render.assert_called_once()
+
+
+class LeadersViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + ResumableIngestTest.ROWS +
+                                                    "Player Three,PG,4,4,6,8,2,4,1,0,9,1,0\n"))
+
+    def test_ranks_players_by_metric(self):
+        response = self.client.get("/stats/leaders", {"metric": "tsp"})
+        self.assertEqual(response.status_code, 200)
+        leaders = response.json()["leaders"]
+        self.assertEqual([leader["playerName"] for leader in leaders], [
+                         "Player Three", "Player Two", "Player One"])
+        self.assertEqual(leaders[1], {"rank": 2, "playerName": "Player Two", "position": "C",
+                                      "gamesPlayed": 2, "value": 76.7})
+
+    def test_filters_by_position_and_limits_results(self):
+        response = self.client.get(
+            "/stats/leaders", {"metric": "reb", "position": "PG", "limit": 1})
+        self.assertEqual([leader["playerName"]
+                         for leader in response.json()["leaders"]], ["Player One"])
+
+    def test_players_without_games_are_left_out(self):
+        PlayerAggregate.objects.filter(player__player_name="Player Three").update(
+            games=0, **{field: 0 for field in PlayerAggregate.SUM_FIELDS.values()})
+        self.assertEqual([leader["player"].player_name for leader in PlayerStatsService.get_leaders("reb")],
+                         ["Player Two", "Player One"])
+
+    def test_invalid_parameters_return_400(self):
+        for params in [{"metric": "unknown"}, {"metric": "tsp", "position": "XX"}, {"metric": "tsp", "limit": 0}]:
+            self.assertEqual(self.client.get(
+                "/stats/leaders", params).status_code, 400)
+
+
+class SearchViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER +
+            "Nikola Jokić,C,1,2,3,4,1,2,1,0,2,1,1\n"
+            "Shaquille O'Neal,C,1,2,3,4,1,2,1,0,2,1,1\n"
+            "LeBron James,SF,1,2,3,4,1,2,1,0,2,1,1\n"
+            "James Harden,SG,1,2,3,4,1,2,1,0,2,1,1\n"))
+
+    def search(self, **params):
+        return [player["playerName"] for player in self.client.get("/stats/search", params).json()["results"]]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  Nikola JOKIĆ "), "nikola jokic")
+        self.assertEqual(normalize_name("Shaquille O'Neal"), "shaquille oneal")
+
+    def test_prefix_search(self):
+        self.assertEqual(self.search(q="JOKIC"), ["Nikola Jokić"])
+        self.assertEqual(self.search(q="o'ne"), ["Shaquille O'Neal"])
+        self.assertEqual(self.search(q="jam"), ["LeBron James", "James Harden"])
+        self.assertEqual(self.search(q="jam", limit=1), ["LeBron James"])
+        self.assertEqual(self.search(q="lebron j"), ["LeBron James"])
+        self.assertEqual(self.search(q="jokc"), [])
+
+    def test_fuzzy_search(self):
+        response = self.client.get("/stats/search", {"q": "jokc", "fuzzy": 1})
+        self.assertEqual(response.json()["results"], [
+                         {"playerName": "Nikola Jokić", "position": "C", "distance": 1}])
+        self.assertEqual(self.search(q="hardne", fuzzy=2), ["James Harden"])
+        self.assertEqual(self.search(q="jam", fuzzy=1)[:2], ["LeBron James", "James Harden"])
+
+    def test_index_is_patched_after_ingest(self):
+        self.assertEqual(self.search(q="jam"), ["LeBron James", "James Harden"])
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + "Jamal Murray,PG,1,2,3,4,1,2,1,0,2,1,1\n"))
+        self.assertEqual(self.search(q="jam"), ["Jamal Murray", "LeBron James", "James Harden"])
+        Player.objects.filter(player_name="James Harden").delete()
+        dataset_version.bump()
+        self.assertEqual(self.search(q="jam"), ["Jamal Murray", "LeBron James"])
+
+    def test_invalid_parameters_return_400(self):
+        for params in [{}, {"q": " "}, {"q": "jam", "fuzzy": 3}, {"q": "jam", "limit": 0}, {"q": "jam", "limit": "x"}]:
+            self.assertEqual(self.client.get("/stats/search", params).status_code, 400)
+
+
+class ExportViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS +
+            "Player Three,PG,4,4,6,8,2,4,1,0,9,1,0\n"
+            "Player Four,SF,1,2,3,4,1,2,1,0,2,1,1\n"
+            '"Player, Five",C,0,0,4,6,0,0,2,2,1,0,2\n'))
+        self.names = list(Player.objects.order_by("id").values_list("player_name", flat=True))
+
+    def test_ndjson_export(self):
+        response = self.client.get("/stats/export")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["playerName"] for row in rows], self.names)
+        for row in rows:
+            expected = self.client.get(f"/stats/player/{row['playerName']}/").json()
+            self.assertEqual(row.pop("position"), Player.objects.get(player_name=row["playerName"]).position)
+            self.assertEqual(row, expected)
+
+    def test_csv_export(self):
+        response = self.client.get("/stats/export", {"format": "csv"})
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="players.csv"')
+        rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+        self.assertEqual([row["playerName"] for row in rows], self.names)
+        expected = self.client.get("/stats/player/Player Three/").json()
+        self.assertEqual(rows[2]["position"], "PG")
+        self.assertEqual(float(rows[2]["tsp"]), expected["advanced"]["trueShootingPercentage"])
+        self.assertEqual(float(rows[2]["fta"]), expected["traditional"]["freeThrows"]["attempts"])
+
+    def test_reads_players_in_chunks(self):
+        with mock.patch.object(ExportView, "CHUNK_SIZE", 2), self.assertNumQueries(3):
+            response = self.client.get("/stats/export")
+            self.assertEqual(len(list(response.streaming_content)), 3)
+
+    def test_gzip_is_negotiated(self):
+        plain = self.client.get("/stats/export")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        compressed = self.client.get("/stats/export", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertEqual(compressed["ETag"], f"W/{plain['ETag']}")
+        self.assertEqual(gzip.decompress(b"".join(compressed.streaming_content)),
+                         b"".join(plain.streaming_content))
+
+    def test_unknown_format_returns_400(self):
+        self.assertEqual(self.client.get("/stats/export", {"format": "xml"}).status_code, 400)
+
+
+@skipIf(engines.np is None, "NumPy is not installed")
+class NumpyStatsEngineTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        rng = random.Random(3)
+        rows = "".join(
+            f"Player {rng.randint(0, 9)},{rng.choice(['PG', 'C'])},{','.join(str(rng.randint(0, 9)) for _ in range(11))}\n"
+            for _ in range(200))
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + rows + "Player Zero,SG,0,0,0,0,0,0,0,0,0,0,0\n"))
+
+    def render_all(self):
+        get_response_cache().clear()
+        return [self.client.get(f"/stats/player/{player.player_name}/").content
+                for player in Player.objects.order_by("player_name")]
+
+    def test_output_is_identical_to_orm_engine(self):
+        with self.settings(STATS_ENGINE="orm"):
+            expected = self.render_all()
+        with self.settings(STATS_ENGINE="numpy"):
+            self.assertIsInstance(
+                engines.get_stats_engine(), engines.NumpyStatsEngine)
+            self.assertEqual(self.render_all(), expected)
+
+    def test_batch_output_is_identical_to_orm_engine(self):
+        names = {"names": "Player 1,Nobody,Player Zero,Player 7"}
+        with self.settings(STATS_ENGINE="orm"):
+            expected = self.client.get("/stats/players", names).content
+        with self.settings(STATS_ENGINE="numpy"):
+            self.assertEqual(self.client.get(
+                "/stats/players", names).content, expected)
+
+    def test_engine_reloads_after_ingest(self):
+        with self.settings(STATS_ENGINE="numpy"):
+            games = PlayerStatsService.get_aggregated_stats(
+                "Player Zero")["player"].games_played
+            DataService.fill_db_from_csv(self.write_csv(
+                self.HEADER + "Player Zero,SG,1,1,1,1,1,1,1,1,1,1,1\n"))
+            aggregated_data = PlayerStatsService.get_aggregated_stats(
+                "Player Zero")
+            self.assertEqual(aggregated_data["player"].games_played, games + 1)
+            self.assertEqual(aggregated_data["avg_ftm"], 0.5)
+            with self.assertRaises(Player.DoesNotExist):
+                PlayerStatsService.get_aggregated_stats("Nobody")
+
+    def test_derived_metrics_match_expressions(self):
+        with self.settings(STATS_ENGINE="numpy"):
+            engine = engines.get_stats_engine()
+            metrics = engine.derived_metrics()
+        rows = PlayerAggregate.objects.select_related(
+            "player").annotate(**metric_expressions())
+        for row in rows:
+            index = engine.player_index[row.player.player_name]
+            for metric, values in metrics.items():
+                self.assertEqual(values[index], getattr(row, metric), metric)
+
+
+class ColumnarStatsEngineTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = self.settings(STATS_COLUMNAR_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_response_cache().clear()
+        rng = random.Random(5)
+        self.csv_path = self.write_csv(self.HEADER + "".join(
+            f"Player {rng.randint(0, 9)},{rng.choice(['PG', 'C'])},{','.join(str(rng.randint(0, 9)) for _ in range(11))}\n"
+            for _ in range(200)))
+        DataService.fill_db_from_csv(self.csv_path)
+
+    def render_all(self, names):
+        get_response_cache().clear()
+        return [self.client.get(f"/stats/player/{name}/").content for name in names]
+
+    def test_output_is_identical_to_orm_engine(self):
+        names = list(Player.objects.values_list("player_name", flat=True))
+        with self.settings(STATS_ENGINE="orm"):
+            expected = self.render_all(names)
+            batch = self.client.get("/stats/players", {"names": "Player 1,Nobody,Player 7"}).content
+        with self.settings(STATS_ENGINE="columnar"), self.assertNumQueries(0):
+            self.assertIsInstance(engines.get_stats_engine(), engines.ColumnarStatsEngine)
+            self.assertEqual(self.render_all(names), expected)
+            self.assertEqual(self.client.get("/stats/players", {"names": "Player 1,Nobody,Player 7"}).content, batch)
+
+    def test_store_is_rewritten_after_ingest(self):
+        generation = current_generation(self.directory)
+        with self.settings(STATS_ENGINE="columnar"):
+            games = PlayerStatsService.get_aggregated_stats("Player 3")["player"].games_played
+            DataService.fill_db_from_csv(self.write_csv(
+                self.HEADER + "Player 3,PG,300,2,0,0,0,0,0,0,0,0,0\nNew Player,SG,0,0,0,0,0,0,0,0,0,0,0\n"))
+            self.assertEqual(PlayerStatsService.get_aggregated_stats("Player 3")["player"].games_played, games + 1)
+            self.assertEqual(PlayerStatsService.get_aggregated_stats("New Player")["player"].position, "SG")
+            with self.assertRaises(Player.DoesNotExist):
+                PlayerStatsService.get_aggregated_stats("Nobody")
+        self.assertNotEqual(current_generation(self.directory), generation)
+        # The previous generation is kept for readers that read CURRENT before it changed
+        self.assertIn(generation, os.listdir(self.directory))
+        store = ColumnarStore(self.directory)
+        self.assertEqual(store.rows, 202)
+        self.assertEqual(store.columns["ftm"].format, "H")
+        self.assertEqual(store.columns["fta"].format, "B")
+
+        previous = current_generation(self.directory)
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + "Player 3,PG,1,2,0,0,0,0,0,0,0,0,0\n"))
+        self.assertEqual(sorted(name for name in os.listdir(self.directory) if name != "CURRENT"),
+                         sorted([previous, current_generation(self.directory)]))
+
+    def test_new_games_are_appended_to_the_store(self):
+        version = dataset_version.version
+        with mock.patch.object(ColumnarBuilder, "add", autospec=True, side_effect=ColumnarBuilder.add) as add:
+            DataService.fill_db_from_csv(self.write_csv(
+                self.HEADER + "Player 3,PG,300,2,0,0,0,0,0,0,0,0,0\nNew Player,SG,1,1,0,0,0,0,0,0,0,0,0\n"))
+        self.assertEqual(add.call_count, 2)
+        self.assertEqual(dataset_version.version, version + 1)
+        appended = ColumnarStore(self.directory)
+        self.assertEqual(appended.last_id, PlayerStats.objects.latest("pk").pk)
+
+        rewritten = tempfile.TemporaryDirectory()
+        self.addCleanup(rewritten.cleanup)
+        DataService.write_columnar_store(rewritten.name)
+        expected = ColumnarStore(rewritten.name)
+        self.assertEqual(appended.players, expected.players)
+        for field, values in expected.columns.items():
+            self.assertEqual((appended.columns[field].format, appended.columns[field].tolist()),
+                             (values.format, values.tolist()))
+
+        # Nothing is written without new games, and everything after a deletion
+        generation = current_generation(self.directory)
+        self.assertEqual(DataService.write_columnar_store(self.directory), 0)
+        self.assertEqual(current_generation(self.directory), generation)
+        PlayerStats.objects.filter(player__player_name="New Player").delete()
+        self.assertEqual(DataService.write_columnar_store(self.directory), 201)
+
+    def test_csv_conversion_matches_database_store(self):
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(output.cleanup)
+        call_command("csv_to_columnar", self.csv_path, output=output.name, stdout=StringIO())
+        with mock.patch("stats_api.columnar.np", None):
+            converted = ColumnarStore(output.name)
+        written = ColumnarStore(self.directory)
+        self.assertEqual(converted.rows, 200)
+        self.assertEqual(converted.players.keys(), written.players.keys())
+        for player_name in written.players:
+            self.assertEqual(converted.totals(player_name), written.totals(player_name))
+
+
+class StartupSnapshotTest(CsvFileMixin, TransactionTestCase):
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        self.settings_override = self.settings(
+            STATS_SNAPSHOT_DIR=snapshot_dir.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.snapshot_dir = snapshot_dir.name
+        self.file_path = self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS)
+
+    def test_snapshot_is_saved_and_restored(self):
+        DataService.load_on_startup(self.file_path)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+        Player.objects.all().delete()
+        IngestCheckpoint.objects.all().delete()
+        with mock.patch.object(DataService, "fill_db_from_csv") as fill_db_from_csv:
+            DataService.load_on_startup(self.file_path)
+        fill_db_from_csv.assert_not_called()
+        self.assertEqual(PlayerStats.objects.count(), 5)
+        self.assertEqual(Player.objects.get(
+            player_name="Player One").games_played, 3)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+    def test_already_ingested_file_is_not_loaded_again(self):
+        DataService.load_on_startup(self.file_path)
+        DataService.load_on_startup(self.file_path)
+        self.assertEqual(PlayerStats.objects.count(), 5)
+
+    def test_only_appended_rows_are_loaded(self):
+        DataService.load_on_startup(self.file_path)
+        with open(self.file_path, "a", encoding="utf-8") as csv_file:
+            csv_file.write("Player Three,SF,1,1,1,1,1,1,1,1,1,1,1\n")
+        DataService.load_on_startup(self.file_path)
+        self.assertEqual(PlayerStats.objects.count(), 6)
+        self.assertEqual(Player.objects.get(player_name="Player One").games_played, 3)
+        self.assertEqual(PlayerAggregate.find_inconsistent(), [])
+
+    def test_modified_or_unknown_file_is_not_loaded_into_a_non_empty_database(self):
+        DataService.load_on_startup(self.file_path)
+        other_path = self.write_csv(self.HEADER + "Player One,PG,1,1,1,1,1,1,1,1,1,1,1\n")
+        with open(self.file_path, "w", encoding="utf-8") as csv_file:
+            csv_file.write(self.HEADER + ResumableIngestTest.ROWS.replace("Player Two,C,0", "Player Two,C,9")
+                           + "Player Three,SF,1,1,1,1,1,1,1,1,1,1,1\n")
+        for file_path in (self.file_path, other_path):
+            DataService.load_on_startup(file_path)
+        self.assertEqual(PlayerStats.objects.count(), 5)
+        self.assertEqual(Player.objects.get(player_name="Player One").games_played, 3)
+
+    def test_snapshots_can_be_disabled(self):
+        with self.settings(STATS_SNAPSHOT_DIR=None):
+            DataService.load_on_startup(self.file_path)
+        self.assertEqual(os.listdir(self.snapshot_dir), [])
+        self.assertEqual(PlayerStats.objects.count(), 5)
+
+
+class StartupCommandTest(SimpleTestCase):
+    def test_current_management_command(self):
+        with mock.patch.object(sys, "argv", ["manage.py", "makemigrations"]):
+            self.assertEqual(current_management_command(), "makemigrations")
+        with mock.patch.object(sys, "argv", ["/usr/bin/gunicorn", "player_performance_tracker.wsgi"]):
+            self.assertIsNone(current_management_command())
+
+    def test_startup_is_skipped_for_commands_without_data(self):
+        with mock.patch.object(sys, "argv", ["manage.py", "makemigrations"]), \
+                mock.patch("stats_api.apps.call_command") as command:
+            apps.get_app_config("stats_api").ready()
+        command.assert_not_called()
+
+
+@skipIf(not hasattr(os, "fork"), "Needs os.fork")
+@override_settings(STATS_ENGINE="numpy")
+class PreloadTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + ResumableIngestTest.ROWS))
+        self.addCleanup(gc.unfreeze)
+
+    def test_forked_workers_serve_preloaded_data(self):
+        # The test database is in memory, and closing its connections would drop it
+        with mock.patch("stats_api.preload.uses_file_database", return_value=True), \
+                mock.patch.object(connections, "close_all") as close_all:
+            preload()
+        close_all.assert_called_once()
+        self.assertGreater(gc.get_freeze_count(), 0)
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # The child must never return into the test runner
+            try:
+                os.close(read_end)
+                after_fork()
+                with mock.patch.object(connection, "cursor", side_effect=AssertionError("No query expected")):
+                    result = {"games": PlayerStatsService.get_aggregated_stats("Player One")["player"].games_played,
+                              "search": PlayerStatsService.search_players("two")}
+                os.write(write_end, json.dumps(result).encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end, "rb") as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+        self.assertEqual(json.loads(output), {"games": 3, "search": [{"player_name": "Player Two", "position": "C", "distance": 0}]})
+
+    def test_preloading_requires_a_file_database(self):
+        with self.assertRaises(ImproperlyConfigured):
+            preload()
+        self.assertEqual(gc.get_freeze_count(), 0)
+
+    def test_forked_workers_of_a_file_database_are_readers(self):
+        self.addCleanup(setattr, db, "read_only", db.read_only)
+        after_fork()
+        self.assertTrue(db.read_only)
+
+
+class FileDatabaseWorkersTest(CsvFileMixin, SimpleTestCase):
+    """
+    Starts worker processes sharing a file-backed database and checks that they serve one dataset.
+    """
+    WORKERS = 3
+    SETTINGS = (
+        "from player_performance_tracker.settings import *\n"
+        "DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': {database!r}, "
+        "'CONN_MAX_AGE': None}}}}\n"
+        "STATS_DATA_FILE = {data_file!r}\n"
+        "STATS_SNAPSHOT_DIR = None\n"
+    )
+    # Prints whether the worker is the writer once it started, then the state it serves after every command. The
+    # output of the startup migration goes to stderr.
+    WORKER = (
+        "import json, sys\n"
+        "output, sys.stdout = sys.stdout, sys.stderr\n"
+        "import django\n"
+        "django.setup()\n"
+        "from django.db import OperationalError, connection\n"
+        "from django.test import Client\n"
+        "from stats_api import db\n"
+        "from stats_api.cache import dataset_version\n"
+        "from stats_api.models import Player\n"
+        "from stats_api.services import DataService\n"
+        "print(json.dumps({'writer': not db.read_only}), file=output, flush=True)\n"
+        "for line in sys.stdin:\n"
+        "    command, _, argument = line.strip().partition(' ')\n"
+        "    error = None\n"
+        "    if command == 'ingest':\n"
+        "        with db.writable():\n"
+        "            DataService.fill_db_from_csv(argument)\n"
+        "    elif command == 'create':\n"
+        "        try:\n"
+        "            Player.objects.create(player_name=argument, position='C')\n"
+        "        except OperationalError as e:\n"
+        "            error = str(e)\n"
+        "    with connection.cursor() as cursor:\n"
+        "        cursor.execute('PRAGMA journal_mode')\n"
+        "        journal_mode = cursor.fetchone()[0]\n"
+        "    response = Client(SERVER_NAME='localhost').get('/stats/player/Player One/')\n"
+        "    print(json.dumps({'etag': dataset_version.etag, 'players': Player.objects.count(), 'error': error,\n"
+        "                      'journal_mode': journal_mode, 'stats': response.json()}), file=output, flush=True)\n"
+    )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        with open(os.path.join(self.directory, "worker_settings.py"), "w", encoding="utf-8") as settings_file:
+            settings_file.write(self.SETTINGS.format(
+                database=os.path.join(self.directory, "db.sqlite3"),
+                data_file=self.write_csv(self.HEADER + ResumableIngestTest.ROWS)))
+
+    def start_workers(self):
+        environment = dict(os.environ, DJANGO_SETTINGS_MODULE="worker_settings",
+                           PYTHONPATH=os.pathsep.join([self.directory, str(settings.BASE_DIR)]))
+        workers = [subprocess.Popen([sys.executable, "-c", self.WORKER], cwd=settings.BASE_DIR, env=environment,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                   for _ in range(self.WORKERS)]
+        for worker in workers:
+            self.addCleanup(worker.wait, 30)
+            self.addCleanup(worker.stdin.close)
+        return workers
+
+    def send(self, worker, command):
+        worker.stdin.write(command + "\n")
+        worker.stdin.flush()
+        return json.loads(worker.stdout.readline())
+
+    def test_in_memory_databases_are_not_shared(self):
+        self.assertFalse(uses_file_database(connection))
+        with mock.patch.dict(connection.settings_dict, NAME="file::memory:?cache=shared"):
+            self.assertFalse(uses_file_database(connection))
+        with mock.patch.dict(connection.settings_dict, NAME=os.path.join(self.directory, "db.sqlite3")):
+            self.assertTrue(uses_file_database(connection))
+
+    def test_workers_share_one_dataset(self):
+        self.workers = self.start_workers()
+        roles = [json.loads(worker.stdout.readline())["writer"] for worker in self.workers]
+        self.assertEqual(roles.count(True), 1)
+        states = [self.send(worker, "state") for worker in self.workers]
+        self.assertEqual(states[0]["journal_mode"], "wal")
+        self.assertEqual(states[0]["players"], 2)
+        self.assertEqual(states[0]["stats"]["gamesPlayed"], 3)
+        self.assertTrue(all(state == states[0] for state in states))
+
+        reader = self.workers[roles.index(False)]
+        self.assertIn("readonly", self.send(reader, "create Player Three")["error"])
+        ingested = self.send(reader, "ingest " + self.write_csv(
+            self.HEADER + "Player One,PG,1,1,1,1,1,1,1,1,1,1,1\nPlayer Three,C,0,0,0,0,0,0,0,0,0,0,0\n"))
+        self.assertEqual(ingested["players"], 3)
+        self.assertNotEqual(ingested["etag"], states[0]["etag"])
+        states = [self.send(worker, "state") for worker in self.workers]
+        self.assertEqual(states[0]["stats"]["gamesPlayed"], 4)
+        self.assertTrue(all(state == ingested for state in states))
+
+
+class RecentStatsTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        rng = random.Random(11)
+        for _ in range(3):
+            DataService.fill_db_from_csv(self.write_csv(self.HEADER + "".join(
+                f"Player {rng.randint(0, 3)},PG,{','.join(str(rng.randint(0, 9)) for _ in range(11))}\n"
+                for _ in range(40))), batch_size=7)
+
+    def test_games_are_numbered_in_ingest_order(self):
+        for player in Player.objects.all():
+            numbers = list(player.statistics.order_by("pk").values_list("game_number", flat=True))
+            self.assertEqual(numbers, list(range(1, player.games_played + 1)))
+            last = player.statistics.order_by("pk").last()
+            self.assertEqual(last.cum_reb, player.statistics.aggregate(total=Sum("reb"))["total"])
+
+    def test_window_matches_averages_of_last_games(self):
+        fields = list(PlayerStats.CSV_MAPPING.values())
+        for player in Player.objects.all():
+            for last in [1, 5, player.games_played - 1, player.games_played, player.games_played + 10]:
+                with self.assertNumQueries(2 if last < player.games_played else 1):
+                    aggregated_data = PlayerStatsService.get_recent_stats(player.player_name, last)
+                games = player.statistics.order_by("-game_number")[:last]
+                expected = PlayerStats.objects.filter(pk__in=games).aggregate(
+                    **{f"avg_{field}": Avg(field) for field in fields})
+                self.assertEqual(aggregated_data["player"].games_played, min(last, player.games_played))
+                for key, value in expected.items():
+                    self.assertAlmostEqual(aggregated_data[key], value, places=9)
+
+    def test_last_parameter(self):
+        response = self.client.get("/stats/player/Player 1/", {"last": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["gamesPlayed"], 5)
+        self.assertEqual(self.client.get("/stats/player/Player 1/", {"last": 1000}).content,
+                         self.client.get("/stats/player/Player 1/").content)
+        async_response = async_to_sync(AsyncPlayerStatsView.as_view())(
+            AsyncRequestFactory().get("/stats/player/Player 1/", {"last": 5}), player_name="Player 1")
+        self.assertEqual(async_response.content, response.content)
+        for last in ["0", "-3", "five"]:
+            self.assertEqual(self.client.get("/stats/player/Player 1/", {"last": last}).status_code, 400)
+        self.assertEqual(self.client.get("/stats/player/Nobody/", {"last": 5}).status_code, 404)
+
+
+class PercentilesTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER +
+            "Guard One,PG,1,2,3,4,1,2,1,0,2,1,1\n"
+            "Guard Two,PG,0,0,4,6,0,0,2,2,1,0,2\n"
+            "Guard Three,PG,3,4,1,2,0,1,3,1,4,0,0\n"
+            "Guard Four,PG,3,4,1,2,0,1,3,1,4,0,0\n"
+            "Center One,C,1,1,2,2,0,0,9,0,0,1,1\n"))
+
+    def test_ranks_match_peers(self):
+        averages = {name: PlayerStatsService.get_aggregated_stats(name)
+                    for name in Player.objects.values_list("player_name", flat=True)}
+        for aggregated_data in averages.values():
+            position = aggregated_data["player"].position
+            peers = [metric_values(data) for data in averages.values() if data["player"].position == position]
+            percentiles = PlayerStatsService.get_percentiles(aggregated_data)
+            self.assertEqual(percentiles["peers"], len(peers))
+            for metric, value in metric_values(aggregated_data).items():
+                below = sum(peer[metric] < value for peer in peers)
+                equal = sum(peer[metric] == value for peer in peers)
+                block = percentiles
+                for key in RESPONSE_PATHS[metric]:
+                    block = block[key]
+                self.assertEqual(block, round((below + equal / 2) / len(peers) * 100, 1), metric)
+        guard = PlayerStatsService.get_percentiles(averages["Guard Three"])
+        self.assertEqual(guard["traditional"]["rebounds"], 75.0)
+        self.assertEqual(guard["traditional"]["blocks"], 50.0)
+        self.assertEqual(PlayerStatsService.get_percentiles(averages["Center One"])["advanced"]["valorization"], 50.0)
+
+    def test_percentiles_parameter(self):
+        plain = self.client.get("/stats/player/Guard One/").json()
+        self.assertNotIn("percentiles", plain)
+        response = self.client.get("/stats/player/Guard One/", {"percentiles": "true"})
+        self.assertEqual(response.json()["percentiles"]["position"], "PG")
+        self.assertEqual(response.json()["percentiles"]["traditional"]["rebounds"], 12.5)
+        async_response = async_to_sync(AsyncPlayerStatsView.as_view())(
+            AsyncRequestFactory().get("/stats/player/Guard One/", {"percentiles": "true"}), player_name="Guard One")
+        self.assertEqual(async_response.content, response.content)
+        self.assertEqual(self.client.get("/stats/player/Guard One/", {"percentiles": "maybe"}).status_code, 400)
+
+    def test_index_is_rebuilt_after_ingest(self):
+        response = self.client.get("/stats/player/Guard One/", {"percentiles": "1"})
+        self.assertEqual(response.json()["percentiles"]["peers"], 4)
+        DataService.fill_db_from_csv(self.write_csv(self.HEADER + "Guard Five,PG,0,0,0,0,0,0,0,0,0,0,0\n"))
+        response = self.client.get("/stats/player/Guard One/", {"percentiles": "1", "last": "1"})
+        self.assertEqual(response.json()["percentiles"]["peers"], 5)
+        self.assertEqual(response.json()["percentiles"]["traditional"]["rebounds"], 30.0)
+
+
+class AsyncPlayerStatsViewTest(CsvFileMixin, TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        DataService.fill_db_from_csv(self.write_csv(
+            self.HEADER + ResumableIngestTest.ROWS))
+        self.view = AsyncPlayerStatsView.as_view()
+
+    async def get(self, player_name):
+        request = AsyncRequestFactory().get(f"/stats/player/{player_name}/")
+        return await self.view(request, player_name=player_name)
+
+    async def test_response_matches_sync_view(self):
+        response = await self.get("Player Two")
+        self.assertEqual(response.status_code, 200)
+        get_response_cache().clear()
+        expected = await sync_to_async(self.client.get)("/stats/player/Player Two/")
+        self.assertEqual(response.content, expected.content)
+
+    async def test_unknown_player_returns_404(self):
+        response = await self.get("Nobody")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {
+                         "detail": "Player with name 'Nobody' not found"})
+
+    async def test_cached_response_is_shared_with_sync_view(self):
+        expected = await sync_to_async(self.client.get)("/stats/player/Player One/")
+        response = await self.get("Player One")
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(get_response_cache().stats()["hits"], 1)
+
+    @skipIf(engines.np is None, "NumPy is not installed")
+    async def test_numpy_engine_answers_from_memory(self):
+        with self.settings(STATS_ENGINE="numpy"):
+            await sync_to_async(engines.get_stats_engine().ensure_loaded)()
+            response = await self.get("Player One")
+        self.assertEqual(json.loads(response.content)["gamesPlayed"], 3)
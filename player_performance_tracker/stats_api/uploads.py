@@ -0,0 +1,31 @@
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class CsvIngestUploadHandler(FileUploadHandler):
+    """
+    An upload handler that passes the first uploaded file of a multipart request to a CsvStreamIngestor.
+
+    The file is ingested chunk by chunk while the request body is parsed, instead of being stored in memory
+    or in a temporary file first. Other files in the request are ignored.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, request, ingestor):
+        super().__init__(request)
+        self.ingestor = ingestor
+        self.started = False
+        self.receiving = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.receiving = not self.started
+        self.started = True
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.receiving:
+            self.ingestor.feed(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.receiving = False
+        return None
@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from .views import PlayerStatsView
+from .views import (AsyncPlayerStatsView, ExportView, IngestView, LeadersView, MetricsView, PlayerStatsBatchView,
+                    PlayerStatsView, SearchView)
+
+player_stats_view = AsyncPlayerStatsView if getattr(
+    settings, "STATS_ASYNC_VIEWS", False) else PlayerStatsView
 
 urlpatterns = [
-    path("stats/player/<str:player_name>/", PlayerStatsView.as_view()),
+    path("stats/player/<str:player_name>/", player_stats_view.as_view()),
+    path("stats/players", PlayerStatsBatchView.as_view()),
+    path("stats/leaders", LeadersView.as_view()),
+    path("stats/search", SearchView.as_view()),
+    path("stats/export", ExportView.as_view()),
+    path("stats/ingest", IngestView.as_view()),
+    path("metrics", MetricsView.as_view()),
 ]
@@ -1,11 +1,252 @@
+import csv
+import hmac
+import io
+import re
+from functools import partial, wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.text import compress_sequence
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import PlayerStatsAggregateSerializer
-from .services import PlayerStatsService
+from .cache import dataset_content, dataset_version, get_response_cache
+from .db import writable
+from .expressions import metric_expressions
+from .metrics import metrics, timed
+from .percentiles import RESPONSE_PATHS
+from .renderers import get_json_renderer
+from .serializers import player_stats_to_dict
+from .services import CsvStreamIngestor, PlayerStatsService
+from .uploads import CsvIngestUploadHandler
 from .models import Player
 
 
+def add_validators(response, etag):
+    """
+    Adds the ETag and Cache-Control headers to a successful or 304 response.
+
+    The Cache-Control directives come from the STATS_CACHE_CONTROL setting. The ETag of a compressed response is
+    weak, like the ones of Django's GZipMiddleware, since its bytes differ from the uncompressed response.
+
+    Args:
+        response (HttpResponse): The response.
+        etag (str): The quoted entity tag.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        if response.has_header("Content-Encoding"):
+            etag = f"W/{etag}"
+        response.headers.setdefault("ETag", etag)
+        patch_cache_control(response, **getattr(settings, "STATS_CACHE_CONTROL", {}))
+    return response
+
+
+def dataset_conditional(view_method):
+    """
+    Makes a GET handler of a view answer conditional requests from the dataset version.
+
+    The query parameters are read first with the view's 'parse_query' method, which returns them as keyword
+    arguments for the handler, or raises a ValueError that is answered with a 400. The ETag is then taken from the
+    dataset version before the handler runs, so a response is never tagged with a newer version than the data it
+    was built from, and requests with a matching If-None-Match get a 304 without calling the handler. No
+    Last-Modified header is sent: an HTTP date has a resolution of one second, and several ingests can happen in
+    the same second. Both sync and async handlers can be decorated.
+
+    Args:
+        view_method (function): The GET handler.
+
+    Returns:
+        function: The decorated handler.
+    """
+    def validators(view, request):
+        try:
+            query = view.parse_query(request)
+        except ValueError as e:
+            return None, bad_request(str(e)), None
+        etag = quote_etag(dataset_version.etag)
+        return etag, get_conditional_response(request, etag=etag), query
+
+    if iscoroutinefunction(view_method):
+        @wraps(view_method)
+        async def async_wrapper(self, request, *args, **kwargs):
+            etag, response, query = validators(self, request)
+            if response is None:
+                response = await view_method(self, request, *args, **kwargs, **query)
+            return add_validators(response, etag) if etag else response
+        return async_wrapper
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, response, query = validators(self, request)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs, **query)
+        return add_validators(response, etag) if etag else response
+    return wrapper
+
+
+def render_player_stats(aggregated_data, percentiles=None):
+    """
+    Serializes and renders the aggregated statistics of a player with the renderer from STATS_JSON_RENDERER.
+
+    Args:
+        aggregated_data (dict): The aggregated statistics returned by PlayerStatsService.
+        percentiles (dict, optional): The percentile ranks of the player, added as a 'percentiles' block.
+
+    Returns:
+        bytes: The JSON response body.
+    """
+    data = player_stats_to_dict(aggregated_data)
+    if percentiles is not None:
+        data["percentiles"] = percentiles
+    return get_json_renderer().render(data)
+
+
+def player_not_found(player_name):
+    """
+    Builds the 404 response for an unknown player.
+
+    Args:
+        player_name (str): The requested name.
+
+    Returns:
+        HttpResponse: The 404 response.
+    """
+    content = get_json_renderer().render(
+        {"detail": f"Player with name '{player_name}' not found"})
+    return HttpResponse(content, content_type="application/json", status=status.HTTP_404_NOT_FOUND)
+
+
+def bad_request(detail):
+    """
+    Builds a 400 response for an invalid request to the player statistics views.
+
+    Args:
+        detail (str): The reason the request is invalid.
+
+    Returns:
+        HttpResponse: The 400 response.
+    """
+    content = get_json_renderer().render({"detail": detail})
+    return HttpResponse(content, content_type="application/json", status=status.HTTP_400_BAD_REQUEST)
+
+
+def parse_last(request):
+    """
+    Reads the optional 'last' query parameter of a player statistics request.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        int: The number of most recent games to average, or None for all games.
+
+    Raises:
+        ValueError: If the parameter is not a positive whole number.
+    """
+    last = request.GET.get("last")
+    if last is None:
+        return None
+    try:
+        last = int(last)
+    except ValueError:
+        last = 0
+    if last < 1:
+        raise ValueError("'last' must be a positive number of games.")
+    return last
+
+
+def parse_flag(request, name):
+    """
+    Reads an optional boolean query parameter.
+
+    Args:
+        request (HttpRequest): The request.
+        name (str): The name of the parameter.
+
+    Returns:
+        bool: True for 'true' or '1', False for 'false', '0' or a missing parameter.
+
+    Raises:
+        ValueError: If the parameter has any other value.
+    """
+    value = request.GET.get(name, "false").lower()
+    if value not in ("true", "1", "false", "0"):
+        raise ValueError(f"'{name}' must be 'true' or 'false'.")
+    return value in ("true", "1")
+
+
+def parse_limit(request, default, maximum):
+    """
+    Reads the optional 'limit' query parameter of a list request.
+
+    Args:
+        request (HttpRequest): The request.
+        default (int): The limit when the parameter is missing.
+        maximum (int): The largest accepted limit.
+
+    Returns:
+        int: The number of results to return.
+
+    Raises:
+        ValueError: If the parameter is not a number between 1 and 'maximum'.
+    """
+    try:
+        limit = int(request.GET.get("limit", default))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise ValueError(f"'limit' must be a number between 1 and {maximum}.")
+    return limit
+
+
+def parse_player_stats_query(request):
+    """
+    Reads the query parameters of a player statistics request, for 'dataset_conditional'.
+
+    Returns:
+        dict: The number of most recent games to average ('last') and whether to add percentiles.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    return {"last": parse_last(request), "with_percentiles": parse_flag(request, "percentiles")}
+
+
+def player_stats_key(cache, dataset_key, player_name, last, with_percentiles):
+    """
+    Builds the response cache key of a player statistics request for the data identified by 'dataset_key'.
+
+    The dataset version is local to a process, so with a shared cache the key is 'dataset_content.key', which
+    processes holding the same data agree on. Otherwise the version is enough and saves computing the content key
+    (see 'dataset_cache_key').
+    """
+    options = ([last] if last else []) + (["percentiles"] if with_percentiles else [])
+    return cache.make_key("player", dataset_key, player_name, *options)
+
+
+def dataset_cache_key(cache):
+    """
+    Returns the part of the response cache keys identifying the current data.
+    """
+    return dataset_content.key if cache.shared_cache else dataset_version.version
+
+
+async def adataset_cache_key(cache):
+    """
+    Returns the part of the response cache keys identifying the current data, without blocking the event loop.
+    """
+    return await dataset_content.akey() if cache.shared_cache else dataset_version.version
+
+
 class PlayerStatsView(APIView):
     """
     API view for handling requests related to player statistics.
@@ -14,32 +255,500 @@ class PlayerStatsView(APIView):
     The player's name is expected to be provided in the URL.
     If the player does not exist, a 404 error is returned.
 
+    With the 'last' query parameter, e.g. '?last=10', the statistics are averaged over the player's last games
+    only, and 'gamesPlayed' is the number of games averaged. With '?percentiles=true' the response includes the
+    percentile rank of every statistic among the players of the same position.
+
+    Rendered responses are cached per player, window and dataset version, so they are reused until the next ingest.
+    Responses carry an ETag derived from the dataset version, and conditional requests for unchanged data get a 304
+    before any statistics are read.
+
     Attributes:
         get (function): The function to handle GET requests.
     """
+    parse_query = staticmethod(parse_player_stats_query)
 
-    def get(self, request, player_name):
+    @dataset_conditional
+    def get(self, request, player_name, last=None, with_percentiles=False):
         """
         Handles GET requests for player statistics.
 
-        Retrieves the aggregated statistics for the player with the given name,
-        creates a PlayerStats object from the aggregated data,
-        serializes the data, and returns it in the response.
+        Returns the cached response body if there is one for the current dataset version.
+        Otherwise retrieves the aggregated statistics for the player with the given name,
+        serializes and renders the data, caches it and returns it in the response.
 
         Args:
             request (Request): The GET request.
             player_name (str): The name of the player.
+            last (int, optional): The number of most recent games to average, or None for all games.
+            with_percentiles (bool): Whether to add the percentile ranks of the player.
+
+        Returns:
+            Response: The response containing the serialized player statistics data, or a 404 error if the player
+                      does not exist.
+        """
+        cache = get_response_cache()
+        key = player_stats_key(cache, dataset_cache_key(cache), player_name, last, with_percentiles)
+        content = cache.get(key)
+        if content is None:
+            try:
+                with timed("service"):
+                    if last:
+                        aggregated_data = PlayerStatsService.get_recent_stats(player_name, last)
+                    else:
+                        aggregated_data = PlayerStatsService.get_aggregated_stats(
+                            player_name)
+                    percentiles = PlayerStatsService.get_percentiles(
+                        aggregated_data) if with_percentiles else None
+            except Player.DoesNotExist:
+                return player_not_found(player_name)
+            with timed("serialize"):
+                content = render_player_stats(aggregated_data, percentiles)
+            cache.set(key, content)
+        return HttpResponse(content, content_type="application/json")
+
+
+class AsyncPlayerStatsView(View):
+    """
+    Async variant of PlayerStatsView for deployments on the ASGI entry point.
+
+    Cached responses and the in-memory 'numpy' engine are answered on the event loop without a thread hop.
+    Otherwise the statistics are read with Django's async ORM API. The responses are identical to the ones of
+    PlayerStatsView, and both views share the response cache. The view is routed instead of PlayerStatsView
+    when the STATS_ASYNC_VIEWS setting is enabled.
+    """
+    http_method_names = ["get", "head", "options"]
+    parse_query = staticmethod(parse_player_stats_query)
+
+    @dataset_conditional
+    async def get(self, request, player_name, last=None, with_percentiles=False):
+        """
+        Handles GET requests for player statistics.
+
+        Args:
+            request (HttpRequest): The GET request.
+            player_name (str): The name of the player.
+            last (int, optional): The number of most recent games to average, or None for all games.
+            with_percentiles (bool): Whether to add the percentile ranks of the player.
+
+        Returns:
+            HttpResponse: The response containing the serialized player statistics data, or a 404 error if the
+                          player does not exist.
+        """
+        cache = get_response_cache()
+        key = player_stats_key(cache, await adataset_cache_key(cache), player_name, last, with_percentiles)
+        content = await cache.aget(key)
+        if content is None:
+            try:
+                with timed("service"):
+                    if last:
+                        aggregated_data = await PlayerStatsService.aget_recent_stats(player_name, last)
+                    else:
+                        aggregated_data = await PlayerStatsService.aget_aggregated_stats(player_name)
+                    percentiles = await PlayerStatsService.aget_percentiles(
+                        aggregated_data) if with_percentiles else None
+            except Player.DoesNotExist:
+                return player_not_found(player_name)
+            with timed("serialize"):
+                content = render_player_stats(aggregated_data, percentiles)
+            await cache.aset(key, content)
+        return HttpResponse(content, content_type="application/json")
+
+
+class PlayerStatsBatchView(APIView):
+    """
+    API view for retrieving the aggregated statistics of several players at once.
+
+    The names are given either as a comma separated 'names' query parameter of a GET request,
+    or as a 'names' list in the body of a POST request. All players are resolved with a single query.
+    Every requested name gets an entry in the response, in the requested order; names that do not
+    belong to a player get an entry with a 'detail' message instead of statistics.
+
+    Attributes:
+        MAX_PLAYERS (int): The maximum number of names accepted in one request.
+    """
+    MAX_PLAYERS = 100
+
+    def clean_names(self, names):
+        """
+        Removes duplicate names and checks the number of names.
+
+        Args:
+            names (list): The requested player names.
+
+        Returns:
+            list: The names, in the requested order, each only once.
+
+        Raises:
+            ValueError: If no or too many names were given.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            raise ValueError("At least one player name is required.")
+        if len(names) > self.MAX_PLAYERS:
+            raise ValueError(f"At most {self.MAX_PLAYERS} players can be requested at once.")
+        return names
+
+    def parse_query(self, request):
+        """
+        Reads the 'names' query parameter of a GET request, for 'dataset_conditional'.
+        """
+        return {"names": self.clean_names([name.strip() for name in request.query_params.get(
+            "names", "").split(",") if name.strip()])}
+
+    @dataset_conditional
+    def get(self, request, names):
+        """
+        Handles GET requests, e.g. '/stats/players?names=Player One,Player Two'.
+        """
+        return self.respond(names)
+
+    def post(self, request):
+        """
+        Handles POST requests with a body like '{"names": ["Player One", "Player Two"]}'.
+        """
+        names = request.data.get("names") if isinstance(
+            request.data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return Response({"detail": "'names' must be a list of player names."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            names = self.clean_names(names)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.respond(names)
+
+    def respond(self, names):
+        """
+        Builds the response for the requested names.
+
+        Args:
+            names (list): The names returned by 'clean_names'.
+
+        Returns:
+            Response: The response with a 'results' list.
+        """
+        with timed("service"):
+            aggregated = PlayerStatsService.get_aggregated_stats_for_players(names)
+        with timed("serialize"):
+            results = []
+            for name in names:
+                if name in aggregated:
+                    results.append(player_stats_to_dict(aggregated[name]))
+                else:
+                    results.append(
+                        {"playerName": name, "detail": f"Player with name '{name}' not found"})
+        return Response({"results": results})
+
+
+class LeadersView(APIView):
+    """
+    API view for ranking players by a per game statistic.
+
+    The statistic is given with the 'metric' query parameter and can be any base statistic (e.g. 'reb')
+    or derived statistic (e.g. 'tsp') of PlayerStats. The ranking can be limited to one 'position', and
+    'limit' sets how many players are returned. The ranking is done by the database.
+
+    Attributes:
+        DEFAULT_LIMIT (int): The number of players returned when 'limit' is not given.
+        MAX_LIMIT (int): The largest accepted 'limit'.
+    """
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 100
+
+    def parse_query(self, request):
+        """
+        Reads the 'metric', 'position' and 'limit' query parameters, for 'dataset_conditional'.
+
+        Raises:
+            ValueError: If a parameter is invalid.
+        """
+        metric = request.query_params.get("metric", "")
+        if metric not in metric_expressions():
+            raise ValueError(f"Unknown metric '{metric}'.")
+        position = request.query_params.get("position") or None
+        if position and position not in dict(Player.POSITIONS):
+            raise ValueError(f"Unknown position '{position}'.")
+        return {"metric": metric, "position": position,
+                "limit": parse_limit(request, self.DEFAULT_LIMIT, self.MAX_LIMIT)}
+
+    @dataset_conditional
+    def get(self, request, metric, position, limit):
+        """
+        Handles GET requests, e.g. '/stats/leaders?metric=tsp&position=PG&limit=20'.
+
+        Returns:
+            Response: The response with the ranked players.
+        """
+        with timed("service"):
+            leaders = PlayerStatsService.get_leaders(metric, position, limit)
+
+        return Response({
+            "metric": metric,
+            "position": position,
+            "leaders": [{
+                "rank": rank,
+                "playerName": leader["player"].player_name,
+                "position": leader["player"].position,
+                "gamesPlayed": leader["player"].games_played,
+                "value": round(leader["value"], 1),
+            } for rank, leader in enumerate(leaders, start=1)],
+        })
+
+
+class SearchView(APIView):
+    """
+    API view for finding players by name, e.g. for autocompletion.
+
+    The 'q' query parameter is matched against the beginning of the players' names and of every word of their
+    names, ignoring case, accents and punctuation. With 'fuzzy' set to 1 or 2, names beginning with up to that
+    many edits of 'q' are found as well, closest first. 'limit' sets how many players are returned.
+
+    Attributes:
+        DEFAULT_LIMIT (int): The number of players returned when 'limit' is not given.
+        MAX_LIMIT (int): The largest accepted 'limit'.
+        MAX_DISTANCE (int): The largest accepted 'fuzzy'.
+    """
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    MAX_DISTANCE = 2
+
+    def parse_query(self, request):
+        """
+        Reads the 'q', 'fuzzy' and 'limit' query parameters, for 'dataset_conditional'.
+
+        Raises:
+            ValueError: If a parameter is invalid.
+        """
+        query = request.query_params.get("q", "")
+        if not query.strip():
+            raise ValueError("'q' is required.")
+        try:
+            max_distance = int(request.query_params.get("fuzzy", 0))
+        except ValueError:
+            max_distance = -1
+        if not 0 <= max_distance <= self.MAX_DISTANCE:
+            raise ValueError(f"'fuzzy' must be a number between 0 and {self.MAX_DISTANCE}.")
+        return {"query": query, "max_distance": max_distance,
+                "limit": parse_limit(request, self.DEFAULT_LIMIT, self.MAX_LIMIT)}
+
+    @dataset_conditional
+    def get(self, request, query, max_distance, limit):
+        """
+        Handles GET requests, e.g. '/stats/search?q=jok&fuzzy=1'.
+
+        Returns:
+            Response: The response with the matching players.
+        """
+        with timed("service"):
+            players = PlayerStatsService.search_players(query, max_distance, limit)
+        return Response({
+            "query": query,
+            "results": [{
+                "playerName": player["player_name"],
+                "position": player["position"],
+                "distance": player["distance"],
+            } for player in players],
+        })
+
+
+def export_row(aggregated_data):
+    """
+    Builds the representation of a player in an export: the player statistics response with the player's position.
+    """
+    data = player_stats_to_dict(aggregated_data)
+    return {"playerName": data.pop("playerName"), "position": aggregated_data["player"].position, **data}
+
+
+def export_ndjson(chunks):
+    """
+    Encodes chunks of aggregated statistics as newline delimited JSON, one player per line.
+
+    Yields:
+        bytes: The lines of one chunk.
+    """
+    renderer = get_json_renderer()
+    for chunk in chunks:
+        yield b"".join(renderer.render(export_row(aggregated_data)) + b"\n" for aggregated_data in chunk)
+
+
+def export_csv(chunks):
+    """
+    Encodes chunks of aggregated statistics as CSV, with a header line and one line per player.
+
+    The statistics columns are named like the metrics of LeadersView, e.g. 'fta' or 'tsp'.
+
+    Yields:
+        bytes: The header, then the lines of one chunk at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        content = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return content
+
+    writer.writerow(["playerName", "position", "gamesPlayed", *RESPONSE_PATHS])
+    yield flush()
+    for chunk in chunks:
+        for aggregated_data in chunk:
+            data = export_row(aggregated_data)
+            values = []
+            for path in RESPONSE_PATHS.values():
+                value = data
+                for key in path:
+                    value = value[key]
+                values.append(value)
+            writer.writerow([data["playerName"], data["position"], data["gamesPlayed"], *values])
+        yield flush()
+
+
+class ExportView(View):
+    """
+    Streams the statistics of all players, for analytics jobs that need the whole league at once.
+
+    '?format=ndjson' (the default) sends one JSON object per line, shaped like the player statistics response with
+    the player's 'position' added. '?format=csv' sends a header line and one line per player. The players are read
+    and encoded CHUNK_SIZE at a time while the response is sent, so memory use does not depend on the number of
+    players. The response is compressed with gzip when the client accepts it.
+
+    Attributes:
+        CHUNK_SIZE (int): The number of players read with one query and sent as one block.
+        FORMATS (dict): A dictionary mapping the accepted formats to their content type.
+        ACCEPTS_GZIP (Pattern): Matches Accept-Encoding headers accepting gzip.
+    """
+    http_method_names = ["get", "head", "options"]
+    CHUNK_SIZE = 500
+    FORMATS = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv; charset=utf-8",
+    }
+    ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+    def parse_query(self, request):
+        """
+        Reads the 'format' query parameter, for 'dataset_conditional'.
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        export_format = request.GET.get("format", "ndjson")
+        if export_format not in self.FORMATS:
+            raise ValueError(f"'format' must be one of {', '.join(self.FORMATS)}.")
+        return {"export_format": export_format}
+
+    @dataset_conditional
+    def get(self, request, export_format):
+        """
+        Handles GET requests, e.g. '/stats/export?format=csv'.
 
         Returns:
-            Response: The response containing the serialized player statistics data,
-                      or a 404 error if the player does not exist.
+            StreamingHttpResponse: The streamed export.
         """
+        chunks = PlayerStatsService.iter_aggregated_stats(self.CHUNK_SIZE)
+        content = export_csv(chunks) if export_format == "csv" else export_ndjson(chunks)
+
+        compress = bool(self.ACCEPTS_GZIP.search(request.headers.get("Accept-Encoding", "")))
+        response = StreamingHttpResponse(compress_sequence(content) if compress else content,
+                                         content_type=self.FORMATS[export_format])
+        if compress:
+            response.headers["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response.headers["Content-Disposition"] = f'attachment; filename="players.{export_format}"'
+        return response
+
+
+class MetricsView(View):
+    """
+    Exposes the request, ingest and response cache metrics in the Prometheus text format.
+
+    Request latencies are only recorded while ProfilingMiddleware is enabled with the STATS_PROFILING setting.
+    """
+    http_method_names = ["get", "head", "options"]
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class IngestView(View):
+    """
+    API view for pushing game data as CSV.
+
+    The CSV is sent either as the request body (e.g. with 'Content-Type: text/csv') or as the first file of a
+    multipart upload. It is read from the request stream in blocks and ingested in committed chunks of
+    CHUNK_SIZE rows by a CsvStreamIngestor, so the upload is never held in memory as a whole. The header is
+    validated from the first block, and an invalid header is answered with a 400 before the rest of the body
+    is read. Invalid rows are skipped and reported in the response.
+
+    If the STATS_INGEST_API_KEY setting is set, requests must send it in the 'X-API-Key' header. Without a key
+    the endpoint is closed, unless STATS_INGEST_ALLOW_UNAUTHENTICATED explicitly opens it (e.g. for local
+    development). DEBUG alone does not open it. Workers that are read-only because they share a
+    file-backed database with an elected writer write the upload themselves (see 'stats_api.db.writable').
+
+    Attributes:
+        CHUNK_SIZE (int): The number of rows committed at a time. Requests reading the tables being written
+                          wait for the chunk, so chunks are kept small.
+        READ_SIZE (int): The number of bytes read from the request body at a time.
+    """
+    http_method_names = ["post", "options"]
+    CHUNK_SIZE = 2000
+    READ_SIZE = 64 * 1024
+
+    def post(self, request):
+        """
+        Handles POST requests with CSV data.
+
+        Returns:
+            JsonResponse: The number of ingested and rejected rows, the rejected rows per error type, samples of
+                          rejected rows and the ingest rate, or a 400 error if the CSV header is invalid.
+        """
+        if not self.is_authorized(request):
+            return JsonResponse({"detail": "A valid API key is required."}, status=status.HTTP_403_FORBIDDEN)
+
+        ingestor = CsvStreamIngestor(chunk_size=self.CHUNK_SIZE)
         try:
-            aggregated_data = PlayerStatsService.get_aggregated_stats(
-                player_name)
-            stats = PlayerStatsService.create_stats_from_aggregated(
-                aggregated_data)
-            serializer = PlayerStatsAggregateSerializer(stats)
-            return Response(serializer.data)
-        except Player.DoesNotExist:
-            return Response({"detail": f"Player with name '{player_name}' not found"}, status=status.HTTP_404_NOT_FOUND)
+            with writable():
+                result = self.ingest(request, ingestor)
+        except ValueError as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if result is None:
+            return JsonResponse({"detail": "No file was uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return JsonResponse({
+            "rowsIngested": result["rows"],
+            "rowsRejected": result["rejected"],
+            "errors": result["errors"],
+            "errorSamples": result["samples"],
+            "seconds": round(result["seconds"], 3),
+            "rowsPerSecond": round(result["rows_per_sec"], 1),
+        })
+
+    def ingest(self, request, ingestor):
+        """
+        Feeds the CSV of a request to an ingestor.
+
+        Returns:
+            dict: The result of 'CsvStreamIngestor.close', or None if a multipart request did not contain a file.
+
+        Raises:
+            ValueError: If the CSV header is invalid.
+        """
+        if request.content_type == "multipart/form-data":
+            handler = CsvIngestUploadHandler(request, ingestor)
+            request.upload_handlers = [handler]
+            request.POST  # Parsing the body feeds the uploaded file to the ingestor
+            if not handler.started:
+                return None
+        else:
+            for block in iter(partial(request.read, self.READ_SIZE), b""):
+                ingestor.feed(block)
+        return ingestor.close()
+
+    @staticmethod
+    def is_authorized(request):
+        api_key = getattr(settings, "STATS_INGEST_API_KEY", None)
+        if not api_key:
+            return getattr(settings, "STATS_INGEST_ALLOW_UNAUTHENTICATED", False)
+        return hmac.compare_digest(request.headers.get("X-API-Key", ""), api_key)
@@ -0,0 +1,103 @@
+import glob
+import logging
+import os
+import threading
+
+from django.db import connection
+
+from .services import DataService
+
+
+class DataWatcher:
+    """
+    Polls files and directories for new CSV files and rows appended to known files, and ingests them.
+
+    A file is only ingested once its size has not changed between two polls, so files that are still being
+    copied or written are picked up when they are complete. The rows are ingested with
+    'DataService.ingest_new_rows', which keeps track of what was ingested from every file, so restarting
+    the watcher never counts a row twice.
+
+    Attributes:
+        paths (list): The files and directories to watch.
+        interval (float): The number of seconds between polls.
+        pattern (str): The glob pattern of the files picked up in watched directories.
+        chunk_size (int): The number of rows committed at a time.
+        CHUNK_SIZE (int): The default chunk size. Requests wait for the table locks of the chunk being written,
+                          so chunks are kept much smaller than DataService.CHUNK_SIZE.
+    """
+    CHUNK_SIZE = 2000
+
+    def __init__(self, paths, interval=5.0, pattern="*.csv", chunk_size=None):
+        self.paths = list(paths)
+        self.interval = interval
+        self.pattern = pattern
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self._sizes = {}
+        self._processed = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def files(self):
+        """
+        Lists the watched files that currently exist.
+
+        Returns:
+            list: The paths of the files, in a stable order.
+        """
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, self.pattern))))
+            elif os.path.isfile(path):
+                files.append(path)
+        return files
+
+    def poll(self):
+        """
+        Ingests the new rows of every watched file whose size has settled.
+
+        Errors are logged and the file is tried again on the next poll.
+
+        Returns:
+            int: The number of rows ingested.
+        """
+        ingested = 0
+        for file_path in self.files():
+            size = os.path.getsize(file_path)
+            settled = self._sizes.get(file_path) == size
+            self._sizes[file_path] = size
+            if not settled or self._processed.get(file_path) == size:
+                continue
+            try:
+                ingested += DataService.ingest_new_rows(file_path, chunk_size=self.chunk_size)
+                self._processed[file_path] = size
+            except Exception as e:
+                logging.error(f"Error watching {file_path}: {str(e)}")
+        return ingested
+
+    def run(self):
+        """
+        Polls until 'stop' is called.
+        """
+        try:
+            while not self._stop.wait(self.interval):
+                self.poll()
+        finally:
+            connection.close()
+
+    def start(self):
+        """
+        Starts polling in a daemon thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="stats-data-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops polling and waits for the current poll to finish.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None